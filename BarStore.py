@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class BarStore:
+    #Bars of many symbols on disk, one memory mapped float64 .npy file per field, laid out symbol major
+    #(one row of bars per symbol) on a shared time index of bar end times. A missing bar is a nan.
+    #history_panel returns the bars as a wide (time x symbol) array straight from the memory map, so there is no
+    #long frame to build and unstack. It is the data of the offline harness, and a cache for research:
+    #BarStore.from_history(path, qb.History(...)) pivots a history frame once and every later read is a memory map
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'symbols.json')) as file:
+            self.symbols = json.load(file)
+        self.columns = {symbol: k for k, symbol in enumerate(self.symbols)}
+        self.times = pd.DatetimeIndex(np.load(os.path.join(path, 'times.npy')))
+        self.fields = {}
+
+    def __len__(self):
+        return len(self.times)
+
+    def __contains__(self, symbol):
+        return str(symbol) in self.columns
+
+    @staticmethod
+    def write(path, times, symbols, fields):
+        #fields is {field: (symbol x time) array}, or wide (time x symbol) frames with times as their index
+        os.makedirs(path, exist_ok=True)
+        symbols = [str(symbol) for symbol in symbols]
+        for field, values in fields.items():
+            if isinstance(values, pd.DataFrame):
+                values = values.reindex(index=times, columns=symbols).to_numpy(dtype=float).T
+            array = np.lib.format.open_memmap(os.path.join(path, f'{field}.npy'), mode='w+', dtype=float, shape=(len(symbols), len(times)))
+            array[:] = values
+            array.flush()
+            del array
+        np.save(os.path.join(path, 'times.npy'), pd.DatetimeIndex(times).to_numpy(dtype='datetime64[ns]'))
+        with open(os.path.join(path, 'symbols.json'), 'w') as file:
+            json.dump(symbols, file)
+        return BarStore(path)
+
+    @staticmethod
+    def from_history(path, history):
+        #a LEAN history frame, indexed by (symbol, time), pivoted once into a store
+        history = history[~history.index.duplicated()]
+        times = history.index.get_level_values(1).unique().sort_values()
+        symbols = list(history.index.get_level_values(0).unique())
+        fields = {field: history[field].unstack(level=0) for field in FIELDS if field in history.columns}
+        return BarStore.write(path, times, symbols, fields)
+
+    def field(self, field):
+        #the (symbol x time) memory map of a field, opened read only the first time it is needed
+        array = self.fields.get(field)
+        if array is None:
+            array = self.fields[field] = np.load(os.path.join(self.path, f'{field}.npy'), mmap_mode='r')
+        return array
+
+    def time_slice(self, start=None, end=None):
+        #the bars that ended in [start, end]
+        first = 0 if start is None else self.times.searchsorted(start, side='left')
+        last = len(self.times) if end is None else self.times.searchsorted(end, side='right')
+        return slice(first, last)
+
+    def history_panel(self, symbols, start=None, end=None, field='close'):
+        #the (time x symbol) array of a field for the bars that ended in [start, end], the times are self.times[self.time_slice(start, end)].
+        #It is a view of the memory map when the symbols are evenly spaced in the store (like all of them, or one run of them),
+        #else the rows are gathered into a new array. Unknown symbols raise a KeyError
+        rows = [self.columns[str(symbol)] for symbol in symbols]
+        times = self.time_slice(start, end)
+        array = self.field(field)
+        if len(rows) == 0:
+            return np.empty((times.stop - times.start, 0))
+        step = rows[1] - rows[0] if len(rows) > 1 else 1
+        if step > 0 and rows == list(range(rows[0], rows[-1] + 1, step)):
+            return array[rows[0]:rows[-1] + 1:step, times].T
+        return array[rows, times].T
@@ -0,0 +1,172 @@
+import numpy as np
+
+from IndicatorWarmUp import ema, last_values, samples, window_mean, window_std
+
+
+#the direction of a row before it has had a signal, never equal to an InsightDirection
+NO_DIRECTION = 2
+
+
+class BollingerEngine:
+    #The bollinger bands of many symbols in arrays, like one BollingerBands indicator per symbol.
+    #Every symbol has a row with its last period closes (a ring buffer, for the standard deviation), the moving average
+    #and how many closes it has had. WarmUp sets the rows of many symbols from one history frame in one go,
+    #the consolidators push the closes after that.
+    #The rows also hold the last close, the quantity we hold and the last direction we sent, so the signals of all
+    #the symbols are a few vectorized comparisons, see Signals.
+    #Push only queues the close, the queued closes of all the symbols are written into the arrays in one go by Flush,
+    #once per slice. active marks the rows in use, so a pass over all the symbols needs no dict lookups
+    def __init__(self, period, k, exponential=True):
+        self.period = period
+        self.k = k
+        self.exponential = exponential
+        self.alpha = 2.0 / (period + 1)
+        self.rows = {}
+        self.free_rows = []
+        self.window = np.full((0, period), np.nan)
+        self.heads = np.zeros(0, dtype=int)
+        self.samples = np.zeros(0, dtype=int)
+        #the exponential moving average, not used for a simple one
+        self.averages = np.full(0, np.nan)
+        self.symbols = []
+        self.prices = np.full(0, np.nan)
+        self.positions = np.zeros(0)
+        self.directions = np.zeros(0, dtype=int)
+        self.active = np.zeros(0, dtype=bool)
+        #the rows and closes pushed since the last Flush
+        self.pending_rows = []
+        self.pending_closes = []
+
+    def __contains__(self, symbol):
+        return symbol in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def Add(self, symbol, quantity=0):
+        if not self.free_rows:
+            #double the arrays when we run out of rows
+            size = len(self.heads)
+            grow = max(size, 8)
+            self.free_rows.extend(range(size + grow - 1, size - 1, -1))
+            self.window = np.vstack([self.window, np.full((grow, self.period), np.nan)])
+            self.heads = np.concatenate([self.heads, np.zeros(grow, dtype=int)])
+            self.samples = np.concatenate([self.samples, np.zeros(grow, dtype=int)])
+            self.averages = np.concatenate([self.averages, np.full(grow, np.nan)])
+            self.symbols.extend([None] * grow)
+            self.prices = np.concatenate([self.prices, np.full(grow, np.nan)])
+            self.positions = np.concatenate([self.positions, np.zeros(grow)])
+            self.directions = np.concatenate([self.directions, np.zeros(grow, dtype=int)])
+            self.active = np.concatenate([self.active, np.zeros(grow, dtype=bool)])
+
+        row = self.rows[symbol] = self.free_rows.pop()
+        self.symbols[row] = symbol
+        self.window[row] = np.nan
+        self.heads[row] = 0
+        self.samples[row] = 0
+        self.averages[row] = np.nan
+        self.prices[row] = np.nan
+        self.positions[row] = quantity
+        self.directions[row] = NO_DIRECTION
+        self.active[row] = True
+        return row
+
+    def Remove(self, symbol):
+        self.Flush()
+        row = self.rows.pop(symbol, None)
+        if row is not None:
+            self.symbols[row] = None
+            self.active[row] = False
+            self.free_rows.append(row)
+
+    def WarmUp(self, symbols, closes):
+        #closes is the (time x symbol) history of the symbols, oldest first. The rows end up as if every close had been pushed
+        self.Flush()
+        rows = np.array([self.rows[symbol] if symbol in self.rows else self.Add(symbol) for symbol in symbols], dtype=int)
+        closes = np.asarray(closes, dtype=float)
+        counts = samples(closes)
+        filled = np.minimum(counts, self.period)
+        #the last closes go to the start of the ring, oldest first, and the next close goes after them
+        last = last_values(closes, self.period)
+        self.window[rows] = np.nan
+        for k in range(1, self.period + 1):
+            has = filled >= k
+            self.window[rows[has], filled[has] - k] = last[-k, has]
+        self.heads[rows] = filled % self.period
+        self.samples[rows] = counts
+        self.prices[rows] = np.where(filled > 0, last[-1], self.prices[rows])
+        if self.exponential:
+            self.averages[rows] = ema(closes, self.period)
+
+    def Push(self, symbol, close):
+        #one new close, from the consolidator of the symbol. It is only queued, see Flush
+        row = self.rows.get(symbol)
+        if row is not None:
+            self.pending_rows.append(row)
+            self.pending_closes.append(close)
+
+    def Flush(self):
+        #writes the queued closes of all the symbols into the arrays. A symbol with more than one queued close gets them
+        #in order, one vectorized write per close, so a slice with one close per symbol is one write
+        if not self.pending_rows:
+            return
+        rows = np.array(self.pending_rows, dtype=int)
+        closes = np.array(self.pending_closes, dtype=float)
+        self.pending_rows = []
+        self.pending_closes = []
+
+        #the k'th close of every row goes in the k'th write
+        order = np.argsort(rows, kind='stable')
+        rows, closes = rows[order], closes[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        nth = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        for k in range(nth.max() + 1):
+            take = nth == k
+            self.Write(rows[take], closes[take])
+
+    def Write(self, rows, closes):
+        #one close for each of the rows, all different
+        self.window[rows, self.heads[rows]] = closes
+        self.prices[rows] = closes
+        self.heads[rows] = (self.heads[rows] + 1) % self.period
+        if self.exponential:
+            first = self.samples[rows] == 0
+            self.averages[rows] = np.where(first, closes, closes * self.alpha + self.averages[rows] * (1 - self.alpha))
+        self.samples[rows] += 1
+
+    def IsReady(self, symbol):
+        self.Flush()
+        row = self.rows.get(symbol)
+        return row is not None and self.samples[row] >= self.period
+
+    def Bands(self, rows):
+        #lower band, middle band and upper band of the rows
+        window = self.window[rows].T
+        middle = self.averages[rows] if self.exponential else window_mean(window)
+        width = self.k * window_std(window)
+        return middle - width, middle, middle + width
+
+    def Fill(self, symbol, quantity):
+        #a fill of an order, so the positions follow the portfolio without looking it up for every symbol
+        row = self.rows.get(symbol)
+        if row is not None:
+            self.positions[row] += quantity
+
+    def Signals(self):
+        #the symbols whose direction changed since their last signal, and their new direction as an int InsightDirection.
+        #Flat is 0, up is 1 and down is -1.
+        #Out of the market we go up below the lower band and down above the upper band, a long position stays up until
+        #the price gets to the middle band and a short one stays down until it gets back to it
+        self.Flush()
+        rows = np.flatnonzero(self.active)
+        lower, middle, upper = self.Bands(rows)
+        prices = self.prices[rows]
+        positions = self.positions[rows]
+
+        entry = np.where(prices <= lower, 1, np.where(prices >= upper, -1, 0))
+        held = np.where(positions > 0, np.where(prices >= middle, 0, 1), np.where(prices <= middle, 0, -1))
+        directions = np.where(positions == 0, entry, held)
+
+        changed = np.flatnonzero(directions != self.directions[rows])
+        self.directions[rows[changed]] = directions[changed]
+        return [self.symbols[row] for row in rows[changed]], directions[changed]
@@ -3,6 +3,11 @@ from AlgorithmImports import *
 from datetime import timedelta, time
 import pandas as pd
 import numpy as np
+from HistoryCache import HistoryCache
+from VolatilityRanker import VolatilityRanker
+from CoarseSelection import CoarseSelection
+from BollingerEngine import BollingerEngine
+from ModelProfiler import ModelProfiler
 
 
 class BollBands(QCAlgorithm):
@@ -15,18 +20,26 @@ class BollBands(QCAlgorithm):
         self.UniverseSettings.Resolution = Resolution.Daily
         self.SetWarmUp(timedelta(days=7))
 
-        self.SetExecution(ImmediateExecutionModel())
+        #times the framework models, see ModelProfiler. enabled = True to get the report at the end of the backtest
+        self.profiler = ModelProfiler(self, enabled = False)
+        self.SetExecution(self.profiler.Wrap(ImmediateExecutionModel()))
         self.AddUniverse(self.CoarseUniverse, self.FineUniverse)
-        self.SetPortfolioConstruction(EqualWeightingPortfolioConstructionModel())
-        self.AddAlpha(AlphaBollingerBands())
+        self.SetPortfolioConstruction(self.profiler.Wrap(EqualWeightingPortfolioConstructionModel()))
+        self.alpha = AlphaBollingerBands()
+        self.AddAlpha(self.profiler.Wrap(self.alpha))
 
         #used for rebalancing, and to select how many stocks goes to the coarse and fine.
-        self.lastMonth = -1
+        #stocks over 10 bucks, and that has fundamental data, once a month
+        self.coarse_selection = CoarseSelection(min_price = 10)
         self.coarse_filter = 100
         self.fine_filter = 10
 
         self.vol_history = 120
 
+        #the volatility of every stock over its last 360 daily prices, kept up to date with the daily coarse prices.
+        #Set returns = True to rank by the volatility of the returns instead of the prices
+        self.volatility = VolatilityRanker(window = 360, returns = False)
+
     #Plotting standard variables
     def OnEndOfDay(self):
         self.Plot("Positions", "Num", len([x.Symbol for x in self.Portfolio.Values if self.Portfolio[x.Symbol].Invested]))
@@ -35,52 +48,44 @@ class BollBands(QCAlgorithm):
         self.Plot(f"Cash", "Remaining", self.Portfolio.Cash)
         self.Plot(f"Symboler", "Symboler", len(antal_symboler))
 
+    def OnEndOfAlgorithm(self):
+        self.profiler.Report()
+
+    def OnOrderEvent(self, orderEvent):
+        self.alpha.OnOrderEvent(self, orderEvent)
+
     def CoarseUniverse(self, coarse):
+        #the prices of the stocks that pass the filter go to the volatility ranker every day
+        filtered = self.coarse_selection.Filter(coarse)
+        self.volatility.Update([x.Symbol for x in filtered], [x.AdjustedPrice for x in filtered])
+        #a stock that left the filter would have a gap in its window, it starts over if it comes back
+        self.volatility.Expire(1)
+
         #Rebalance function, once a month
-        if self.Time.month == self.lastMonth:
+        if not self.coarse_selection.Due(self.Time):
             return Universe.Unchanged
-        self.lastMonth = self.Time.month
-
-        #sorting by stocks over 10 bucks, and that has fundamental data
-        selected = sorted([x for x in coarse if x.Price > 10 and x.HasFundamentalData], key = lambda x: x.DollarVolume, reverse=True)
 
-        return [x.Symbol for x in selected[:self.coarse_filter]]
+        #the most dollar volume
+        return self.coarse_selection.Top(filtered, self.coarse_filter)
 
     def FineUniverse(self, fine):
 
         #make a list that only contains the symbols
         filtered_fine = [x.Symbol for x in fine]
 
-        #implement the methods that is described 
-        stocks_by_vol = self.SortVolatility(filtered_fine, 360, Resolution.Daily)
+        #stocks we have not followed for 360 trading days yet get their window from one history call, only the first time we see them
+        unseeded = self.volatility.Unseeded(filtered_fine)
+        if unseeded:
+            history = HistoryCache.For(self).History(unseeded, self.volatility.window, Resolution.Daily)
+            if not history.empty:
+                closes = history.close.unstack(level = 0)
+                for symbol in unseeded:
+                    if symbol in closes:
+                        self.volatility.Seed(symbol, closes[symbol].values)
+            self.volatility.MarkSeeded(unseeded)
 
-        stocks_by_vol_keys = self.get_keys(stocks_by_vol)
-
-        return [x for x in filtered_fine if str(x) in stocks_by_vol_keys[:self.fine_filter]]
-
-
-    def SortVolatility(self, filtered_fine, lenght, resolution):
-        #method that calculates the volatility with standard deviation, and returns it as a dict 
-        history = self.History(filtered_fine, lenght, resolution)
-        prices = history.drop_duplicates().close.unstack(level =0)
-        vol = np.std(prices)
-        vol_to_dict = vol.to_dict()
-        rangeret = sorted(vol_to_dict, key = vol_to_dict.get, reverse = True)
-        return {symbol: rank for rank, symbol in enumerate(rangeret, 1)}
-
-    def get_keys(self, dic):
-        #Method to get the 
-        historie = {key:dic.get(key, 0) for key in set(dic)}
-        historie = sorted(historie.items(), key = lambda x: x[1], reverse = False)
-    
-        listoflist = []
-
-        for tuple1 in historie:
-            list1 = list(tuple1)
-            i = list1.pop(0)
-            listoflist.append(i)
-        
-        return listoflist
+        #the most volatile stocks, picked with argpartition
+        return self.volatility.Top(filtered_fine, self.fine_filter)
 
 
 class AlphaBollingerBands(AlphaModel):
@@ -96,12 +101,17 @@ class AlphaBollingerBands(AlphaModel):
         self.resolution = resolution
         self.insightPeriode = Time.Multiply(Extensions.ToTimeSpan(resolution), period)
         self.symbolDataBySymbol = {}
+        #the bollinger bands of every symbol, in arrays
+        self.engine = BollingerEngine(period, deviation, exponential = movingAverageType == MovingAverageType.Exponential)
+        self.directions = {1: InsightDirection.Up, -1: InsightDirection.Down, 0: InsightDirection.Flat}
         global antal_symboler
         antal_symboler = self.symbolDataBySymbol
         
         self.days = 10
     
     def Update(self, algorithm, data):
+        #the closes the consolidators pushed in this slice go into the engine in one write
+        self.engine.Flush()
         
         if not self.days == 10:
             self.days += 1
@@ -109,71 +119,42 @@ class AlphaBollingerBands(AlphaModel):
         else:
             self.days = 0
             
-        insights = []
-
-        for symbol, symbolDataBySymbol in self.symbolDataBySymbol.items():
-
-            direction = InsightDirection.Flat
-
-            price = symbolDataBySymbol.Security.Price
-            lower = symbolDataBySymbol.Bollinger.LowerBand.Current.Value
-            upper = symbolDataBySymbol.Bollinger.UpperBand.Current.Value
-            middle = symbolDataBySymbol.Bollinger.MiddleBand.Current.Value
-
-            #implemeter "previous state" for at tjekke hvilken tilstand at den sidst var i
-            if symbolDataBySymbol.Security.Invested:
-                if algorithm.Portfolio[symbol.Symbol].IsLong:
-                    if price >= middle:
-                        direction = InsightDirection.Flat
-                    else:
-                        direction = InsightDirection.Up
-
-                elif algorithm.Portfolio[symbol.Symbol].IsShort:
-                    if price <= middle:
-                        direction = InsightDirection.Flat
-                    else:
-                        direction = InsightDirection.Down
-
-                    
-
-            elif not symbolDataBySymbol.Security.Invested:
-                if price <= lower:
-                    direction = InsightDirection.Up
-                elif price >= upper:
-                    direction = InsightDirection.Down
-                else:
-                    direction = InsightDirection.Flat
-
-            if direction == symbolDataBySymbol.PreviousDirection:
-                continue
-
-            insight = Insight.Price(symbolDataBySymbol.Security.Symbol, self.insightPeriode, direction)
-            symbolDataBySymbol.PreviousDirections = insight.Direction
-            insights.append(insight)
-        
-        return insights
+        #the signals of all the symbols at once, only the ones whose direction changed become insights
+        symbols, directions = self.engine.Signals()
+        return [Insight.Price(symbol, self.insightPeriode, self.directions[direction]) for symbol, direction in zip(symbols, directions)]
 
     def OnSecuritiesChanged(self, algorithm, changes):
 
-        for symbol in changes.AddedSecurities:
-            if symbol not in self.symbolDataBySymbol:
-                symbol_data = SymbolData(symbol)
-                symbol_data.RegisterIndicatorBollinger(algorithm, self.period, self.deviation, self.movingAverageType, self.resolution)
-                
-                history = algorithm.History([symbol.Symbol], self.period, self.resolution)
+        added = [symbol for symbol in changes.AddedSecurities if symbol not in self.symbolDataBySymbol]
+        for symbol in added:
+            symbol_data = SymbolData(symbol)
+            symbol_data.RegisterConsolidator(algorithm, self.resolution, self.OnDataConsolidated)
+            self.engine.Add(symbol.Symbol, symbol.Holdings.Quantity)
+            self.symbolDataBySymbol[symbol] = symbol_data
+
+        #one history call for all the added securities, and the bands of all of them are warmed up from it in one go
+        if added:
+            history = HistoryCache.For(algorithm).History([symbol.Symbol for symbol in added], self.period, self.resolution)
+            if not history.empty:
+                closes = history.close.unstack(level = 0)
+                symbols = [symbol.Symbol for symbol in added if symbol.Symbol in closes]
+                self.engine.WarmUp(symbols, closes[symbols].values)
 
-                if not symbol_data.Bollinger.IsReady:
-                    symbol_data.WarmUpIndicators(history, symbol)
-                
-                self.symbolDataBySymbol[symbol] = symbol_data
-
-        
         for removed in changes.RemovedSecurities:
             data = self.symbolDataBySymbol.pop(removed)
             if data is not None:
                 data.RemoveConsolidators(algorithm)
+                self.engine.Remove(removed.Symbol)
+
+    def OnDataConsolidated(self, sender, bar):
+        self.engine.Push(bar.Symbol, bar.Close)
+
+    def OnOrderEvent(self, algorithm, orderEvent):
+        #the fills keep the positions of the engine in line with the portfolio
+        if orderEvent.Status == OrderStatus.Filled or orderEvent.Status == OrderStatus.PartiallyFilled:
+            self.engine.Fill(orderEvent.Symbol, orderEvent.FillQuantity)
+
 
-        
 
 class SymbolData:
 
@@ -181,20 +162,12 @@ class SymbolData:
     def __init__(self, symbol):
         self.Security = symbol
 
-    def RegisterIndicatorBollinger(self, algorithm, period, deviation, movingAverageType, resolution):
-        self.period = period
-        self.deviation = deviation
-        self.movingAverageType = movingAverageType
-        self.Consolidator = None
-        self.Bollinger = BollingerBands(self.period, deviation, movingAverageType)
+    def RegisterConsolidator(self, algorithm, resolution, handler):
+        #the bands themselves are in the BollingerEngine of the alpha, the consolidator feeds it the closes
         self.Consolidator = algorithm.ResolveConsolidator(self.Security.Symbol, resolution)
-        algorithm.RegisterIndicator(self.Security.Symbol, self.Bollinger, self.Consolidator)
-        self.PreviousDirection = None
+        self.Consolidator.DataConsolidated += handler
+        algorithm.SubscriptionManager.AddConsolidator(self.Security.Symbol, self.Consolidator)
 
     def RemoveConsolidators(self, algorithm):
         if self.Consolidator is not None:
             algorithm.SubscriptionManager.RemoveConsolidator(self.Security.Symbol, self.Consolidator)
-
-    def WarmUpIndicators(self, history, symbol):
-        for time, row in history.loc[symbol.Symbol].iterrows():
-            self.Bollinger.Update(time, row['close'])
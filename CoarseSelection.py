@@ -0,0 +1,70 @@
+import heapq
+
+import numpy as np
+
+
+class CoarseSelection:
+    #The coarse universe of all the algorithms: the stocks with the most dollar volume, among those with a price inside
+    #(min_price, max_price) and with fundamental data, picked once a month. The top count are picked in one pass with a heap,
+    #O(n log count) instead of sorting the whole coarse list, in the same order the sort gave them.
+    #With arrays = True the prices and dollar volumes are read into numpy once and the top count are found with argpartition
+    def __init__(self, min_price=None, max_price=None, fundamental=True, monthly=True, arrays=False):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.fundamental = fundamental
+        self.monthly = monthly
+        self.arrays = arrays
+        self.last_month = None
+
+    def Due(self, time):
+        #True on the first call of a month, or every time if it is not monthly
+        if not self.monthly:
+            return True
+        if time.month == self.last_month:
+            return False
+        self.last_month = time.month
+        return True
+
+    def Filter(self, coarse):
+        #the coarse data that passes the price bounds and the fundamental data requirement
+        min_price = -np.inf if self.min_price is None else self.min_price
+        max_price = np.inf if self.max_price is None else self.max_price
+        if self.fundamental:
+            return [x for x in coarse if x.HasFundamentalData and min_price < x.Price < max_price]
+        return [x for x in coarse if min_price < x.Price < max_price]
+
+    def Top(self, coarse, count):
+        #the symbols of the count with the most dollar volume, most first
+        return [x.Symbol for x in heapq.nlargest(count, coarse, key = lambda x: x.DollarVolume)]
+
+    def Select(self, time, coarse, count):
+        #the selected symbols. Returns None when it is not due, then the universe is unchanged
+        if not self.Due(time):
+            return None
+        if self.arrays:
+            return self.TopArrays(coarse, count)
+        return self.Top(self.Filter(coarse), count)
+
+    def TopArrays(self, coarse, count):
+        coarse = coarse if isinstance(coarse, list) else list(coarse)
+        n = len(coarse)
+        price = np.fromiter((x.Price for x in coarse), dtype=float, count=n)
+        dollar_volume = np.fromiter((x.DollarVolume for x in coarse), dtype=float, count=n)
+        keep = np.ones(n, dtype=bool)
+        if self.min_price is not None:
+            keep &= price > self.min_price
+        if self.max_price is not None:
+            keep &= price < self.max_price
+        if self.fundamental:
+            keep &= np.fromiter((x.HasFundamentalData for x in coarse), dtype=bool, count=n)
+
+        candidates = np.flatnonzero(keep)
+        if count <= 0:
+            return []
+        if count < len(candidates):
+            #everything tied with the smallest kept dollar volume is kept, so ties go to the first ones like the sort
+            kth = np.partition(-dollar_volume[candidates], count - 1)[count - 1]
+            candidates = candidates[-dollar_volume[candidates] <= kth]
+        #a stable sort on minus the dollar volume keeps equal dollar volumes in coarse order
+        candidates = candidates[np.argsort(-dollar_volume[candidates], kind='stable')][:count]
+        return [coarse[i].Symbol for i in candidates]
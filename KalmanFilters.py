@@ -0,0 +1,100 @@
+import numpy as np
+
+#the settings the Kalman framework has always used with pykalman
+MEAN_TRANSITION_COVARIANCE = 0.01
+MEAN_OBSERVATION_COVARIANCE = 1.0
+REGRESSION_DELTA = 1e-3
+REGRESSION_OBSERVATION_COVARIANCE = 2.0
+
+#Plain numpy Kalman filters for the pairs trading. Same recursions as pykalman's KalmanFilter.filter, with
+#transition matrix = identity and no offsets, but every function works on leading axes of independent series,
+#so all the pairs can be filtered in one go. The step functions are what the batch filters are made of,
+#they are also used on their own to move a stored state one bar forward.
+
+
+def mean_filter_predict(mean, covariance, transition_covariance=MEAN_TRANSITION_COVARIANCE):
+    #random walk state, so only the covariance grows
+    return mean, covariance + transition_covariance
+
+
+def mean_filter_correct(mean, covariance, observation, observation_covariance=MEAN_OBSERVATION_COVARIANCE):
+    #multiplying by the inverse, rather than dividing, is what pykalman does
+    gain = covariance * (1.0 / (covariance + observation_covariance))
+    return mean + gain * (observation - mean), covariance - gain * covariance
+
+
+def mean_filter(observations, initial_state_mean=0.0, initial_state_covariance=1.0,
+                observation_covariance=MEAN_OBSERVATION_COVARIANCE, transition_covariance=MEAN_TRANSITION_COVARIANCE):
+    #1-D Kalman filter of a price (the Kalman average). observations has shape (..., time).
+    #Returns the filtered state means and covariances, both with the same shape as observations
+    observations = np.asarray(observations, dtype=float)
+    means = np.empty_like(observations)
+    covariances = np.empty_like(observations)
+
+    mean = np.full(observations.shape[:-1], initial_state_mean, dtype=float)
+    covariance = np.full(observations.shape[:-1], initial_state_covariance, dtype=float)
+    for t in range(observations.shape[-1]):
+        #like pykalman, the first bar corrects the initial state without a predict step
+        if t > 0:
+            mean, covariance = mean_filter_predict(mean, covariance, transition_covariance)
+        mean, covariance = mean_filter_correct(mean, covariance, observations[..., t], observation_covariance)
+        means[..., t] = mean
+        covariances[..., t] = covariance
+    return means, covariances
+
+
+def regression_transition_covariance(delta=REGRESSION_DELTA):
+    return delta / (1 - delta) * np.eye(2)
+
+
+def regression_filter_predict(mean, covariance, transition_covariance=None):
+    #the hedge ratio and intercept are random walks, so only the covariance grows
+    if transition_covariance is None:
+        transition_covariance = regression_transition_covariance()
+    return mean, covariance + transition_covariance
+
+
+def regression_filter_correct(mean, covariance, x, y, observation_covariance=REGRESSION_OBSERVATION_COVARIANCE):
+    #state is [hedge ratio, intercept], observed through y = hedge ratio * x + intercept.
+    #mean has shape (..., 2), covariance (..., 2, 2), x and y (...).
+    #The observation matrix is H = [x, 1], so the matrix products are written out by hand.
+    #The order of operations is the same as pykalman's, K = P (H' S^-1), so the results only differ from it by rounding
+    x = np.asarray(x, dtype=float)
+    p00, p01 = covariance[..., 0, 0], covariance[..., 0, 1]
+    p10, p11 = covariance[..., 1, 0], covariance[..., 1, 1]
+
+    #H P H' + R, and H P
+    hp0 = x * p00 + p10
+    hp1 = x * p01 + p11
+    inverse = 1.0 / ((x * (p00 * x + p01) + (p10 * x + p11)) + observation_covariance)
+
+    gain0 = p00 * (x * inverse) + p01 * inverse
+    gain1 = p10 * (x * inverse) + p11 * inverse
+    innovation = y - (x * mean[..., 0] + mean[..., 1])
+
+    new_mean = np.stack([mean[..., 0] + gain0 * innovation, mean[..., 1] + gain1 * innovation], axis=-1)
+    new_covariance = np.stack([np.stack([p00 - gain0 * hp0, p01 - gain0 * hp1], axis=-1),
+                               np.stack([p10 - gain1 * hp0, p11 - gain1 * hp1], axis=-1)], axis=-2)
+    return new_mean, new_covariance
+
+
+def regression_filter(x, y, initial_state_mean=(0.0, 0.0), initial_state_covariance=np.ones((2, 2)),
+                      observation_covariance=REGRESSION_OBSERVATION_COVARIANCE, delta=REGRESSION_DELTA):
+    #2-state Kalman filter for a dynamic hedge ratio of y on x. x and y have shape (..., time).
+    #Returns the state means (..., time, 2) with [hedge ratio, intercept], and the covariances (..., time, 2, 2)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    batch = x.shape[:-1]
+    transition_covariance = regression_transition_covariance(delta)
+
+    means = np.empty(x.shape + (2,))
+    covariances = np.empty(x.shape + (2, 2))
+    mean = np.broadcast_to(np.asarray(initial_state_mean, dtype=float), batch + (2,))
+    covariance = np.broadcast_to(np.asarray(initial_state_covariance, dtype=float), batch + (2, 2))
+    for t in range(x.shape[-1]):
+        if t > 0:
+            mean, covariance = regression_filter_predict(mean, covariance, transition_covariance)
+        mean, covariance = regression_filter_correct(mean, covariance, x[..., t], y[..., t], observation_covariance)
+        means[..., t, :] = mean
+        covariances[..., t, :, :] = covariance
+    return means, covariances
@@ -1,11 +1,15 @@
 from AlgorithmImports import *
 from QuantConnect import Algorithm
-import pandas as pd
 from datetime import timedelta, time, datetime
 import numpy as np
-import statsmodels.api as sm
-from pykalman import KalmanFilter
 from collections import deque 
+from Cointegration import find_cointegrated_pairs
+from PairTestExecutor import PairTestExecutor
+from OUBands import OUBands
+from HistoryCache import HistoryCache
+from CoarseSelection import CoarseSelection
+from ModelProfiler import ModelProfiler
+from KalmanFilters import mean_filter, mean_filter_predict, mean_filter_correct, regression_filter, regression_filter_predict, regression_filter_correct
 
 class CointegrationAndKalmanFilter(QCAlgorithm):
     def Initialize(self):
@@ -19,21 +23,26 @@ class CointegrationAndKalmanFilter(QCAlgorithm):
         self.SetWarmup(timedelta(days = 7))
         
         #setting our universes and alphas etc
+        #times the framework models, see ModelProfiler. enabled = True to get the report at the end of the backtest
+        self.profiler = ModelProfiler(self, enabled = False)
         self.AddUniverse(self.CoarseUniverse, self.FineUniverse)
-        self.SetPortfolioConstruction(EqualWeightingPortfolioConstructionModel(rebalance = timedelta(weeks=1), portfolioBias = PortfolioBias.LongShort))
-        self.SetExecution(ImmediateExecutionModel())
-        self.AddAlpha(PairsTradingAlpha())
+        self.SetPortfolioConstruction(self.profiler.Wrap(EqualWeightingPortfolioConstructionModel(rebalance = timedelta(weeks=1), portfolioBias = PortfolioBias.LongShort)))
+        self.SetExecution(self.profiler.Wrap(ImmediateExecutionModel()))
+        self.AddAlpha(self.profiler.Wrap(PairsTradingAlpha()))
         
         #has to be a even number, or it wont be market neutral, or work at all
         self.num_coarse = 30
     
-        #Used for rebalancing
-        self.lastMonth = -1
+        #Used for rebalancing. Selects stocks having fundamental data, and price over 15 dollars, once a month
+        self.coarse_selection = CoarseSelection(min_price = 15)
         
         #our resolution and lookback for calculating the cointegration
         self.resolution = Resolution.Daily
         self.lookback = timedelta(weeks=150)
 
+        #runs the cointegration tests, set workers > 1 to spread them over more processes
+        self.pair_tester = PairTestExecutor(workers = 1)
+
     def OnEndOfDay(self):
         #Used for plotting different things
         self.Plot("Positions", "Num", len([x.Symbol for x in self.Portfolio.Values if self.Portfolio[x.Symbol].Invested]))
@@ -41,18 +50,14 @@ class CointegrationAndKalmanFilter(QCAlgorithm):
         self.Plot(f"Margin", "Remaining", self.Portfolio.MarginRemaining)
         self.Plot(f"Cash", "Remaining", self.Portfolio.Cash)
 
+    def OnEndOfAlgorithm(self):
+        self.profiler.Report()
+
         
     def CoarseUniverse(self, coarse):
-        #Rebalance function, only rebalances our univers once pr month
-        if self.Time.month == self.lastMonth:
-            return Universe.Unchanged
-        self.lastMonth = self.Time.month
-
-        #selects stocks based on the stocks having fundamental data, and price over 15 dollars. Sorts it by volume
-        selected = sorted([x for x in coarse if x.HasFundamentalData and x.Price > 15], 
-                        key = lambda x: x.DollarVolume, reverse = True)
-
-        return [x.Symbol for x in selected[:self.num_coarse]]
+        #Rebalance function, only rebalances our univers once pr month. Takes the ones with the most dollar volume
+        symbols = self.coarse_selection.Select(self.Time, coarse, self.num_coarse)
+        return Universe.Unchanged if symbols is None else symbols
     
     def FineUniverse(self, fine):
         #returns only the tickers
@@ -84,31 +89,15 @@ class CointegrationAndKalmanFilter(QCAlgorithm):
 
     def make_and_unstack_dataframe(self, list1):
         #makes and unstacks the dataframe
-        dataframe = self.History(list1, self.lookback, self.resolution)
+        dataframe = HistoryCache.For(self).History(list1, self.lookback, self.resolution)
         dataframe = dataframe['close'].unstack(level=0)
         dataframe = dataframe.dropna(axis=1)
         return dataframe
         
         
     def find_cointegrated_pairs(self, dataframe, critical_level = 0.02):
-        #method to calculate how cointegrated the stocks are
-        n = dataframe.shape[1]
-        pvalue_matrix = np.ones((n, n))
-        keys = dataframe.columns 
-        pairs = []
-        #smart looping technique. Looks at every stocks and tests it cointegration. It is kind of slow though, could be improved. 
-        for i in range(n):
-            for ii in range(i+1, n): 
-                stock1 = dataframe[keys[i]]
-                stock2 = dataframe[keys[ii]]
-                #The cointegration part, that calculates cointegration between 2 stocks
-                result = sm.tsa.stattools.coint(stock1, stock2) 
-                pvalue = result[1] 
-                pvalue_matrix[i, ii] = pvalue
-                if pvalue < critical_level: 
-                    pairs.append((keys[i], keys[ii], pvalue)) 
-
-        return pvalue_matrix, pairs
+        #method to calculate how cointegrated the stocks are. Every pair is tested in one batch, see Cointegration.py
+        return find_cointegrated_pairs(dataframe, critical_level, self.pair_tester)
 
 
 
@@ -132,11 +121,17 @@ class PairsTradingAlpha(AlphaModel):
         #loops through our dictionary
         for key, symbolData in self.pairs.items():
             
-            #uses the function, and gives 3 paramteres
-            df, stock_y, stock_x = self.PairsToListAndHistory(algorithm, symbolData.pair_symbol)
+            #only pairs where both stocks got a new bar have something new to trade on
+            if not symbolData.Updated:
+                continue
+            symbolData.Updated = False
+            stock_y, stock_x = symbolData.pair_symbol
             
-            #calculates the kalman filter, and calculates the spread
-            spread, lower, middle, upper = self.setKalman(df, stock_y, stock_x)
+            #gets the spread and the bands from the kalman filters of the pair, nothing until there are enough spreads to fit them
+            kalman = self.setKalman(symbolData, stock_y, stock_x)
+            if kalman is None:
+                continue
+            spread, lower, middle, upper = kalman
             
             #Sets the prev state, to the state before the trading logic takes place
             previous_state = symbolData.State
@@ -238,11 +233,11 @@ class PairsTradingAlpha(AlphaModel):
             
             #For removing securities in the self.pairs
             for key, symbolData, in self.pairs.items():
-                if security in symbolData.pair_symbol:
+                if security.Symbol in symbolData.pair_symbol:
                     del_keys.append(key)
  
             for key in del_keys:
-                self.pairs.pop(key)
+                self.pairs.pop(key).RemoveConsolidators(algorithm)
                 
         #update the pairs        
         self.UpdatePairs(algorithm)
@@ -255,7 +250,7 @@ class PairsTradingAlpha(AlphaModel):
         #
         #
         #This is maybe wrong logic, have to double check!!!!!
-        for i in range(0, len(symbols), 2):
+        for i in range(0, len(symbols) - 1, 2):
             asset_i = symbols[i]
             
             asset_ii = symbols[i+1]
@@ -265,24 +260,33 @@ class PairsTradingAlpha(AlphaModel):
                 continue
                 
                 #hvis at vores pairs allerede er i eksisterende aktier, så går vi ud af funktionen
-            if pair_symbol in self.pairs.values():
+            #the pair keeps the state of its filters
+            existing = self.pairs.get(i)
+            if existing is not None and set(existing.pair_symbol) == set(pair_symbol):
                 continue
+            if existing is not None:
+                existing.RemoveConsolidators(algorithm)
                 
-            self.pairs[i] = symbolData(pair_symbol)
+            self.pairs[i] = self.AddPair(algorithm, pair_symbol)
         #
         #
         #
         
+    def AddPair(self, algorithm, pair_symbol):
+        #filters the history of a new pair once. After that the consolidators move the filters one bar at a time
+        data = symbolData(pair_symbol, self.lookback)
+        history, stock1, stock2 = self.PairsToListAndHistory(algorithm, pair_symbol)
+        data.WarmUp(history)
+        data.RegisterConsolidators(algorithm, self.resolution)
+        return data
+        
     def PairsToListAndHistory(self, algorithm, pair):
         #set the stocks in the list
         stocks = list(pair)
         stock1 = stocks[0]
         stock2 = stocks[1]
-        #get the price data for the stocks
-        df1 = algorithm.History(stock1, self.lookback, self.resolution)
-        df2 = algorithm.History(stock2, self.lookback, self.resolution)
-        #good solution the melt the dataframes together in a thight and fast way. Uses pandas
-        history = pd.concat([df1, df2], axis=0)
+        #get the price data for both stocks in one request. The cointegration test already fetched them, so it comes from the cache
+        history = HistoryCache.For(algorithm).History([stock1, stock2], self.lookback, self.resolution)
         history = history['close'].unstack(level=0)
         history = history.dropna(axis=1)
         #Return the stock stocks, and the history of the 2 stocks
@@ -290,75 +294,139 @@ class PairsTradingAlpha(AlphaModel):
 
 
     
-    def setKalman(self, df, stock1, stock2):
-        #set the data for the stocks as y and x
-        x = df[stock1]
-        y = df[stock2]
-    
-        #Make a dataframe, that melt them together
-        df1 = pd.DataFrame({'y':y, 'x':x})
-        #Set index
-        df1.index = pd.to_datetime(df1.index)
-    
-        #Get the kalman filter and calculate the spread
-        state_means = self.regression(self.avg(x), self.avg(y))
-        df1['hr'] = - state_means[:, 0]
-        df1['spread'] =  df1.y + (df1.x * df1.hr)
-    
-        #Set theta and mean
-        dt = 1
-        mu = np.average(df1.spread)
-        theta = 1
-        
-        #Set the standard deviation and variance
-        sigma = np.std(df1['spread'])
-        ts = np.arange(0, len(df1['spread'].values), dt)
-        var = np.array([sigma**2 / (2 * theta) * (1-np.exp(-2 * theta * t)) for t in ts])
-        std = 2 * np.sqrt(var)
-        std = std[-1]
+    def setKalman(self, symbolData, stock1, stock2):
+        #the spread with stock1 as x and stock2 as y, and its Ornstein-Uhlenbeck bands. The kalman filters of the pair keep them up to date
+        bands = symbolData.bands[(stock1, stock2)]
+        if not bands.IsReady:
+            return None
         
-        #Calculate the upper and lower threshold
-        upper = mu + std
-        lower = mu - std
+        #theta, mu and sigma are fitted to the spreads over our lookback (see OUBands.py), and the bands are
+        #2 std of the OU variance after as many bars as we have spreads
+        lower, mu, upper = bands.Bands(horizon = len(bands) - 1)
         
         #Return the last spread data, lower, mean and upper
-        return df1.spread[-1], lower, mu, upper
-        
-    #calculate kalman avg
-    def avg(self, x):
-        filter = KalmanFilter(transition_matrices = [1],
-        observation_matrices = [1],
-        initial_state_mean = 0,
-        initial_state_covariance = 1,
-        observation_covariance = 1,
-        transition_covariance = .01)
-        spread, _ = filter.filter(x.values)
-        spread = pd.Series(spread.flatten(), index = x.index)
-        return spread
-    
-    #calculate kalman of the 2 stocks
-    def regression(self, x ,y):
-        x = self.avg(x)
-        y = self.avg(y)
-        filter = KalmanFilter(n_dim_obs = 1, 
-        n_dim_state = 2, 
-        initial_state_mean = [0,0], 
-        initial_state_covariance = np.ones((2, 2)), 
-        transition_matrices = np.eye(2), 
-        observation_matrices = np.expand_dims(np.vstack([[x], [np.ones(len(x))]]).T, axis=1),
-        observation_covariance = 2,
-        transition_covariance = 1e-3 / (1 - 1e-3) * np.eye(2))
-        spread, _ = filter.filter(y.values)
-        return spread
+        return bands.window[-1], lower, mu, upper
 
 
 class symbolData:
     
     #Set the state, pairs and ifInvested
-    def __init__(self, pair_symbol):
+    def __init__(self, pair_symbol, lookback):
         self.pair_symbol = pair_symbol
-        self.State = State.FlatRatio
+        #the trade logic compares the state with ints, State.FlatRatio itself never equals 0
+        self.State = State.FlatRatio.value
         self.IfInvested = 0
+        self.lookback = lookback
+        
+        #The kalman filters of the pair are kept from bar to bar, so a new bar is one predict and correct step.
+        #Every stock is smoothed twice like the pair always has been, so each stock has the state of 2 price filters
+        self.price_means = dict()
+        self.price_covariances = dict()
+        self.closes = dict()
+        self.bar_times = dict()
+        
+        #the hedge ratio is filtered both ways, (x, y) and (y, x), since the order of pair_symbol can flip when trading
+        self.orientations = [tuple(pair_symbol), tuple(pair_symbol)[::-1]]
+        self.hedge_means = None
+        self.hedge_covariances = None
+        #the (time, spread) of both ways over the lookback, and the OU fit of those spreads
+        self.spreads = {orientation: deque() for orientation in self.orientations}
+        self.bands = {orientation: OUBands() for orientation in self.orientations}
+        
+        #True when both stocks got a new bar since the alpha last looked at the pair
+        self.Updated = False
+        self.Consolidators = dict()
+        
+    def RegisterConsolidators(self, algorithm, resolution):
+        for symbol in self.pair_symbol:
+            consolidator = algorithm.ResolveConsolidator(symbol, resolution)
+            consolidator.DataConsolidated += self.consolidation_handler
+            algorithm.SubscriptionManager.AddConsolidator(symbol, consolidator)
+            self.Consolidators[symbol] = consolidator
+            
+    def RemoveConsolidators(self, algorithm):
+        for symbol, consolidator in self.Consolidators.items():
+            algorithm.SubscriptionManager.RemoveConsolidator(symbol, consolidator)
+        self.Consolidators = dict()
+        
+    def WarmUp(self, history):
+        #runs the filters over the whole history, only done when the pair is added
+        smoothed = dict()
+        for symbol in self.pair_symbol:
+            if symbol not in history.columns:
+                continue
+            closes = history[symbol].values
+            first, first_covariance = mean_filter(closes)
+            second, second_covariance = mean_filter(first)
+            self.price_means[symbol] = np.array([first[-1], second[-1]])
+            self.price_covariances[symbol] = np.array([first_covariance[-1], second_covariance[-1]])
+            self.closes[symbol] = closes[-1]
+            self.bar_times[symbol] = history.index[-1]
+            smoothed[symbol] = second
+            
+        #if a stock has no history, the hedge ratio filter starts with its first bar instead
+        if len(smoothed) < 2:
+            return
+            
+        #both ways are filtered in one batch
+        x = np.array([smoothed[stock_x] for stock_x, stock_y in self.orientations])
+        y = np.array([smoothed[stock_y] for stock_x, stock_y in self.orientations])
+        state_means, state_covariances = regression_filter(x, y)
+        self.hedge_means = state_means[:, -1]
+        self.hedge_covariances = state_covariances[:, -1]
+        
+        for k, (stock_x, stock_y) in enumerate(self.orientations):
+            spread = history[stock_y].values - state_means[k, :, 0] * history[stock_x].values
+            self.spreads[(stock_x, stock_y)].extend(zip(history.index, spread))
+            for value in spread:
+                self.bands[(stock_x, stock_y)].Update(value)
+            
+    def consolidation_handler(self, sender, bar):
+        symbol = bar.Symbol
+        #bars the warm up already had
+        if symbol in self.bar_times and bar.EndTime <= self.bar_times[symbol]:
+            return
+            
+        close = float(bar.Close)
+        if symbol in self.price_means:
+            mean, covariance = mean_filter_predict(self.price_means[symbol], self.price_covariances[symbol])
+        else:
+            #same start as mean_filter, the first bar only corrects
+            mean, covariance = np.zeros(2), np.ones(2)
+        #the first filter smooths the close, and the second one smooths the first
+        first, first_covariance = mean_filter_correct(mean[0], covariance[0], close)
+        second, second_covariance = mean_filter_correct(mean[1], covariance[1], first)
+        self.price_means[symbol] = np.array([first, second])
+        self.price_covariances[symbol] = np.array([first_covariance, second_covariance])
+        self.closes[symbol] = close
+        self.bar_times[symbol] = bar.EndTime
+        
+        #the hedge ratio moves when both stocks have their bar for this time
+        if all(self.bar_times.get(stock) == bar.EndTime for stock in self.pair_symbol):
+            self.UpdateHedgeRatio(bar.EndTime)
+            
+    def UpdateHedgeRatio(self, time):
+        x = np.array([self.price_means[stock_x][1] for stock_x, stock_y in self.orientations])
+        y = np.array([self.price_means[stock_y][1] for stock_x, stock_y in self.orientations])
+        if self.hedge_means is None:
+            #same start as regression_filter, the first bar only corrects
+            mean, covariance = np.zeros((2, 2)), np.ones((2, 2, 2))
+        else:
+            mean, covariance = regression_filter_predict(self.hedge_means, self.hedge_covariances)
+        self.hedge_means, self.hedge_covariances = regression_filter_correct(mean, covariance, x, y)
+        
+        for k, (stock_x, stock_y) in enumerate(self.orientations):
+            spreads = self.spreads[(stock_x, stock_y)]
+            bands = self.bands[(stock_x, stock_y)]
+            spread = self.closes[stock_y] - self.hedge_means[k, 0] * self.closes[stock_x]
+            spreads.append((time, spread))
+            bands.Update(spread)
+            #only keeps the spreads inside our lookback, like the history we used to request
+            while spreads[0][0] <= time - self.lookback:
+                spreads.popleft()
+                bands.Pop()
+                
+        self.Updated = True
 
 #The state class
 class State(Enum):
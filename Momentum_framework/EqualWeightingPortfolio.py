@@ -1,6 +1,9 @@
 #region imports
 from AlgorithmImports import *
 #endregion
+from InsightStore import InsightStore
+
+
 class EqualWeightingPortfolio(PortfolioConstructionModel):
 
 
@@ -15,9 +18,53 @@ class EqualWeightingPortfolio(PortfolioConstructionModel):
             rebalance = Extensions.ToTimeSpan(rebalance)
         if isinstance(rebalance, timedelta):
             rebalancingFunc = lambda dt: dt + rebalance
-        if rebalancingFunc:
-            self.SetRebalancingFunc(rebalancingFunc)
-            
+        self.rebalancingFunc = rebalancingFunc
+        self.nextRebalance = None
+
+        #the insights, with their close times in a heap so only the insights that expire are looked at
+        self.insightStore = InsightStore()
+        self.removedSymbols = []
+
+
+    def CreateTargets(self, algorithm, insights):
+        #like the CreateTargets of PortfolioConstructionModel, but with the insights in an InsightStore
+        self.Algorithm = algorithm
+        self.insightStore.AddRange(insights)
+
+        if not self.IsRebalanceDue(insights, algorithm.UtcTime):
+            return []
+
+        #in the order of LEAN: the symbols removed from the universe, the targets of the insights, then the flat targets
+        #of the symbols whose insights all expired
+        targets = [PortfolioTarget(symbol, 0) for symbol in self.removedSymbols]
+        self.removedSymbols = []
+
+        #the newest active insight of each symbol, the store has them in the order they were generated
+        errorSymbols = set()
+        for insight, percent in self.DetermineTargetPercent(self.insightStore.LastActiveInsights(algorithm.UtcTime)).items():
+            target = PortfolioTarget.Percent(algorithm, insight.Symbol, percent)
+            if target is not None:
+                targets.append(target)
+            else:
+                errorSymbols.add(insight.Symbol)
+
+        #symbols whose insights all expired are flattened, unless their target could not be made
+        expired = self.insightStore.RemoveExpiredInsights(algorithm.UtcTime)
+        for symbol in dict.fromkeys(insight.Symbol for insight in expired):
+            if not self.insightStore.HasActiveInsights(symbol, algorithm.UtcTime) and symbol not in errorSymbols:
+                targets.append(PortfolioTarget(symbol, 0))
+        return targets
+
+    def IsRebalanceDue(self, insights, utcTime):
+        if not self.rebalancingFunc:
+            return True
+        if self.nextRebalance is None or utcTime >= self.nextRebalance:
+            self.nextRebalance = self.rebalancingFunc(utcTime)
+            return True
+        #new insights, or insights that expire, rebalance before it is time
+        expiry = self.insightStore.GetNextExpiryTime()
+        return bool(insights) or (expiry is not None and expiry <= utcTime)
+
 
     def DetermineTargetPercent(self, activeInsights):
 
@@ -36,5 +83,10 @@ class EqualWeightingPortfolio(PortfolioConstructionModel):
         return result
 
     def RespectPortfolioBias(self, insight):
-        return self.portfolioBias == PortfolioBias.LongShort or insight.Direction == self.portfolioBias  
+        return self.portfolioBias == PortfolioBias.LongShort or insight.Direction == self.portfolioBias
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        removed = [security.Symbol for security in changes.RemovedSecurities]
+        self.removedSymbols.extend(removed)
+        self.insightStore.Clear(removed)  
 
@@ -0,0 +1,77 @@
+import numpy as np
+
+#The state of indicators after a history of closes, for many symbols at once. closes is a (time x symbol) array
+#like history.close.unstack(level=0), oldest first, and a nan is a missing bar, which the indicator would never have seen.
+#The values are the same as pushing the closes one at a time into the LEAN indicators.
+
+
+def samples(closes):
+    #how many closes every symbol has, the Samples of an indicator fed with them
+    return (~np.isnan(closes)).sum(axis=0)
+
+
+def last_values(closes, count):
+    #the last count closes of every symbol, oldest first, (count x symbol). Symbols with fewer closes are padded with nan at the top
+    closes = np.asarray(closes, dtype=float)
+    valid = ~np.isnan(closes)
+    if valid.all():
+        last = closes[-count:]
+        return np.vstack([np.full((count - len(last), closes.shape[1]), np.nan), last])
+    #a stable sort that puts the missing bars first moves every column's closes to its bottom, in order
+    order = np.argsort(valid, axis=0, kind='stable')
+    packed = np.take_along_axis(closes, order, axis=0)
+    if len(packed) < count:
+        packed = np.vstack([np.full((count - len(packed), closes.shape[1]), np.nan), packed])
+    return packed[-count:]
+
+
+def ema(closes, period):
+    #the exponential moving average, with k = 2 / (period + 1). The first close is taken as it is.
+    #One vectorized step per bar, in the same order of operations as the indicator
+    k = 2.0 / (period + 1)
+    closes = np.asarray(closes, dtype=float)
+    average = np.full(closes.shape[1], np.nan)
+    seen = np.zeros(closes.shape[1], dtype=bool)
+    for row in closes:
+        valid = ~np.isnan(row)
+        average = np.where(valid, np.where(seen, row * k + average * (1 - k), row), average)
+        seen |= valid
+    return average
+
+
+def sma(closes, period):
+    return window_mean(last_values(closes, period))
+
+
+def standard_deviation(closes, period):
+    #the population standard deviation of the last period closes
+    return window_std(last_values(closes, period))
+
+
+def window_mean(window):
+    #mean of the closes of every column of a nan padded window, nan without any
+    count = (~np.isnan(window)).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, np.nansum(window, axis=0) / count, np.nan)
+
+
+def window_std(window):
+    count = (~np.isnan(window)).sum(axis=0)
+    deviation = window - window_mean(window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, np.sqrt(np.nansum(deviation * deviation, axis=0) / count), np.nan)
+
+
+def bollinger(closes, period, k, exponential=False):
+    #lower band, middle band and upper band
+    middle = ema(closes, period) if exponential else sma(closes, period)
+    width = k * standard_deviation(closes, period)
+    return middle - width, middle, middle + width
+
+
+def rate_of_change(closes, period):
+    #(newest - the close period bars before it) / the close period bars before it, 0 when there are not enough closes
+    window = last_values(closes, period + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roc = (window[-1] - window[0]) / window[0]
+    return np.where(np.isnan(roc) | (window[0] == 0), 0.0, roc)
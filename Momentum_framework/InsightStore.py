@@ -0,0 +1,104 @@
+import heapq
+
+
+class InsightStore:
+    #The insights of a portfolio construction model, like an InsightCollection, but it does not scan every insight on every call.
+    #The close times are in a min heap, so removing the expired insights only pops the ones that expired, and the number of
+    #insights of every symbol is counted, so HasActiveInsights is one lookup once the expired insights are removed.
+    #The insights are kept in the order they came in, which is the order they were generated in, so the newest insight
+    #of a symbol is the last one and there is no need to sort them by GeneratedTimeUtc.
+    #Removed insights stay in the heap until they get to the top, and are skipped there
+    def __init__(self):
+        #symbol -> its insights, oldest first
+        self.insights = {}
+        #all the insights, oldest first. A dict used as an ordered set
+        self.generated = {}
+        self.counts = {}
+        #(CloseTimeUtc, number, insight), the number keeps the insights that close at the same time in order
+        self.heap = []
+        self.added = 0
+
+    def __len__(self):
+        return len(self.generated)
+
+    def __iter__(self):
+        return iter(list(self.generated))
+
+    def __contains__(self, insight):
+        return insight in self.generated
+
+    def __getitem__(self, symbol):
+        return list(self.insights[symbol])
+
+    def ContainsKey(self, symbol):
+        return symbol in self.insights
+
+    def Add(self, insight):
+        self.insights.setdefault(insight.Symbol, []).append(insight)
+        self.generated[insight] = None
+        self.counts[insight.Symbol] = self.counts.get(insight.Symbol, 0) + 1
+        #an insight without a close time never expires
+        if insight.CloseTimeUtc is not None:
+            heapq.heappush(self.heap, (insight.CloseTimeUtc, self.added, insight))
+        self.added += 1
+
+    def AddRange(self, insights):
+        for insight in insights:
+            self.Add(insight)
+
+    def Remove(self, insight):
+        if insight not in self.generated:
+            return False
+        del self.generated[insight]
+        insights = self.insights[insight.Symbol]
+        insights.remove(insight)
+        if not insights:
+            del self.insights[insight.Symbol]
+            del self.counts[insight.Symbol]
+        else:
+            self.counts[insight.Symbol] -= 1
+        return True
+
+    def Clear(self, symbols=None):
+        if symbols is None:
+            symbols = list(self.insights)
+        for symbol in symbols:
+            for insight in list(self.insights.get(symbol, [])):
+                self.Remove(insight)
+
+    def GetNextExpiryTime(self):
+        #drops the removed insights on the top of the heap on the way
+        while self.heap and self.heap[0][2] not in self.generated:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def Expiring(self, utcTime):
+        #True if there are insights to remove at utcTime
+        return self.GetNextExpiryTime() is not None and self.heap[0][2].IsExpired(utcTime)
+
+    def RemoveExpiredInsights(self, utcTime):
+        #the expired insights, in the order they closed
+        expired = []
+        while self.Expiring(utcTime):
+            insight = heapq.heappop(self.heap)[2]
+            self.Remove(insight)
+            expired.append(insight)
+        return expired
+
+    def HasActiveInsights(self, symbol, utcTime):
+        if not self.Expiring(utcTime):
+            return self.counts.get(symbol, 0) > 0
+        return any(insight.IsActive(utcTime) for insight in self.insights.get(symbol, []))
+
+    def GetActiveInsights(self, utcTime):
+        #the active insights, oldest first
+        if not self.Expiring(utcTime):
+            return list(self.generated)
+        return [insight for insight in self.generated if insight.IsActive(utcTime)]
+
+    def LastActiveInsights(self, utcTime):
+        #the newest active insight of every symbol
+        last = {}
+        for insight in self.GetActiveInsights(utcTime):
+            last[insight.Symbol] = insight
+        return list(last.values())
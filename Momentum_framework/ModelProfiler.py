@@ -0,0 +1,174 @@
+import cProfile
+import heapq
+import io
+import json
+import pstats
+import time
+
+#the methods of the framework models that are timed. Update, CreateTargets and ManageRisk count the insights or targets
+#they return, Execute counts the targets it gets
+METHODS = ('Update', 'CreateTargets', 'ManageRisk', 'Execute', 'OnSecuritiesChanged')
+OUTPUTS = ('Update', 'CreateTargets', 'ManageRisk')
+
+#latency histogram buckets. Bucket 0 is under 1 us, bucket k is [2^(k-1), 2^k) us, the last one is everything above
+BUCKETS = 28
+
+
+class CallStats:
+    #the calls of one method of one model
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.histogram = [0] * BUCKETS
+        #insights or targets
+        self.outputs = 0
+        #the History calls made inside the method, the rows they returned and the time they took
+        self.history_calls = 0
+        self.history_rows = 0
+        self.history_seconds = 0.0
+        #min heap of (seconds, call number, algorithm time, profile text) of the slowest profiled calls
+        self.slowest = []
+
+    def Add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        self.histogram[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def Percentile(self, q):
+        #the upper edge of the bucket the q'th quantile falls in, in seconds. Good to a factor of 2, like the histogram
+        if self.count == 0:
+            return 0.0
+        seen = 0
+        for k, count in enumerate(self.histogram):
+            seen += count
+            if seen >= q * self.count:
+                return min(2 ** k / 1e6, self.max)
+        return self.max
+
+    def ToDict(self):
+        return {'name': self.name,
+                'calls': self.count,
+                'total_seconds': self.seconds,
+                'mean_ms': 1000 * self.seconds / self.count if self.count else 0.0,
+                'p50_ms': 1000 * self.Percentile(0.5),
+                'p95_ms': 1000 * self.Percentile(0.95),
+                'p99_ms': 1000 * self.Percentile(0.99),
+                'max_ms': 1000 * self.max,
+                'histogram_us': {('<1' if k == 0 else f'<{2 ** k}' if k < BUCKETS - 1 else f'>={2 ** (k - 1)}'): count
+                                 for k, count in enumerate(self.histogram) if count},
+                'outputs': self.outputs,
+                'history_calls': self.history_calls,
+                'history_rows': self.history_rows,
+                'history_seconds': self.history_seconds,
+                'slowest': [{'seconds': seconds, 'time': when, 'profile': text}
+                            for seconds, number, when, text in sorted(self.slowest, reverse = True)]}
+
+
+class ModelProfiler:
+    #Opt-in timing of the framework models. Wrap a model before it is handed to the algorithm, and every call of its
+    #framework methods (see METHODS) is timed into a latency histogram, with its call count, how many insights or targets it made
+    #and how many History calls it made. With profile_slowest = n every call also runs under cProfile, and the profiles of the
+    #n slowest calls of each method are kept. Report, from OnEndOfAlgorithm, logs a table and saves it all as json to the
+    #object store of the project, under key.
+    #When it is not enabled Wrap hands the model back untouched and History is not wrapped, so it costs nothing at all.
+    #Only python models can be wrapped, the C# ones of LEAN (like ImmediateExecutionModel on QuantConnect) are left alone
+    def __init__(self, algorithm, enabled=False, profile_slowest=0, key='model_profile.json'):
+        self.algorithm = algorithm
+        self.enabled = enabled
+        self.profile_slowest = profile_slowest
+        self.key = key
+        self.stats = {}
+        #the methods running right now, the History calls are put on the innermost one
+        self.running = []
+        #History calls made outside of the models, like in universe selection
+        self.outside = CallStats('Algorithm')
+        if enabled:
+            self.WrapHistory()
+
+    def Wrap(self, model):
+        if not self.enabled:
+            return model
+        for method in METHODS:
+            function = getattr(model, method, None)
+            if function is None:
+                continue
+            name = f'{type(model).__name__}.{method}'
+            try:
+                setattr(model, method, self.Timed(name, method, function))
+            except (AttributeError, TypeError):
+                self.algorithm.Debug(f'ModelProfiler: can not time {name}')
+        return model
+
+    def Timed(self, name, method, function):
+        stats = self.stats.setdefault(name, CallStats(name))
+        outputs = method in OUTPUTS
+        executes = method == 'Execute'
+
+        def timed(*args):
+            profile = cProfile.Profile() if self.profile_slowest else None
+            self.running.append(stats)
+            start = time.perf_counter()
+            try:
+                result = function(*args) if profile is None else profile.runcall(function, *args)
+            finally:
+                seconds = time.perf_counter() - start
+                self.running.pop()
+            stats.Add(seconds)
+            if outputs and result is not None:
+                stats.outputs += len(result)
+            elif executes:
+                stats.outputs += len(args[-1])
+            if profile is not None:
+                self.KeepProfile(stats, seconds, profile)
+            return result
+
+        return timed
+
+    def KeepProfile(self, stats, seconds, profile):
+        if len(stats.slowest) == self.profile_slowest and seconds <= stats.slowest[0][0]:
+            return
+        text = io.StringIO()
+        pstats.Stats(profile, stream = text).sort_stats('cumulative').print_stats(20)
+        entry = (seconds, stats.count, str(self.algorithm.Time), text.getvalue())
+        if len(stats.slowest) < self.profile_slowest:
+            heapq.heappush(stats.slowest, entry)
+        else:
+            heapq.heapreplace(stats.slowest, entry)
+
+    def WrapHistory(self):
+        #counts the History calls, and the rows they return, on the model method that made them
+        history = self.algorithm.History
+
+        def counted(*args, **kwargs):
+            start = time.perf_counter()
+            result = history(*args, **kwargs)
+            stats = self.running[-1] if self.running else self.outside
+            stats.history_seconds += time.perf_counter() - start
+            stats.history_calls += 1
+            stats.history_rows += len(result)
+            return result
+
+        self.algorithm.History = counted
+
+    def Report(self):
+        if not self.enabled:
+            return
+        stats = sorted(self.stats.values(), key = lambda x: x.seconds, reverse = True)
+        if self.outside.history_calls:
+            stats.append(self.outside)
+
+        self.algorithm.Log(f"{'call':<55} {'calls':>7} {'total s':>8} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+                           f"{'out':>7} {'history':>7} {'rows':>9} {'hist s':>7}")
+        for x in stats:
+            row = x.ToDict()
+            self.algorithm.Log(f"{x.name:<55} {x.count:>7} {x.seconds:>8.3f} {row['mean_ms']:>8.3f} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} "
+                               f"{row['max_ms']:>8.3f} {x.outputs:>7} {x.history_calls:>7} {x.history_rows:>9} {x.history_seconds:>7.3f}")
+
+        if self.key:
+            try:
+                self.algorithm.ObjectStore.Save(self.key, json.dumps([x.ToDict() for x in stats], indent = 1))
+            except Exception as error:
+                self.algorithm.Debug(f'ModelProfiler: could not save {self.key}: {error}')
@@ -0,0 +1,100 @@
+import numpy as np
+
+from IndicatorWarmUp import last_values, samples
+
+
+class MomentumEngine:
+    #The rate of change over lookback bars of every symbol, like one RateOfChange indicator per symbol, but with
+    #all the closes in one (symbol x lookback + 1) matrix. Every row is a ring buffer, so its oldest close is the one
+    #lookback bars ago, and the rate of change of all the symbols is one vectorized operation
+    def __init__(self, lookback):
+        self.lookback = lookback
+        self.size = lookback + 1
+        self.rows = {}
+        self.free_rows = []
+        self.closes = np.full((0, self.size), np.nan)
+        #the column the next close of every row goes to
+        self.heads = np.zeros(0, dtype=int)
+        #how many closes every row has had, like the Samples of the indicator, and how many it had when it was last ranked
+        self.samples = np.zeros(0, dtype=int)
+        self.ranked = np.zeros(0, dtype=int)
+
+    def __contains__(self, symbol):
+        return symbol in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def Add(self, symbol):
+        if not self.free_rows:
+            #double the matrix when we run out of rows
+            size = len(self.heads)
+            grow = max(size, 8)
+            self.free_rows.extend(range(size + grow - 1, size - 1, -1))
+            self.closes = np.vstack([self.closes, np.full((grow, self.size), np.nan)])
+            self.heads = np.concatenate([self.heads, np.zeros(grow, dtype=int)])
+            self.samples = np.concatenate([self.samples, np.zeros(grow, dtype=int)])
+            self.ranked = np.concatenate([self.ranked, np.zeros(grow, dtype=int)])
+
+        row = self.rows[symbol] = self.free_rows.pop()
+        self.closes[row] = np.nan
+        self.heads[row] = 0
+        self.samples[row] = 0
+        self.ranked[row] = 0
+        return row
+
+    def Remove(self, symbol):
+        row = self.rows.pop(symbol, None)
+        if row is not None:
+            self.free_rows.append(row)
+
+    def Push(self, symbol, close):
+        #one new close, from the consolidator of the symbol
+        row = self.rows.get(symbol)
+        if row is None:
+            return
+        self.closes[row, self.heads[row]] = close
+        self.heads[row] = (self.heads[row] + 1) % self.size
+        self.samples[row] += 1
+
+    def WarmUp(self, symbols, closes):
+        #closes is the (time x symbol) history of the symbols, oldest first, like history.close.unstack(level = 0).
+        #All the rows are set in one go, as if every close had been pushed
+        rows = np.array([self.rows[symbol] if symbol in self.rows else self.Add(symbol) for symbol in symbols], dtype=int)
+        closes = np.asarray(closes, dtype=float)
+        counts = samples(closes)
+        filled = np.minimum(counts, self.size)
+        last = last_values(closes, self.size)
+        self.closes[rows] = np.nan
+        for k in range(1, self.size + 1):
+            has = filled >= k
+            self.closes[rows[has], filled[has] - k] = last[-k, has]
+        self.heads[rows] = filled % self.size
+        self.samples[rows] += counts
+
+    def Returns(self, rows):
+        #the rate of change of the rows, (newest - oldest) / oldest. Only meaningful for full rows
+        newest = self.closes[rows, (self.heads[rows] - 1) % self.size]
+        oldest = self.closes[rows, self.heads[rows]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(oldest != 0, (newest - oldest) / oldest, 0.0)
+
+    def Top(self, count):
+        #the count symbols with the highest rate of change, highest first, with their rate of change.
+        #Like the indicators, a symbol is only ranked when it is ready and has had a new close since it was last ranked
+        symbols = list(self.rows)
+        rows = np.fromiter(self.rows.values(), dtype=int, count=len(symbols))
+        new = self.samples[rows] != self.ranked[rows]
+        self.ranked[rows] = self.samples[rows]
+        candidates = np.flatnonzero(new & (self.samples[rows] > self.lookback))
+        if count <= 0 or len(candidates) == 0:
+            return []
+
+        returns = self.Returns(rows[candidates])
+        if count < len(candidates):
+            #everything tied with the smallest kept return is kept, so ties go to the first symbols like a stable sort
+            kth = np.partition(-returns, count - 1)[count - 1]
+            keep = -returns <= kth
+            candidates, returns = candidates[keep], returns[keep]
+        order = np.argsort(-returns, kind='stable')[:count]
+        return [(symbols[candidates[k]], float(returns[k])) for k in order]
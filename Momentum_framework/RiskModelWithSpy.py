@@ -1,6 +1,7 @@
 #region imports
 from AlgorithmImports import *
 #endregion
+from HistoryCache import HistoryCache
 class RiskModelWithSpy(RiskManagementModel):
     
     def __init__(self, algorithm, spy, lookback,  resolution):
@@ -43,8 +44,8 @@ class EMASymbolData:
         self.EMA = ExponentialMovingAverage(smaName, lookback)
         algorithm.RegisterIndicator(symbol, self.EMA, self.Consolidator)
         
-        history = algorithm.History(symbol, lookback, resolution)
+        history = HistoryCache.For(algorithm).History(symbol, lookback, resolution)
         if 'close' in history:
             history = history.close.unstack(0).squeeze()
-            for time, value in history.iteritems():
+            for time, value in history.items():
                 self.EMA.Update(time, value)
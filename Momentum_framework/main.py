@@ -3,6 +3,9 @@ from datetime import timedelta, time, datetime
 from MomentumAlphaModel import MomentumAlphaModel
 from EqualWeightingPortfolio import EqualWeightingPortfolio
 from RiskModelWithSpy import RiskModelWithSpy
+from HistoryCache import HistoryCache
+from CoarseSelection import CoarseSelection
+from ModelProfiler import ModelProfiler
 
 class MomentumFrameworkAlgo(QCAlgorithm):
     def Initialize(self):
@@ -19,28 +22,30 @@ class MomentumFrameworkAlgo(QCAlgorithm):
         self.SetBenchmark('SPY')
         
         self.spy = self.AddEquity('SPY', Resolution.Hour)
+        #one history cache for all the models. SPY trades every day, so it is the clock the cache counts bars by
+        HistoryCache.For(self, clock = self.spy.Symbol)
         
         self.AddUniverse(self.CoarseUniverse)
+        #times the framework models, see ModelProfiler. enabled = True to get the report at the end of the backtest
+        self.profiler = ModelProfiler(self, enabled = False)
         pcm = EqualWeightingPortfolio(Expiry.EndOfMonth)
-        self.SetPortfolioConstruction(pcm)
-        self.SetExecution(ImmediateExecutionModel())
-        self.AddAlpha(MomentumAlphaModel(lookback=203, resolution=Resolution.Daily)) 
-        self.AddRiskManagement(RiskModelWithSpy(self, self.spy, 200, Resolution.Daily))
+        self.SetPortfolioConstruction(self.profiler.Wrap(pcm))
+        self.SetExecution(self.profiler.Wrap(ImmediateExecutionModel()))
+        self.AddAlpha(self.profiler.Wrap(MomentumAlphaModel(lookback=203, resolution=Resolution.Daily)))
+        self.AddRiskManagement(self.profiler.Wrap(RiskModelWithSpy(self, self.spy, 200, Resolution.Daily)))
         
         self.num_coarse = 45
-        self.lastMonth = -1
+        self.coarse_selection = CoarseSelection(min_price = 10)
 
     def CoarseUniverse(self, coarse):
-        if self.Time.month == self.lastMonth: 
-            return Universe.Unchanged
-        self.lastMonth = self.Time.month
-        
-        selected = sorted([x for x in coarse if x.HasFundamentalData and x.Price > 10], key = lambda x: x.DollarVolume, reverse=True)
-        
-        return [x.Symbol for x in selected[:self.num_coarse]]
+        symbols = self.coarse_selection.Select(self.Time, coarse, self.num_coarse)
+        return Universe.Unchanged if symbols is None else symbols
 
     def OnEndOfDay(self):
         self.Plot("Positions", "Num", len([x.Symbol for x in self.Portfolio.Values if self.Portfolio[x.Symbol].Invested]))
         self.Plot(f"Margin", "Used", self.Portfolio.TotalMarginUsed)
         self.Plot(f"Margin", "Remaning", self.Portfolio.MarginRemaining)
         self.Plot(f"Cash", "Remaining", self.Portfolio.Cash)
+
+    def OnEndOfAlgorithm(self):
+        self.profiler.Report()
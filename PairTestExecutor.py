@@ -0,0 +1,82 @@
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from Cointegration import engle_granger_pvalues, default_maxlag
+
+#how many pairs one task gets. Big enough that the per task overhead does not matter
+TASK_SIZE = 4000
+
+
+def test_chunk(name, shape, dtype, left, right, maxlag):
+    #runs in the worker. Reads the price panel straight out of the shared memory block, so nothing big is pickled
+    block = shared_memory.SharedMemory(name=name)
+    prices = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    pvalues = engle_granger_pvalues(prices, left, right, maxlag)
+
+    #the view has to be gone before we can close the block
+    del prices
+    block.close()
+    return pvalues
+
+
+class PairTestExecutor:
+    #Pluggable engine for the cointegration screen. Splits the pairs into chunks and runs them on a bounded process pool.
+    #With workers=1 the same chunks are run in this process, so the output is exactly the same
+    def __init__(self, workers=1, task_size=TASK_SIZE):
+        self.workers = max(1, int(workers))
+        self.task_size = task_size
+        self.pool = None
+
+    def chunks(self, left, right):
+        #the pairs come in upper triangular order, and the chunks keep that order
+        for start in range(0, len(left), self.task_size):
+            yield left[start:start + self.task_size], right[start:start + self.task_size]
+
+    def pvalues(self, prices, left, right):
+        prices = np.ascontiguousarray(prices, dtype=float)
+        left = np.asarray(left)
+        right = np.asarray(right)
+        if len(left) == 0:
+            return np.empty(0)
+
+        #maxlag depends on the length of the panel, so we set it once for every chunk
+        maxlag = default_maxlag(prices.shape[0])
+
+        if self.workers == 1 or len(left) <= self.task_size:
+            results = [engle_granger_pvalues(prices, l, r, maxlag) for l, r in self.chunks(left, right)]
+            return np.concatenate(results)
+
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        #copy the panel into shared memory once, the workers only get its name
+        block = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+        shared = np.ndarray(prices.shape, dtype=prices.dtype, buffer=block.buf)
+        shared[:] = prices
+        del shared
+        try:
+            futures = [self.pool.submit(test_chunk, block.name, prices.shape, prices.dtype, l, r, maxlag)
+                        for l, r in self.chunks(left, right)]
+
+            #merge in the order we submitted, not the order they finish
+            results = [future.result() for future in futures]
+        finally:
+            block.close()
+            block.unlink()
+
+        return np.concatenate(results)
+
+    def start(self):
+        #starts the pool and every one of its workers now, instead of on the first screen that needs them.
+        #The pool only starts a worker when a task finds no idle one, so each worker gets a task that waits a bit
+        if self.workers == 1 or self.pool is not None:
+            return
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        for future in [self.pool.submit(time.sleep, 0.1) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,146 @@
+import numpy as np
+from scipy.stats import norm
+from statsmodels.tsa import adfvalues
+
+#same threshold statsmodels uses in coint to flag (almost) perfectly colinear series
+SQRTEPS = np.sqrt(np.finfo(np.double).eps)
+
+#how many pairs we push through the ADF step at once. Keeps the lag tensors at a few hundred MB at most
+CHUNK_SIZE = 2000
+
+
+def pair_indices(n):
+    #every (i, ii) with i < ii, in the same order as the nested loops in the frameworks
+    return np.triu_indices(n, k=1)
+
+
+def default_maxlag(nobs):
+    #same default as adfuller with regression="n"
+    maxlag = int(np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0)))
+    return min(nobs // 2 - 1, maxlag)
+
+
+def mackinnon_pvalues(stats, regression="c", N=2):
+    #vectorized version of statsmodels mackinnonp, uses the same tables
+    stats = np.asarray(stats, dtype=float)
+    maxstat = adfvalues._tau_maxs[regression][N - 1]
+    minstat = adfvalues._tau_mins[regression][N - 1]
+    starstat = adfvalues._tau_stars[regression][N - 1]
+    small = np.polyval(adfvalues._tau_smallps[regression][N - 1][::-1], stats)
+    large = np.polyval(adfvalues._tau_largeps[regression][N - 1][::-1], stats)
+
+    with np.errstate(invalid="ignore"):
+        pvalues = norm.cdf(np.where(stats <= starstat, small, large))
+    pvalues = np.where(stats > maxstat, 1.0, pvalues)
+    pvalues = np.where(stats < minstat, 0.0, pvalues)
+    return pvalues
+
+
+def first_stage_residuals(centered, cov, left, right):
+    #all the first stage OLS (y0 = a + b * y1) at once, read off the covariance matrix of the price panel
+    variance = np.diag(cov)
+    beta = cov[left, right] / variance[right]
+    rsquared = cov[left, right] ** 2 / (variance[left] * variance[right])
+
+    #the intercept is gone when we work on centered prices, so the residuals are just this
+    resid = centered[:, left] - centered[:, right] * beta
+    return resid, rsquared
+
+
+def lag_design(resid, maxlag):
+    #builds the ADF regressors [x(t-1), dx(t-1), ..., dx(t-maxlag)] for every residual series. Shape (pairs, nobs, maxlag + 1)
+    diff = np.diff(resid, axis=0)
+    nobs = diff.shape[0] - maxlag
+    columns = [resid[maxlag:-1]]
+    for lag in range(1, maxlag + 1):
+        columns.append(diff[maxlag - lag:-lag])
+    design = np.stack(columns, axis=-1).transpose(1, 0, 2)
+    endog = diff[maxlag:].T
+    return design, endog, nobs
+
+
+def best_lags(resid, maxlag):
+    #picks the lag length by AIC, like adfuller(autolag="AIC") does. All lags are fitted on the same sample
+    design, endog, nobs = lag_design(resid, maxlag)
+    gram = np.einsum("kti,ktj->kij", design, design)
+    xy = np.einsum("kti,kt->ki", design, endog)
+    yy = np.einsum("kt,kt->k", endog, endog)
+
+    #the regressions are nested, so one cholesky gives the ssr of every lag length
+    chol = np.linalg.cholesky(gram)
+    z = np.linalg.solve(chol, xy[..., None])[..., 0]
+    ssr = yy[:, None] - np.cumsum(z ** 2, axis=1)
+
+    #aic without the constants that are the same for every lag
+    nparams = np.arange(1, maxlag + 2)
+    aic = nobs * np.log(ssr / nobs) + 2 * nparams
+    return np.argmin(aic, axis=1)
+
+
+def adf_tstats(resid, lags):
+    #fits the final ADF regression for each residual with its own lag length, grouped so every group is one batched solve
+    tstats = np.empty(resid.shape[1])
+    for lag in np.unique(lags):
+        members = np.flatnonzero(lags == lag)
+        design, endog, nobs = lag_design(resid[:, members], lag)
+        gram = np.einsum("kti,ktj->kij", design, design)
+        xy = np.einsum("kti,kt->ki", design, endog)
+
+        inverse = np.linalg.inv(gram)
+        params = np.einsum("kij,kj->ki", inverse, xy)
+        fitted = np.einsum("kti,ki->kt", design, params)
+        sigma2 = ((endog - fitted) ** 2).sum(axis=1) / (nobs - (lag + 1))
+        tstats[members] = params[:, 0] / np.sqrt(sigma2 * inverse[:, 0, 0])
+    return tstats
+
+
+def engle_granger_pvalues(prices, left, right, maxlag=None, chunk_size=CHUNK_SIZE):
+    #same p-values as sm.tsa.stattools.coint(prices[:, left], prices[:, right]) for every pair, without the python loop
+    prices = np.asarray(prices, dtype=float)
+    left = np.asarray(left)
+    right = np.asarray(right)
+    if maxlag is None:
+        maxlag = default_maxlag(prices.shape[0])
+
+    #one covariance matrix of the whole panel holds every first stage regression
+    centered = prices - prices.mean(axis=0)
+    cov = centered.T @ centered
+
+    pvalues = np.empty(len(left))
+    for start in range(0, len(left), chunk_size):
+        stop = start + chunk_size
+        resid, rsquared = first_stage_residuals(centered, cov, left[start:stop], right[start:stop])
+
+        #(almost) colinear pairs get a t-stat of -inf in coint, so a pvalue of 0
+        tstats = np.full(resid.shape[1], -np.inf)
+        valid = rsquared < 1 - 100 * SQRTEPS
+        if valid.any():
+            resid = resid[:, valid]
+            tstats[valid] = adf_tstats(resid, best_lags(resid, maxlag))
+
+        pvalues[start:stop] = mackinnon_pvalues(tstats, regression="c", N=2)
+    return pvalues
+
+
+def find_cointegrated_pairs(dataframe, critical_level=0.02, tester=None):
+    #drop in for the looping version in the frameworks. Returns the same pvalue matrix and pairs
+    #tester is anything with a pvalues(prices, left, right) method, like PairTestExecutor
+    n = dataframe.shape[1]
+    keys = dataframe.columns
+    pvalue_matrix = np.ones((n, n))
+    pairs = []
+    if n < 2:
+        return pvalue_matrix, pairs
+
+    left, right = pair_indices(n)
+    if tester is None:
+        pvalues = engle_granger_pvalues(dataframe.values, left, right)
+    else:
+        pvalues = tester.pvalues(dataframe.values, left, right)
+    pvalue_matrix[left, right] = pvalues
+
+    for i, ii, pvalue in zip(left, right, pvalues):
+        if pvalue < critical_level:
+            pairs.append((keys[i], keys[ii], pvalue))
+
+    return pvalue_matrix, pairs
@@ -5,15 +5,35 @@ from QuantConnect import Resolution, Extensions
 from QuantConnect.Algorithm.Framework.Alphas import *
 from QuantConnect.Algorithm.Framework.Portfolio import *
 from itertools import groupby
+from InsightBook import InsightBook
 from datetime import datetime, timedelta
 from pytz import utc
 UTCMIN = datetime.min.replace(tzinfo=utc)
 #endregion
+#the targets are tagged with the GroupId of the pair they are for, so the execution model can send the legs together
+def GroupTag(groupId):
+    return '' if groupId is None else str(groupId)
+
+
 class EqualWeightedPairsTradingPortfolio(PortfolioConstructionModel):
-    def __init__(self):
+    def __init__(self, tolerance = 0.0, rebalance = None):
         
-        self.insightCollection = InsightCollection()
+        self.insightCollection = InsightBook()
         self.removedSymbols = []
+
+        #the last weight we sent out for every symbol. A target is only sent again when the weight of the symbol has moved
+        #more than tolerance, except on the rebalance days where all of them are sent, so the positions follow the prices
+        self.tolerance = tolerance
+        self.lastWeights = {}
+
+        #rebalance is a Resolution, a timedelta or a function of the time that gives the next rebalance time, None never forces it
+        rebalancingFunc = rebalance
+        if isinstance(rebalance, int):
+            rebalance = Extensions.ToTimeSpan(rebalance)
+        if isinstance(rebalance, timedelta):
+            rebalancingFunc = lambda dt: dt + rebalance
+        self.rebalancingFunc = rebalancingFunc
+        self.nextRebalance = None
         
 
     def CreateTargets(self, algorithm, insights):
@@ -34,60 +54,32 @@ class EqualWeightedPairsTradingPortfolio(PortfolioConstructionModel):
 
             self.removedSymbols = []
 
-            pop_insights = []
+            liquidated = set()
             #If we have something in the universeDeselectionTargets
             if universeDeselectionTargets:
                 #loop over the targets
                 for target in universeDeselectionTargets:
-                    #If the symbol is in our insightCollection then we have to remove that insight
-                    if self.insightCollection.ContainsKey(target.Symbol):
-                        #Get a list of the insights (there maybe more than 1)
-                        insights_list = self.insightCollection[target.Symbol]
-                        #loop over the insights
-                        for insight in insights_list:
-                            #loop over the insights in insightcollection
-                            for insightCollection in self.insightCollection:
-                                #if the insights have been send together (.GroupId), we liquidate both stocks and send the insights to a list, to remove those insights from the collection
-                                if insight.GroupId == insightCollection.GroupId:
-                                    targets.extend([PortfolioTarget(insight.Symbol, 0)] + [PortfolioTarget(insightCollection.Symbol, 0)])
-                                    pop_insights.extend([insight] + [insightCollection])
-
-            for insight in pop_insights:
-                self.insightCollection.Remove(insight)
-        
+                    #the insights that have been send together with the symbols insights (.GroupId) are found in the book,
+                    #we liquidate all the stocks of those groups and remove their insights from the book
+                    for groupId in self.insightCollection.GroupsOf(target.Symbol):
+                        for insight in self.insightCollection.RemoveGroup(groupId):
+                            if insight.Symbol not in liquidated:
+                                liquidated.add(insight.Symbol)
+                                targets.append(PortfolioTarget(insight.Symbol, 0, GroupTag(groupId)))
+                                self.lastWeights[insight.Symbol] = 0
+
         #Get the expired insights
         expiredInsights = self.insightCollection.RemoveExpiredInsights(algorithm.UtcTime)
 
         #loop over the insights. If the symbol does NOT have an active insight, we can liquidate this stock
         for symbol, f in groupby(expiredInsights, lambda x: x.Symbol):
             if not self.insightCollection.HasActiveInsights(symbol, algorithm.UtcTime):
-                targets.append(PortfolioTarget(symbol, 0))
+                targets.append(PortfolioTarget(symbol, 0, GroupTag(list(f)[-1].GroupId)))
+                self.lastWeights[symbol] = 0
         
-        # get insight that have not expired of each symbol that is still in the universe
-        activeInsights = self.insightCollection.GetActiveInsights(algorithm.UtcTime)
-
-        #sort by the most recent insight generated, so it is only the first insights being generated that is being used
-        lastActiveInsights = sorted(activeInsights, key= lambda x: x.GeneratedTimeUtc, reverse=True)
-
-        #get the len of the active insights, and loop over the insights 
-        pairs = {}
-        for i in range(len(lastActiveInsights)):
-            for ii in range(i+1, len(lastActiveInsights)):
-                #get the insights
-                insight_i = lastActiveInsights[i]
-                insight_ii = lastActiveInsights[ii]
-                
-                #get the pairs
-                pairs_symbol = (insight_i.Symbol, insight_ii.Symbol)
-                invert = (insight_ii.Symbol, insight_i.Symbol)
-
-                #if the stocks is already in the pairs, continue
-                if pairs_symbol in pairs or invert in pairs:
-                    continue
-                
-                #If the insights is of the same groupId, we know that these belong together, so we append to the pairs
-                if insight_i.GroupId == insight_ii.GroupId:
-                    pairs[(pairs_symbol)] = [insight_i.Direction, insight_ii.Direction]                
+        #the directions of the pairs, one lookup per group. If two stocks are in more than one group together, it is only
+        #the most recent group being used
+        pairs = self.insightCollection.Pairs(algorithm.UtcTime)
 
         #Here, we calculated the score of the insights
         calculatedTargets = {}
@@ -107,13 +99,29 @@ class EqualWeightedPairsTradingPortfolio(PortfolioConstructionModel):
         if weightSums > 1:
             weightFactor = 1 / weightSums
 
+        #on the rebalance days every target is sent, otherwise only the ones whose weight changed
+        refresh = self.IsRebalanceDue(algorithm.UtcTime)
+
         #Send the portfolio targets out, with the correct allocation percent, and append to the targets
         for symbol, weight in calculatedTargets.items():
             allocationPercent = weight * weightFactor
-            target = PortfolioTarget.Percent(algorithm, symbol, allocationPercent)
-            targets.append(target)
+            lastWeight = self.lastWeights.get(symbol)
+            if not refresh and lastWeight is not None and abs(allocationPercent - lastWeight) <= self.tolerance:
+                continue
+            target = PortfolioTarget.Percent(algorithm, symbol, allocationPercent, tag = GroupTag(self.insightCollection.NewestGroup(symbol)))
+            if target is not None:
+                targets.append(target)
+                self.lastWeights[symbol] = allocationPercent
 
         return targets
+
+    def IsRebalanceDue(self, utcTime):
+        if self.rebalancingFunc is None:
+            return False
+        if self.nextRebalance is None or utcTime >= self.nextRebalance:
+            self.nextRebalance = self.rebalancingFunc(utcTime)
+            return True
+        return False
         
     def OnSecuritiesChanged(self, algorithm, changes):
         
@@ -126,4 +134,6 @@ class EqualWeightedPairsTradingPortfolio(PortfolioConstructionModel):
         #remove insights that have not been invested in anymore
         not_invested_symbols = [symbol for symbol in self.removedSymbols if not algorithm.Portfolio[symbol].Invested]
         self.insightCollection.Clear(not_invested_symbols)
+        for symbol in not_invested_symbols:
+            self.lastWeights.pop(symbol, None)
             
@@ -1,22 +1,131 @@
 from AlgorithmImports import *
+from OrderPlanner import OrderPlanner
 
 class MarketOrderModel(ExecutionModel):
 
     def __init__(self):
         self.targetsCollection = PortfolioTargetCollection()
+        self.planner = OrderPlanner()
 
     def Execute(self, algorithm, targets):
 
-        # for performance we check count value, OrderByMarginImpact and ClearFulfilled are expensive to call
+        # for performance we check count value, the planner sizes all the targets from one snapshot of the holdings and open orders
         self.targetsCollection.AddRange(targets)
         if self.targetsCollection.Count > 0:
-            for target in self.targetsCollection.OrderByMarginImpact(algorithm):
-                security = algorithm.Securities[target.Symbol]
-                # calculate remaining quantity to be ordered
-                quantity = OrderSizing.GetUnorderedQuantity(algorithm, target, security)
-                if quantity != 0:
+            orders, fulfilled = self.planner.Plan(algorithm, self.targetsCollection)
+            for target, security, quantity in orders:
+                # the minimum order margin is left to the buying power model, with the portfolio value after the orders before it
+                aboveMinimumPortfolio = BuyingPowerModelExtensions.AboveMinimumOrderMarginPortfolioPercentage(security.BuyingPowerModel, security, quantity, algorithm.Portfolio, algorithm.Settings.MinimumOrderMarginPortfolioPercentage)
+                if aboveMinimumPortfolio:
+                    ticket = algorithm.MarketOrder(security, quantity)
+                    # the whole unordered quantity is now held or open, unless the order was not accepted
+                    if ticket.Status != OrderStatus.Invalid:
+                        fulfilled.append(target.Symbol)
+
+            for symbol in fulfilled:
+                self.targetsCollection.Remove(symbol)
+
+
+class PairExecutionModel(MarketOrderModel):
+    #Market orders that keep the legs of a pair together.
+    #The portfolio model tags the targets with the GroupId of their pair, and the legs of a pair are sent back to back,
+    #at the place of the first of them in margin impact order. They are sent asynchronously, so a leg does not wait for
+    #the fill of the leg before it.
+    #Every leg is followed until it fills: the time from its order to its fill, and the time between the first and the
+    #last fill of the legs of a pair (the leg gap, what the spread can move while we are half in) are kept, and shown
+    #as runtime statistics. A leg whose order is canceled or invalid goes back in the targets, and the next Execute orders
+    #what is left of it. The batch it was in has no gap then, the time to the fill of its new order is not the time between
+    #two orders sent together, so the gap of that batch is skipped and counted in skippedGaps.
+    #A batch is one submission: the legs of a pair ordered by a later Execute, while the earlier ones still wait, are a
+    #new batch, so their fills and cancels never mix with the earlier ones
+    def __init__(self):
+        super().__init__()
+        #order id -> (target, batch, time sent) of the legs that have not filled yet
+        self.legs = {}
+        #(tag or symbol, submission) -> (the order ids of its legs that have not filled, the fill times of the ones that did, the order ids of
+        #the ones that were canceled or invalid)
+        self.batches = {}
+        self.submissions = 0
+        #in seconds
+        self.legLatencies = []
+        self.legGaps = []
+        self.skippedGaps = 0
+
+    def Execute(self, algorithm, targets):
+
+        self.targetsCollection.AddRange(targets)
+        if self.targetsCollection.Count > 0:
+            orders, fulfilled = self.planner.Plan(algorithm, self.targetsCollection)
+
+            #the orders of a pair together, targets without a tag are a batch of their own
+            batches = {}
+            for order in orders:
+                batches.setdefault(order[0].Tag or order[0].Symbol, []).append(order)
+
+            for key, legs in batches.items():
+                self.submissions += 1
+                batch = (key, self.submissions)
+                for target, security, quantity in legs:
                     aboveMinimumPortfolio = BuyingPowerModelExtensions.AboveMinimumOrderMarginPortfolioPercentage(security.BuyingPowerModel, security, quantity, algorithm.Portfolio, algorithm.Settings.MinimumOrderMarginPortfolioPercentage)
-                    if aboveMinimumPortfolio:
-                        algorithm.MarketOrder(security, quantity)
+                    if not aboveMinimumPortfolio:
+                        continue
+                    ticket = algorithm.MarketOrder(security, quantity, True, target.Tag)
+                    if ticket.Status == OrderStatus.Invalid:
+                        continue
+                    fulfilled.append(target.Symbol)
+                    self.legs[ticket.OrderId] = (target, batch, algorithm.UtcTime)
+                    self.batches.setdefault(batch, (set(), [], []))[0].add(ticket.OrderId)
+                    #the order can fill before MarketOrder returns, then its event came before we knew the leg
+                    if ticket.Status == OrderStatus.Filled:
+                        self.Filled(algorithm, ticket.OrderId, algorithm.UtcTime)
+
+            for symbol in fulfilled:
+                self.targetsCollection.Remove(symbol)
+
+    def OnOrderEvent(self, algorithm, orderEvent):
+        if orderEvent.OrderId not in self.legs:
+            return
+        if orderEvent.Status == OrderStatus.Filled:
+            self.Filled(algorithm, orderEvent.OrderId, orderEvent.UtcTime)
+        elif orderEvent.Status == OrderStatus.Canceled or orderEvent.Status == OrderStatus.Invalid:
+            #the leg is ordered again by the next Execute, as a new batch, unless a newer target took its place
+            target, batch, sent = self.legs.pop(orderEvent.OrderId)
+            waiting, fills, canceled = self.batches[batch]
+            waiting.discard(orderEvent.OrderId)
+            canceled.append(orderEvent.OrderId)
+            if not self.targetsCollection.ContainsKey(target.Symbol):
+                self.targetsCollection.Add(target)
+            if not waiting:
+                self.Close(algorithm, batch)
+
+    def Filled(self, algorithm, orderId, time):
+        leg = self.legs.pop(orderId, None)
+        if leg is None:
+            return
+        target, batch, sent = leg
+        self.legLatencies.append((time - sent).total_seconds())
+        waiting, fills, canceled = self.batches[batch]
+        waiting.discard(orderId)
+        fills.append(time)
+        algorithm.SetRuntimeStatistic('Leg latency (s)', f'{sum(self.legLatencies) / len(self.legLatencies):.3f}')
+        if not waiting:
+            self.Close(algorithm, batch)
+
+    def Close(self, algorithm, batch):
+        #every leg of the batch has filled or was canceled, the gap is kept when they all filled
+        waiting, fills, canceled = self.batches.pop(batch)
+        if canceled:
+            self.skippedGaps += 1
+        elif len(fills) > 1:
+            self.legGaps.append((max(fills) - min(fills)).total_seconds())
+            algorithm.SetRuntimeStatistic('Leg gap (s)', f'{sum(self.legGaps) / len(self.legGaps):.3f}')
 
-            self.targetsCollection.ClearFulfilled(algorithm)
+    def Report(self, algorithm):
+        #the leg latencies and gaps of the whole backtest, from OnEndOfAlgorithm
+        for name, values in (('leg latency', self.legLatencies), ('leg gap', self.legGaps)):
+            if values:
+                values = sorted(values)
+                algorithm.Log(f'{name}: {len(values)} fills, mean {sum(values) / len(values):.3f} s, '
+                              f'median {values[len(values) // 2]:.3f} s, max {values[-1]:.3f} s')
+        if self.skippedGaps:
+            algorithm.Log(f'leg gap: {self.skippedGaps} pairs skipped, a leg was canceled or invalid')
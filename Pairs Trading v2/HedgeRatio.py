@@ -0,0 +1,162 @@
+import numpy as np
+import statsmodels.api as sm
+from collections import deque
+
+
+class RollingSpreadStats:
+    #Rolling mean, variance and covariance of two price series over a fixed window. Uses Welford style updates
+    #for adding the newest bar and removing the oldest one, so every bar is O(1) work and it stays precise on big prices
+    def __init__(self, lookback):
+        self.lookback = lookback
+        self.window = deque(maxlen=lookback)
+        self.Reset()
+
+    def Reset(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        #sums of squared deviations from the mean, and the cross product
+        self.cxx = 0.0
+        self.cyy = 0.0
+        self.cxy = 0.0
+
+    def Update(self, x, y):
+        #drop the oldest bar, before the deque throws it away
+        if len(self.window) == self.lookback:
+            self.Remove(*self.window[0])
+        self.window.append((x, y))
+        self.Add(x, y)
+
+    def Add(self, x, y):
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.cxx += dx * (x - self.mean_x)
+        self.cyy += dy * (y - self.mean_y)
+        self.cxy += dx * (y - self.mean_y)
+
+    def Remove(self, x, y):
+        self.n -= 1
+        if self.n == 0:
+            self.Reset()
+            return
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x -= dx / self.n
+        self.mean_y -= dy / self.n
+        self.cxx -= dx * (x - self.mean_x)
+        self.cyy -= dy * (y - self.mean_y)
+        self.cxy -= dx * (y - self.mean_y)
+
+    @property
+    def IsReady(self):
+        return self.n == self.lookback
+
+    def SpreadMean(self, b):
+        #mean of y - b * x over the window
+        return self.mean_y - b * self.mean_x
+
+    def SpreadVariance(self, b):
+        #population variance (like np.var) of y - b * x over the window
+        return max((self.cyy - 2 * b * self.cxy + b * b * self.cxx) / self.n, 0.0)
+
+    def ZScore(self, b):
+        #zscore of the newest y - b * x against the window
+        x, y = self.window[-1]
+        return (y - b * x - self.SpreadMean(b)) / np.sqrt(self.SpreadVariance(b))
+
+
+class RollingRegression:
+    #Rolling OLS of y = a + b * x over the last lookback bars. The fit is read off the rolling spread statistics,
+    #so adding a bar (and dropping the oldest) is O(1) work instead of refitting the whole window
+    def __init__(self, lookback):
+        self.lookback = lookback
+        self.Stats = RollingSpreadStats(lookback)
+
+    def Update(self, x, y):
+        self.Stats.Update(x, y)
+
+    @property
+    def IsReady(self):
+        return self.Stats.IsReady
+
+    @property
+    def HedgeRatio(self):
+        #nan when x did not move over the window (a halted or stale stock), there is no slope to fit then
+        if self.Stats.cxx == 0:
+            return np.nan
+        return self.Stats.cxy / self.Stats.cxx
+
+    @property
+    def Intercept(self):
+        #the OLS intercept is the mean of y - b * x
+        return self.SpreadMean
+
+    @property
+    def Spread(self):
+        #the spread of the newest bar, y - b * x
+        x, y = self.Stats.window[-1]
+        return y - self.HedgeRatio * x
+
+    @property
+    def SpreadMean(self):
+        return self.Stats.SpreadMean(self.HedgeRatio)
+
+    @property
+    def SpreadStd(self):
+        #population std (like np.std) of y - b * x over the window, with b being the current hedge ratio
+        return np.sqrt(self.Stats.SpreadVariance(self.HedgeRatio))
+
+    @property
+    def ZScore(self):
+        return self.Stats.ZScore(self.HedgeRatio)
+
+
+class OLSRegression:
+    #The old way. Refits sm.OLS on the whole window for every read. Same interface as RollingRegression,
+    #kept as the reference to check the rolling version against
+    def __init__(self, lookback):
+        self.lookback = lookback
+        self.window = deque(maxlen=lookback)
+
+    def Update(self, x, y):
+        self.window.append((x, y))
+
+    def Fit(self):
+        x, y = np.array(self.window).T
+        return x, y, sm.OLS(y, sm.add_constant(x)).fit().params
+
+    @property
+    def IsReady(self):
+        return len(self.window) == self.lookback
+
+    @property
+    def HedgeRatio(self):
+        return self.Fit()[2][1]
+
+    @property
+    def Intercept(self):
+        return self.Fit()[2][0]
+
+    @property
+    def Spread(self):
+        x, y, params = self.Fit()
+        return y[-1] - params[1] * x[-1]
+
+    @property
+    def SpreadMean(self):
+        x, y, params = self.Fit()
+        return np.mean(y - params[1] * x)
+
+    @property
+    def SpreadStd(self):
+        x, y, params = self.Fit()
+        return np.std(y - params[1] * x)
+
+    @property
+    def ZScore(self):
+        x, y, params = self.Fit()
+        spread = y - params[1] * x
+        return (spread[-1] - spread.mean()) / np.std(spread)
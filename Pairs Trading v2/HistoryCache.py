@@ -0,0 +1,222 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+class HistoryEntry:
+    #The cached bars of one symbol at one resolution. Every bar that ended in (start, end] is in times and values,
+    #so a request inside that range needs no History call. first is True when there is no older data to fetch
+    def __init__(self, columns):
+        self.columns = columns
+        self.times = np.empty(0, dtype='datetime64[ns]')
+        self.values = np.empty((0, len(columns)))
+        self.start = None
+        self.end = None
+        self.first = False
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+    def Merge(self, times, values, start, end, first=False):
+        #adds the bars fetched for (start, end]. If that range does not touch the cached one, the cached bars are dropped
+        if self.start is None or start > self.end or end < self.start:
+            self.times, self.values, self.start, self.end, self.first = times, values, start, end, first
+            return
+        keep_head = self.times <= start
+        keep_tail = self.times > end
+        self.times = np.concatenate([self.times[keep_head], times, self.times[keep_tail]])
+        self.values = np.concatenate([self.values[keep_head], values, self.values[keep_tail]])
+        self.first = self.first or first
+        self.start = min(self.start, start)
+        self.end = max(self.end, end)
+
+    def Bars(self, start, end):
+        #the rows of the bars that ended in (start, end]
+        first = self.times.searchsorted(start, side='right')
+        last = self.times.searchsorted(end, side='right')
+        return self.times[first:last], self.values[first:last]
+
+
+class HistoryCache:
+    #A cache in front of algorithm.History. It remembers the bars of every symbol and resolution it has fetched, and
+    #answers a request from the cache when it can, with a History call only for the bars it is missing: the new bars at the end,
+    #or the older bars at the start of a longer request. The symbols of a request that are missing the same bars are fetched
+    #in one History call. The least recently used symbols are dropped when the cache is over budget (bytes).
+    #History takes the same arguments as algorithm.History (a number of bars, a timedelta, or a start and end time)
+    #and returns the same (symbol, time) frame. Every model of an algorithm can share one with HistoryCache.For(algorithm).
+    #A number of bars is turned into a time range with the bar times the cache has seen, a bar time none of the symbols it fetched
+    #has would be missed. A clock symbol that always trades, like SPY, is fetched along with every request so none are missed
+    def __init__(self, algorithm, budget = 64 * 1024 ** 2, clock = None):
+        self.algorithm = algorithm
+        self.budget = budget
+        self.clock = getattr(clock, 'Symbol', clock)
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.calendars = {}
+        #symbols answered from the cache, symbols that needed part of their bars, and symbols that needed all of them
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+        #History calls made, and symbols dropped to stay under budget
+        self.requests = 0
+        self.evictions = 0
+
+    @staticmethod
+    def For(algorithm, budget = 64 * 1024 ** 2, clock = None):
+        cache = getattr(algorithm, 'history_cache', None)
+        if cache is None:
+            cache = algorithm.history_cache = HistoryCache(algorithm, budget, clock)
+        return cache
+
+    def __len__(self):
+        return len(self.entries)
+
+    def History(self, symbols, start, end=None, resolution=None):
+        if isinstance(symbols, str) or not hasattr(symbols, '__iter__'):
+            symbols = [symbols]
+        symbols = list(dict.fromkeys(getattr(symbol, 'Symbol', symbol) for symbol in symbols))
+        now = self.Timestamp(self.algorithm.Time)
+
+        #a number of bars, a timedelta back from now, or a (start, end] range
+        periods = None
+        if isinstance(start, datetime):
+            start, end = self.Timestamp(start), min(self.Timestamp(end), now)
+        else:
+            resolution = end if resolution is None else resolution
+            if isinstance(start, timedelta):
+                start, end = now - np.timedelta64(start), now
+            else:
+                periods, start, end = int(start), None, now
+
+        entries = {symbol: self.entries.get((symbol, resolution)) for symbol in symbols}
+        tail = [symbol for symbol, entry in entries.items() if entry is not None and entry.end < end]
+        for segment_end, segment in self.Segments(tail, resolution, 'end').items():
+            self.Fetch(segment, segment_end, end, resolution)
+
+        counted = []
+        if periods is not None:
+            #like LEAN, a number of bars means the last periods bar times of the market, a symbol without a bar at some of them gets fewer.
+            #They are looked up in the bar times the cache has seen, and if it has not seen enough, every symbol is fetched
+            start = self.Start(resolution, periods, end)
+            if start is None:
+                counted = symbols
+                self.Fetch(counted, None, end, resolution, periods)
+                start = self.Start(resolution, periods, end)
+
+        head, missing = [], []
+        for symbol in symbols:
+            entry = self.entries.get((symbol, resolution))
+            if entry is None:
+                missing.append(symbol)
+            elif entry.start > start and not entry.first:
+                head.append(symbol)
+        for segment_start, segment in self.Segments(head, resolution, 'start').items():
+            self.Fetch(segment, start, segment_start, resolution)
+        if missing:
+            self.Fetch(missing, start, end, resolution)
+
+        fetched = set(missing + counted)
+        refreshed = set(head + tail) - fetched
+        self.misses += len(fetched)
+        self.partial += len(refreshed)
+        self.hits += len(symbols) - len(fetched) - len(refreshed)
+
+        frame = self.Frame(symbols, start, end, resolution)
+        self.Evict()
+        return frame
+
+    def Segments(self, symbols, resolution, side):
+        #the symbols grouped by where their cached bars start or end, every group is missing the same bars and is fetched in one call
+        segments = {}
+        for symbol in symbols:
+            segments.setdefault(getattr(self.entries[(symbol, resolution)], side), []).append(symbol)
+        return segments
+
+    def Start(self, resolution, periods, end):
+        #the time the last periods bar times before end start after, None if the cache has not seen all of them
+        calendar = self.calendars.get(resolution)
+        if calendar is None or calendar.end < end:
+            return None
+        last = calendar.times.searchsorted(end, side='right')
+        if last >= periods:
+            return calendar.times[last - periods] - np.timedelta64(1, 'us')
+        return calendar.start if calendar.first else None
+
+    def Fetch(self, symbols, start, end, resolution, periods=None):
+        #one History call for the bars of the symbols in (start, end], or the last periods bars
+        self.requests += 1
+        if self.clock is not None and self.clock not in symbols:
+            symbols = symbols + [self.clock]
+        if periods is not None:
+            history = self.algorithm.History(symbols, periods, resolution)
+        else:
+            history = self.algorithm.History(symbols, pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime(), resolution)
+
+        #the rows sorted by symbol and time, the last one kept if a bar comes twice, and where every symbol starts and ends
+        columns = list(history.columns) if not history.empty else ['open', 'high', 'low', 'close', 'volume']
+        codes, keys = pd.factorize(history.index.get_level_values(0)) if not history.empty else (np.empty(0, dtype=int), [])
+        bar_times = pd.DatetimeIndex(history.index.get_level_values(-1)).as_unit('ns').to_numpy() if not history.empty else np.empty(0, dtype='datetime64[ns]')
+        order = np.lexsort((bar_times, codes))
+        codes, bar_times = codes[order], bar_times[order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (codes[1:] != codes[:-1]) | (bar_times[1:] != bar_times[:-1])
+        order, codes, bar_times = order[last], codes[last], bar_times[last]
+        values = history.to_numpy(dtype=float)[order] if len(order) else np.empty((0, len(columns)))
+        bounds = np.searchsorted(codes, np.arange(len(keys) + 1))
+        rows = {key: (bounds[k], bounds[k + 1]) for k, key in enumerate(keys)}
+
+        times = np.unique(bar_times)
+        if periods is not None:
+            #the bars cover every bar time after the oldest one, and fewer bar times than asked for means there is no older data
+            first = len(times) < periods
+            start = times[0] - np.timedelta64(1, 'us') if len(times) else end
+        else:
+            first = False
+        #every bar time the cache has seen at the resolution, so a number of bars can be turned into a time range
+        calendar = self.calendars.setdefault(resolution, HistoryEntry([]))
+        calendar.Merge(times, np.empty((len(times), 0)), start, end, first)
+
+        for symbol in symbols:
+            key = (symbol, resolution)
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.nbytes -= entry.nbytes
+            if entry is None or (entry.columns != columns and not history.empty):
+                entry = self.entries[key] = HistoryEntry(columns)
+            first_row, last_row = rows.get(symbol, (0, 0))
+            entry.Merge(bar_times[first_row:last_row], values[first_row:last_row], start, end, first)
+            self.nbytes += entry.nbytes
+
+    def Frame(self, symbols, start, end, resolution):
+        #the long (symbol, time) frame History would have returned
+        keys, times, values = [], [], []
+        for symbol in symbols:
+            entry = self.entries[(symbol, resolution)]
+            self.entries.move_to_end((symbol, resolution))
+            symbol_times, symbol_values = entry.Bars(start, end)
+            keys.extend([symbol] * len(symbol_times))
+            times.append(symbol_times)
+            values.append(symbol_values)
+        if not keys:
+            return pd.DataFrame()
+
+        columns = self.entries[(symbols[0], resolution)].columns
+        index = pd.MultiIndex.from_arrays([pd.Index(keys, dtype=object), pd.DatetimeIndex(np.concatenate(times))], names=['symbol', 'time'])
+        return pd.DataFrame(np.concatenate(values), index=index, columns=columns)
+
+    def Evict(self):
+        while self.nbytes > self.budget and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            self.evictions += 1
+
+    def Stats(self):
+        return {'hits': self.hits, 'partial': self.partial, 'misses': self.misses, 'requests': self.requests,
+                'symbols': len(self.entries), 'bytes': self.nbytes, 'evictions': self.evictions}
+
+    @staticmethod
+    def Timestamp(time):
+        return pd.Timestamp(time).as_unit('ns').to_datetime64()
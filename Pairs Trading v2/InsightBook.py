@@ -0,0 +1,68 @@
+from itertools import combinations
+from InsightStore import InsightStore
+
+
+class InsightBook(InsightStore):
+    #The insights of the portfolio model, by symbol and by GroupId.
+    #The alpha sends the two legs of a pair as one group, so the pairs are just the groups of the book, and the symbols of
+    #a group are one lookup away. No need to compare every insight with every other insight to find the ones that belong together.
+    #The groups are kept in the order they came in, so the newest group is the last one. The expiry of the insights is the
+    #one of the InsightStore.
+    #Insights without a GroupId are kept by symbol, but they are not part of any pair
+    def __init__(self):
+        super().__init__()
+        #GroupId -> the insights of the group
+        self.groups = {}
+        #symbol -> the GroupIds it is in, a dict used as an ordered set
+        self.symbolGroups = {}
+
+    def Add(self, insight):
+        super().Add(insight)
+        if insight.GroupId is not None:
+            self.groups.setdefault(insight.GroupId, []).append(insight)
+            self.symbolGroups.setdefault(insight.Symbol, {})[insight.GroupId] = None
+
+    def Remove(self, insight):
+        if not super().Remove(insight):
+            return False
+
+        group = self.groups.get(insight.GroupId)
+        if group is not None:
+            group.remove(insight)
+            if not group:
+                del self.groups[insight.GroupId]
+            #the symbol leaves the group when it has no other insight in it
+            if not any(x.Symbol == insight.Symbol for x in group):
+                groups = self.symbolGroups[insight.Symbol]
+                groups.pop(insight.GroupId, None)
+                if not groups:
+                    del self.symbolGroups[insight.Symbol]
+        return True
+
+    def RemoveGroup(self, groupId):
+        #removes all the insights of the group, and returns them
+        group = list(self.groups.get(groupId, []))
+        for insight in group:
+            self.Remove(insight)
+        return group
+
+    def GroupsOf(self, symbol):
+        return list(self.symbolGroups.get(symbol, {}))
+
+    def NewestGroup(self, symbol):
+        #the GroupId of the last group the symbol came in with, None without any
+        groups = self.symbolGroups.get(symbol)
+        return next(reversed(groups)) if groups else None
+
+    def Pairs(self, utcTime):
+        #the directions of every pair of symbols that are in an active group together, from the newest group.
+        #Two symbols that are in more than one group together get the directions of the newest one
+        expiring = self.Expiring(utcTime)
+        pairs = {}
+        for group in reversed(list(self.groups.values())):
+            active = [insight for insight in group if insight.IsActive(utcTime)] if expiring else group
+            for first, second in combinations(active, 2):
+                if (first.Symbol, second.Symbol) in pairs or (second.Symbol, first.Symbol) in pairs:
+                    continue
+                pairs[(first.Symbol, second.Symbol)] = [first.Direction, second.Direction]
+        return pairs
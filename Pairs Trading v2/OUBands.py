@@ -0,0 +1,150 @@
+import numpy as np
+from collections import deque
+
+#Ornstein-Uhlenbeck bands for a mean reverting spread, dS = theta (mu - S) dt + sigma dW.
+#theta, mu and sigma come from the AR(1) regression of the spread on its last value, S[t+1] = a + b S[t] + e,
+#which is the exact discretisation of the OU process: b = exp(-theta dt), mu = a / (1 - b) and var(e) = sigma^2 (1 - b^2) / (2 theta).
+#The functions work on leading axes of spreads, so all the pairs are fitted in one go. OUBands does the same for one spread
+#that grows one value at a time.
+
+
+def ou_variance(sigma, theta, horizon=None):
+    #variance of the spread horizon time units after a known start, sigma^2 / (2 theta) * (1 - exp(-2 theta horizon)).
+    #Without a horizon it is the stationary variance sigma^2 / (2 theta). theta = 0 is a random walk, with variance sigma^2 horizon
+    sigma = np.asarray(sigma, dtype=float)
+    theta = np.asarray(theta, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if horizon is None:
+            return np.where(theta > 0, sigma ** 2 / (2 * theta), np.inf)
+        #-expm1 keeps it precise when theta is small
+        return np.where(theta > 0, sigma ** 2 * -np.expm1(-2 * theta * horizon) / (2 * theta), sigma ** 2 * horizon)
+
+
+def ou_parameters(n, mean_x, mean_y, cxx, cyy, cxy, dt=1.0):
+    #theta, mu and sigma from the moments of the AR(1) regression of the spread (y) on its last value (x).
+    #cxx, cyy and cxy are sums of squared deviations from the means, like in RollingSpreadStats.
+    #As arrays, so a flat or too short spread gives nan or inf instead of a ZeroDivisionError
+    n, mean_x, mean_y, cxx, cyy, cxy = (np.asarray(x, dtype=float) for x in (n, mean_x, mean_y, cxx, cyy, cxy))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = cxy / cxx
+        a = mean_y - b * mean_x
+        residual_variance = np.maximum((cyy - b * cxy) / n, 0.0)
+
+        #b >= 1 does not revert, so theta is 0 and mu is just the mean. b <= 0 reverts within one step, theta is as big as a float allows
+        reverting = b < 1
+        b = np.clip(b, np.finfo(float).tiny, 1.0)
+        theta = -np.log(b) / dt
+        mu = np.where(reverting, a / (1 - b), mean_y)
+        sigma = np.sqrt(np.where(reverting, residual_variance * 2 * theta / (1 - b * b), residual_variance / dt))
+    return theta, mu, sigma
+
+
+def fit_ou(spreads, dt=1.0):
+    #theta, mu and sigma of every series in spreads, shape (..., time)
+    spreads = np.asarray(spreads, dtype=float)
+    x = spreads[..., :-1]
+    y = spreads[..., 1:]
+    mean_x = x.mean(axis=-1)
+    mean_y = y.mean(axis=-1)
+    dx = x - mean_x[..., None]
+    dy = y - mean_y[..., None]
+    return ou_parameters(x.shape[-1], mean_x, mean_y, (dx * dx).sum(axis=-1), (dy * dy).sum(axis=-1), (dx * dy).sum(axis=-1), dt)
+
+
+def ou_bands(spreads, width=2.0, horizon=None, dt=1.0):
+    #lower band, mu and upper band of every series in spreads, width standard deviations of the OU variance from mu
+    theta, mu, sigma = fit_ou(spreads, dt)
+    std = np.sqrt(ou_variance(sigma, theta, horizon))
+    return mu - width * std, mu, mu + width * std
+
+
+def ou_zscores(spreads, dt=1.0):
+    #zscore of the newest value of every series against its fitted OU mean and stationary std
+    spreads = np.asarray(spreads, dtype=float)
+    theta, mu, sigma = fit_ou(spreads, dt)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (spreads[..., -1] - mu) / np.sqrt(ou_variance(sigma, theta))
+
+
+class OUBands:
+    #The OU fit of one spread that grows one value at a time. The moments of the AR(1) regression over the window
+    #are kept with Welford updates, so adding the newest spread and dropping the oldest one are O(1) work.
+    #With a lookback the window keeps that many spreads, without one the caller drops the oldest with Pop
+    def __init__(self, lookback=None, width=2.0, dt=1.0):
+        self.lookback = lookback
+        self.width = width
+        self.dt = dt
+        self.window = deque()
+        self.Reset()
+
+    def Reset(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.cxx = 0.0
+        self.cyy = 0.0
+        self.cxy = 0.0
+
+    def __len__(self):
+        return len(self.window)
+
+    def Update(self, spread):
+        if self.lookback is not None and len(self.window) == self.lookback:
+            self.Pop()
+        if self.window:
+            self.Add(self.window[-1], spread)
+        self.window.append(spread)
+
+    def Pop(self):
+        #drops the oldest spread, and its step to the spread after it
+        oldest = self.window.popleft()
+        if self.window:
+            self.Remove(oldest, self.window[0])
+
+    def Add(self, x, y):
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.cxx += dx * (x - self.mean_x)
+        self.cyy += dy * (y - self.mean_y)
+        self.cxy += dx * (y - self.mean_y)
+
+    def Remove(self, x, y):
+        self.n -= 1
+        if self.n == 0:
+            self.Reset()
+            return
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x -= dx / self.n
+        self.mean_y -= dy / self.n
+        self.cxx -= dx * (x - self.mean_x)
+        self.cyy -= dy * (y - self.mean_y)
+        self.cxy -= dx * (y - self.mean_y)
+
+    @property
+    def IsReady(self):
+        #the AR(1) regression needs 2 steps, so 3 spreads
+        return self.n >= 2
+
+    def Parameters(self):
+        #theta, mu and sigma
+        theta, mu, sigma = ou_parameters(self.n, self.mean_x, self.mean_y, self.cxx, self.cyy, self.cxy, self.dt)
+        return float(theta), float(mu), float(sigma)
+
+    def Variance(self, horizon=None):
+        theta, mu, sigma = self.Parameters()
+        return float(ou_variance(sigma, theta, horizon))
+
+    def Bands(self, horizon=None):
+        #lower band, mu and upper band
+        theta, mu, sigma = self.Parameters()
+        std = self.width * np.sqrt(float(ou_variance(sigma, theta, horizon)))
+        return mu - std, mu, mu + std
+
+    @property
+    def ZScore(self):
+        theta, mu, sigma = self.Parameters()
+        return (self.window[-1] - mu) / np.sqrt(float(ou_variance(sigma, theta)))
@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class OrderPlanner:
+    #The orders of an execution model for all its targets at once.
+    #The holdings, the open order quantities, the prices and the lot sizes of the targets are read once into arrays, and the
+    #unordered quantity of every target (what is left to order after the holdings and the open orders, in whole lots) and the
+    #margin impact order are computed from that snapshot, instead of walking the open orders for every target in
+    #OrderByMarginImpact, again for every order and again in ClearFulfilled.
+    #The rules are the ones of OrderByMarginImpact: only tradable securities with data whose lot rounded target is at least
+    #a lot away from what we hold and have ordered (the existing quantity) are ordered. The orders that make a position
+    #smaller (a target smaller than the existing quantity) come first, so they free margin, then the biggest orders by value.
+    #Like LEAN only the size counts, so a flip to a smaller position of the other side is reducing and a flip to a bigger
+    #one is not. Orders of the same value keep the order of the targets
+    def Plan(self, algorithm, targets):
+        #returns the (target, security, quantity) of the orders to send, in order, and the symbols of the targets that
+        #have nothing left to order
+        targets = list(targets)
+        if not targets:
+            return [], []
+        securities = [algorithm.Securities[target.Symbol] for target in targets]
+
+        #the open orders of all the symbols from one call
+        opened = {}
+        for ticket in algorithm.Transactions.GetOpenOrderTickets():
+            opened[ticket.Symbol] = opened.get(ticket.Symbol, 0) + (ticket.Quantity - ticket.QuantityFilled)
+
+        wanted = np.array([target.Quantity for target in targets], dtype=float)
+        holdings = np.array([security.Holdings.Quantity for security in securities], dtype=float)
+        open_quantity = np.array([opened.get(target.Symbol, 0) for target in targets], dtype=float)
+        prices = np.array([security.Price for security in securities], dtype=float)
+        lot_sizes = np.array([security.SymbolProperties.LotSize for security in securities], dtype=float)
+        tradable = np.array([security.HasData and security.IsTradable for security in securities], dtype=bool)
+
+        #rounded towards zero to whole lots, like OrderSizing.AdjustByLotSize
+        def by_lot_size(quantity):
+            lots = np.abs(quantity) // lot_sizes
+            return np.where(quantity > 0, lots, -lots) * lot_sizes
+
+        #what is left to order, like OrderSizing.GetUnorderedQuantity
+        unordered = by_lot_size(wanted - holdings - open_quantity)
+
+        existing = holdings + open_quantity
+        target_quantity = by_lot_size(wanted)
+        pending = np.flatnonzero(tradable & (np.abs(target_quantity - existing) >= lot_sizes) & (unordered != 0))
+        reduces = (existing[pending] != 0) & (np.abs(target_quantity[pending]) < np.abs(existing[pending]))
+        value = np.abs((target_quantity[pending] - existing[pending]) * prices[pending])
+        #lexsort is stable and sorts by the last key first
+        order = pending[np.lexsort((-value, ~reduces))]
+
+        orders = [(targets[k], securities[k], unordered[k].item()) for k in order]
+        fulfilled = [targets[k].Symbol for k in np.flatnonzero(unordered == 0)]
+        return orders, fulfilled
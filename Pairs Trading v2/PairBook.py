@@ -0,0 +1,224 @@
+import numpy as np
+from OUBands import ou_zscores, fit_ou, ou_variance
+
+
+class PairBook:
+    #Every pair in a few numpy arrays instead of one python object per pair.
+    #The closes of all the symbols sit in the ring buffer matrix of a SymbolBarStore, and each pair keeps its
+    #rolling means and co-moments in arrays, so one bar is a handful of vectorized operations no matter how many pairs we have
+    def __init__(self, store):
+        self.store = store
+        self.lookback = store.lookback
+
+        #keys[k] is the (symbol1, symbol2) of the k'th entry in the arrays, left and right are their rows in the store
+        self.keys = []
+        self.left = np.zeros(0, dtype=int)
+        self.right = np.zeros(0, dtype=int)
+        self.states = np.zeros(0, dtype=int)
+        self.n = np.zeros(0, dtype=int)
+        self.mean_x = np.zeros(0)
+        self.mean_y = np.zeros(0)
+        self.cxx = np.zeros(0)
+        self.cyy = np.zeros(0)
+        self.cxy = np.zeros(0)
+
+        #the co-moments are recomputed from the price matrix once every lookback steps, so rounding errors dont build up
+        self.steps = 0
+
+        #for the event driven signals: the bar count of both stocks when the pair was last evaluated, the spreads
+        #y - ratio * x between low and high where the pair can not change state (see Thresholds), and how many times
+        #in a row the pair was skipped because of them
+        self.skipped = np.zeros(0, dtype=int)
+        self.seen_left = np.zeros(0, dtype=int)
+        self.seen_right = np.zeros(0, dtype=int)
+        self.ratio = np.zeros(0)
+        self.low = np.zeros(0)
+        self.high = np.zeros(0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def AddPair(self, symbol1, symbol2):
+        #the symbols have to be subscribed in the store already
+        self.keys.append((symbol1, symbol2))
+        self.left = np.append(self.left, self.store.rows[symbol1])
+        self.right = np.append(self.right, self.store.rows[symbol2])
+        self.states = np.append(self.states, 0)
+        for name in ('n', 'mean_x', 'mean_y', 'cxx', 'cyy', 'cxy', 'skipped'):
+            setattr(self, name, np.append(getattr(self, name), 0))
+        self.seen_left = np.append(self.seen_left, self.store.bars[self.left[-1]])
+        self.seen_right = np.append(self.seen_right, self.store.bars[self.right[-1]])
+        for name in ('ratio', 'low', 'high'):
+            setattr(self, name, np.append(getattr(self, name), np.nan))
+
+        #start the pair from whatever history both of its symbols already have in the store
+        self.Resync(np.array([len(self.keys) - 1]))
+
+    def RemovePair(self, key):
+        k = self.keys.index(key)
+        del self.keys[k]
+        for name in ('left', 'right', 'states', 'n', 'mean_x', 'mean_y', 'cxx', 'cyy', 'cxy', 'skipped', 'seen_left', 'seen_right', 'ratio', 'low', 'high'):
+            setattr(self, name, np.delete(getattr(self, name), k))
+
+    def Step(self):
+        #rolls every pair one bar forward. Call it right after the store has stepped
+        x = self.store.latest[self.left]
+        y = self.store.latest[self.right]
+        valid = ~(np.isnan(x) | np.isnan(y))
+
+        #full windows drop their oldest bar, which is the column the store just overwrote
+        full = valid & (self.n == self.lookback)
+        self.Remove(full, self.store.outgoing[self.left], self.store.outgoing[self.right])
+        self.Add(valid, x, y)
+
+        self.steps += 1
+        if self.steps % self.lookback == 0:
+            self.Resync(np.arange(len(self.keys)))
+
+    def Add(self, mask, x, y):
+        #vectorized Welford update for the pairs in mask
+        self.n[mask] += 1
+        n = self.n[mask]
+        dx = x[mask] - self.mean_x[mask]
+        dy = y[mask] - self.mean_y[mask]
+        self.mean_x[mask] += dx / n
+        self.mean_y[mask] += dy / n
+        self.cxx[mask] += dx * (x[mask] - self.mean_x[mask])
+        self.cyy[mask] += dy * (y[mask] - self.mean_y[mask])
+        self.cxy[mask] += dx * (y[mask] - self.mean_y[mask])
+
+    def Remove(self, mask, x, y):
+        #vectorized Welford removal for the pairs in mask. Only called on full windows, so n never hits 0
+        self.n[mask] -= 1
+        n = self.n[mask]
+        dx = x[mask] - self.mean_x[mask]
+        dy = y[mask] - self.mean_y[mask]
+        self.mean_x[mask] -= dx / n
+        self.mean_y[mask] -= dy / n
+        self.cxx[mask] -= dx * (x[mask] - self.mean_x[mask])
+        self.cyy[mask] -= dy * (y[mask] - self.mean_y[mask])
+        self.cxy[mask] -= dx * (y[mask] - self.mean_y[mask])
+
+    def Resync(self, pairs):
+        #recomputes the moments of the given pairs straight from the price matrix
+        left = self.left[pairs]
+        right = self.right[pairs]
+        n = np.minimum(self.store.counts[left], self.store.counts[right])
+
+        #the window of a pair is its newest n columns, everything older is masked out
+        inside = np.arange(self.lookback) >= (self.lookback - n)[:, None]
+        x = np.where(inside, self.store.Window(left), 0.0)
+        y = np.where(inside, self.store.Window(right), 0.0)
+        count = np.maximum(n, 1)
+        mean_x = x.sum(axis=1) / count
+        mean_y = y.sum(axis=1) / count
+        dx = np.where(inside, x - mean_x[:, None], 0.0)
+        dy = np.where(inside, y - mean_y[:, None], 0.0)
+
+        self.n[pairs] = n
+        self.mean_x[pairs] = mean_x
+        self.mean_y[pairs] = mean_y
+        self.cxx[pairs] = (dx * dx).sum(axis=1)
+        self.cyy[pairs] = (dy * dy).sum(axis=1)
+        self.cxy[pairs] = (dx * dy).sum(axis=1)
+
+    @property
+    def IsReady(self):
+        return self.n == self.lookback
+
+    def HedgeRatios(self):
+        #OLS slope of symbol2 on symbol1 for every pair
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.cxy / self.cxx
+
+    def ZScores(self):
+        #zscore of the newest spread y - b * x for every pair, against the mean and std of the spread over its window
+        b = self.HedgeRatios()
+        last = self.store.latest
+        spread = last[self.right] - b * last[self.left]
+        mean = self.mean_y - b * self.mean_x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.maximum((self.cyy - 2 * b * self.cxy + b * b * self.cxx) / self.n, 0.0)
+            return (spread - mean) / np.sqrt(variance)
+
+    def OUZScores(self):
+        #zscore of the newest spread for every pair, against the OU mean and stationary std fitted to the spread over its window.
+        #Only full windows have a fit, the rest are nan
+        b = self.HedgeRatios()
+        spreads = self.store.Window(self.right) - b[:, None] * self.store.Window(self.left)
+        zscores = np.full(len(self.keys), np.nan)
+        ready = self.IsReady
+        zscores[ready] = ou_zscores(spreads[ready])
+        return zscores
+
+    def Transitions(self, zscores, upper, lower, mean, pairs=None):
+        #the state changes TradeLogic would make, as masked array updates. Returns the new states and the pairs that changed.
+        #The stop loss branches of TradeLogic keep the state, so they never show up here.
+        #With pairs, zscores are the zscores of those pairs only, and only they can change
+        if pairs is not None:
+            #a nan zscore never changes a state
+            full = np.full(len(self.keys), np.nan)
+            full[pairs] = zscores
+            zscores = full
+        ready = self.IsReady
+        states = self.states.copy()
+        flat = ready & (self.states == 0)
+        states[flat & (zscores > upper)] = 1
+        states[flat & (zscores < lower)] = -1
+        states[ready & (self.states == -1) & (zscores > mean)] = 0
+        states[ready & (self.states == 1) & (zscores < mean)] = 0
+        return states, np.flatnonzero(states != self.states)
+
+    def Fresh(self):
+        #the pairs where both stocks have had a new bar since the pair was last evaluated, this is the dirty queue of the book
+        bars = self.store.bars
+        return np.flatnonzero((bars[self.left] > self.seen_left) & (bars[self.right] > self.seen_right))
+
+    def Quiet(self, pairs, refresh):
+        #True for the pairs whose newest spread is between the price thresholds of their last evaluation.
+        #The fit drifts away from the thresholds, so a pair that has been skipped refresh times in a row is evaluated anyway
+        last = self.store.latest
+        spread = last[self.right[pairs]] - self.ratio[pairs] * last[self.left[pairs]]
+        quiet = (spread >= self.low[pairs]) & (spread <= self.high[pairs]) & (self.skipped[pairs] < refresh)
+        self.skipped[pairs[quiet]] += 1
+        return quiet
+
+    def Bands(self, pairs, ou=False):
+        #the hedge ratio, newest spread, mean and std of the spread of the given pairs, so the zscore is (spread - mean) / std.
+        #With ou the mean and std are the OU mean and stationary std, and pairs without a full window get nan
+        b = self.HedgeRatios()[pairs]
+        left = self.left[pairs]
+        right = self.right[pairs]
+        if not ou:
+            last = self.store.latest
+            spread = last[right] - b * last[left]
+            mean = self.mean_y[pairs] - b * self.mean_x[pairs]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                variance = np.maximum((self.cyy[pairs] - 2 * b * self.cxy[pairs] + b * b * self.cxx[pairs]) / self.n[pairs], 0.0)
+                return b, spread, mean, np.sqrt(variance)
+
+        spread = np.full(len(b), np.nan)
+        mean = np.full(len(b), np.nan)
+        std = np.full(len(b), np.nan)
+        ready = self.IsReady[pairs]
+        spreads = self.store.Window(right[ready]) - b[ready, None] * self.store.Window(left[ready])
+        theta, mu, sigma = fit_ou(spreads)
+        spread[ready] = spreads[:, -1]
+        mean[ready] = mu
+        std[ready] = np.sqrt(ou_variance(sigma, theta))
+        return b, spread, mean, std
+
+    def Seen(self, pairs):
+        #the pairs have been evaluated on the newest bars of their stocks
+        self.seen_left[pairs] = self.store.bars[self.left[pairs]]
+        self.seen_right[pairs] = self.store.bars[self.right[pairs]]
+
+    def Thresholds(self, pairs, ratio, mean, std, low, high):
+        #turns the zscores low and high between which the pairs keep their state into spreads, with the hedge ratio, mean and std
+        #of this evaluation. Quiet compares the newest spread to them without refitting anything. Pairs without a full window get none
+        ready = self.IsReady[pairs]
+        self.skipped[pairs] = 0
+        self.ratio[pairs] = ratio
+        with np.errstate(invalid='ignore'):
+            self.low[pairs] = np.where(ready, mean + low * std, np.nan)
+            self.high[pairs] = np.where(ready, mean + high * std, np.nan)
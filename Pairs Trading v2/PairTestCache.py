@@ -0,0 +1,36 @@
+class PairTestCache:
+    #Remembers the result of every cointegration test, keyed by (symbol1, symbol2, window end).
+    #A result is reused until its window end is older than the ttl, then it is evicted and the pair has to be tested again
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.results = {}
+        #latest window end for every (symbol1, symbol2), so a lookup does not need to know when the pair was tested
+        self.window_ends = {}
+
+    def __len__(self):
+        return len(self.results)
+
+    def __contains__(self, pair):
+        return pair in self.window_ends
+
+    def add(self, symbol1, symbol2, window_end, pvalue):
+        previous = self.window_ends.get((symbol1, symbol2))
+        if previous is not None:
+            self.results.pop((symbol1, symbol2, previous), None)
+        self.window_ends[(symbol1, symbol2)] = window_end
+        self.results[(symbol1, symbol2, window_end)] = pvalue
+
+    def get(self, symbol1, symbol2, time):
+        #returns the cached pvalue, or None if the pair was never tested or the result has expired
+        window_end = self.window_ends.get((symbol1, symbol2))
+        if window_end is None or time - window_end > self.ttl:
+            return None
+        return self.results[(symbol1, symbol2, window_end)]
+
+    def evict(self, time):
+        #drops every result that has expired, returns how many were dropped
+        expired = [key for key in self.results if time - key[2] > self.ttl]
+        for symbol1, symbol2, window_end in expired:
+            del self.results[(symbol1, symbol2, window_end)]
+            del self.window_ends[(symbol1, symbol2)]
+        return len(expired)
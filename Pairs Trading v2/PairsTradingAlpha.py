@@ -1,25 +1,43 @@
 
 from AlgorithmImports import *
-import pandas as pd
 import numpy as np
-import statsmodels.api as sm
 from enum import Enum
 from collections import deque
 from datetime import timedelta
+from PairTestExecutor import PairTestExecutor
+from PairTestCache import PairTestCache
+from HedgeRatio import RollingRegression
+from PairBook import PairBook
+from SymbolBarStore import SymbolBarStore
+from OUBands import ou_zscores, fit_ou, ou_variance
+from HistoryCache import HistoryCache
 
 
 class PairsTradingAlphaModel(AlphaModel):
-    def __init__(self, coint_lookback, coint_resolution, prediction, minimumCointegration, std, stoplossStd, pairs_lookback, pairs_resolution):
+    def __init__(self, coint_lookback, coint_resolution, prediction, minimumCointegration, std, stoplossStd, pairs_lookback, pairs_resolution, pair_tester = None, coint_ttl = timedelta(days=90), hedge_ratio = RollingRegression, batched = False, ou_bands = False, event_driven = False, band_margin = None, band_refresh = 10):
 
         #We use these parameters to set the cointegration part of the algo
         self.coint_resolution = coint_resolution
         self.coint_lookback = coint_lookback
         self.minimumCointegration = minimumCointegration
 
+        #The engine that runs the cointegration tests. Give it a PairTestExecutor(workers=n) to run them on n processes
+        self.pair_tester = pair_tester if pair_tester is not None else PairTestExecutor()
+
+        #Every coint result is kept for coint_ttl, so a universe change only tests the pairs with new stocks in them
+        self.pair_cache = PairTestCache(coint_ttl)
+
         #here we set up the pairs trading lookback and resolution. This can and should be different than the coint
         self.pairs_lookback = pairs_lookback
         self.pairs_resolution = pairs_resolution
 
+        #The class that gives us the hedge ratio and the spread statistics of a pair. OLSRegression refits on every bar, like we used to
+        self.hedge_ratio = hedge_ratio
+
+        #If ou_bands, the zscore is measured against the mean and stationary std of an Ornstein-Uhlenbeck process fitted to the spread
+        #over the lookback, instead of the plain mean and std of the spread (see OUBands.py)
+        self.ou_bands = ou_bands
+
         self.prediction = prediction
 
         #Set the upper and lower standard deviation, that we want our algo to hit
@@ -35,49 +53,77 @@ class PairsTradingAlphaModel(AlphaModel):
         self.pairs = {}
         self.Securities = []
 
+        #The closes of every stock in a pair, stored once per stock with one consolidator per stock, shared by all its pairs
+        self.store = SymbolBarStore(pairs_lookback)
+        self.consolidators = {}
+        #True when the store has a bar that we have not run the trade logic on yet
+        self.new_bar = False
+
+        #If batched, every pair lives in one PairBook and is updated with array operations instead of the loop over self.pairs
+        self.book = PairBook(self.store) if batched else None
+
+        #If event_driven, a pair is only evaluated once both of its stocks have a new bar since its last evaluation. The loop keeps
+        #those pairs in a dirty queue, the book finds them from the bar counts of the store.
+        #With a band_margin, after an evaluation the zscores where the pair would change state, moved band_margin std inwards, are turned
+        #into spreads with the hedge ratio, mean and std of that evaluation. While the newest spread stays between them the pair is not
+        #refitted, for at most band_refresh bars in a row, as the fit drifts. This skips a signal now and then when the hedge ratio moves fast,
+        #so it is only worth it when the refit is expensive (ou_bands or OLSRegression). band_margin = None evaluates every fresh pair in full
+        #With batched the polling pass is already one vectorized step for all the pairs, and event_driven costs more than it saves.
+        #It also changes the signals when bars are missing, a pair waits for both of its stocks, so it is off by default
+        self.event_driven = event_driven
+        self.band_margin = band_margin
+        self.band_refresh = band_refresh
+        self.legs = {}
+        self.dirty = deque()
+        self.queued = set()
+
 
     def Update(self, algorithm, data):
         #implement the update features here. Update the RollingWindow
         insights = []
 
+        #The store takes the new bars in and the pairs are rolled forward, also when we dont trade
+        if self.store.Step():
+            if self.book is not None:
+                self.book.Step()
+            else:
+                for symbolData in self.pairs.values():
+                    symbolData.Update(self.store)
+                if self.event_driven:
+                    self.QueueFresh()
+            self.new_bar = True
+
         #If the market is not open, we will not send out orders
         for symbol in self.Securities:
             if not algorithm.IsMarketOpen(symbol.Symbol):
                 return []
+
+        #Only a new bar can move a zscore, so without one nothing can change
+        if not self.new_bar:
+            return []
+        self.new_bar = False
+
+        if self.book is not None:
+            return self.UpdateBook()
+
+        if self.event_driven:
+            return self.UpdateDirty()
         
-        #update the rolling window with same slices, or ols wont fit
+        #every pair keeps its own rolling regression, which is updated bar by bar from the store
         for keys, symbolData in self.pairs.items():
 
-            #if the window is varmed up and ready, we enter
-            if symbolData.window1.IsReady and symbolData.window2.IsReady:
+            #if the regression is varmed up and ready, and has a hedge ratio, we enter
+            if symbolData.Regression.IsReady and not np.isnan(symbolData.Regression.HedgeRatio):
                 
                 #Get the state of the pairs
                 state = symbolData.state
 
-                #Convert the tradebar class to a pandas dataframe
-                S1 = algorithm.PandasConverter.GetDataFrame[IBaseDataBar](symbolData.window1).close.unstack(level=0)
-                S2 = algorithm.PandasConverter.GetDataFrame[IBaseDataBar](symbolData.window2).close.unstack(level=0)
-
-                #Drop the data is there is nans
-                S1 = S1.dropna(axis=1)
-                S2 = S2.dropna(axis=1)
-                
-                #Add a constant, fit with regression(least ordinary squares) and get the parameteres
-                S1 = sm.add_constant(S1)
-                results = sm.OLS(S2, S1).fit()
-                S1 = S1[keys[0]]
-                S2 = S2[keys[1]]
-                b = results.params[keys[0]]
-
-                #If S2 moves higher, the spread becomes higher. Therefore, short S2, long S1 if spread moves up, mean reversion
-                spread = S2 - b * S1
-
-                #Get the zscore (the spread)
-                zscore = self.ZScore(spread)
+                #Get the zscore of the newest spread from the rolling spread statistics. If S2 moves higher, the spread becomes higher. Therefore, short S2, long S1 if spread moves up, mean reversion
+                zscore = symbolData.OUZScore(self.store) if self.ou_bands else symbolData.Regression.ZScore
 
-                insight, state = self.TradeLogic(keys[0], keys[1], zscore[-1], state)
+                insight, state = self.TradeLogic(keys[0], keys[1], zscore, state)
 
-                #self.Plotting(algorithm, zscore[-1], self.upperStd, self.lowerStd)
+                #self.Plotting(algorithm, zscore, self.upperStd, self.lowerStd)
 
                 #if we have changed state, append insight
                 if symbolData.state != state:
@@ -88,6 +134,101 @@ class PairsTradingAlphaModel(AlphaModel):
 
         return insights
 
+    def QueueFresh(self):
+        #after a step, every pair of a stock that got a bar goes on the dirty queue once both of its stocks have a new bar
+        #since the pair was last evaluated. The bar counts are read as a list, indexing numpy one int at a time is slow
+        bars = self.store.bars.tolist()
+        rows = self.store.rows
+        for row in self.store.updated.tolist():
+            for keys in self.legs.get(self.store.symbols[row], ()):
+                symbolData = self.pairs[keys]
+                if keys not in self.queued and bars[rows[keys[0]]] > symbolData.seen1 and bars[rows[keys[1]]] > symbolData.seen2:
+                    self.dirty.append(keys)
+                    self.queued.add(keys)
+
+    def UpdateDirty(self):
+        #the event driven loop. Only the pairs on the dirty queue are looked at, and only the ones near a band are refitted
+        insights = []
+        while self.dirty:
+            keys = self.dirty.popleft()
+            self.queued.discard(keys)
+            symbolData = self.pairs.get(keys)
+            if symbolData is None:
+                continue
+            symbolData.Seen(self.store)
+            #a pair whose first stock did not move over the window has no hedge ratio
+            if not symbolData.Regression.IsReady or np.isnan(symbolData.Regression.HedgeRatio):
+                continue
+
+            #without a band_margin there are no thresholds, and the zscore is read like in the polling loop
+            if self.band_margin is None:
+                zscore = symbolData.OUZScore(self.store) if self.ou_bands else symbolData.Regression.ZScore
+            elif symbolData.Quiet(self.store, self.band_refresh):
+                continue
+            else:
+                ratio, spread, mean, std = symbolData.Bands(self.store, self.ou_bands)
+                zscore = (spread - mean) / std
+
+            insight, state = self.TradeLogic(keys[0], keys[1], zscore, symbolData.state)
+            if symbolData.state != state:
+                insights.extend(insight)
+                symbolData.state = state
+
+            if self.band_margin is not None:
+                low, high = self.QuietZScores(symbolData.state.value)
+                symbolData.Thresholds(ratio, mean, std, float(low), float(high))
+
+        return insights
+
+    def QuietZScores(self, states):
+        #the zscores between which a pair in the given state can not change state in TradeLogic, band_margin inside of them
+        states = np.asarray(states)
+        low = np.where(states == State.FlatRatio.value, self.lowerStd, np.where(states == State.LongRatio.value, self.mean, -np.inf))
+        high = np.where(states == State.FlatRatio.value, self.upperStd, np.where(states == State.LongRatio.value, np.inf, self.mean))
+        return low + self.band_margin, high - self.band_margin
+
+    def UpdateBook(self):
+        #Every pair in one go. hedge ratios, spreads and zscores for all the pairs, and the state changes as masked array updates
+        if self.event_driven:
+            return self.UpdateBookDirty()
+        zscores = self.book.OUZScores() if self.ou_bands else self.book.ZScores()
+        states, changed = self.book.Transitions(zscores, self.upperStd, self.lowerStd, self.mean)
+
+        #only the pairs that changed state get insights. TradeLogic makes them, so they are the same as in the loop
+        insights = []
+        for k in changed:
+            stock1, stock2 = self.book.keys[k]
+            insight, state = self.TradeLogic(stock1, stock2, zscores[k], State(self.book.states[k]))
+            insights.extend(insight)
+            self.pairs[(stock1, stock2)].state = state
+
+        self.book.states = states
+        return insights
+
+    def UpdateBookDirty(self):
+        #the event driven book. Only the pairs with a new bar on both stocks, and of those only the ones near a band, are refitted
+        pairs = self.book.Fresh()
+        self.book.Seen(pairs)
+        if self.band_margin is not None:
+            pairs = pairs[~self.book.Quiet(pairs, self.band_refresh)]
+        ratio, spread, mean, std = self.book.Bands(pairs, self.ou_bands)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            zscores = (spread - mean) / std
+        states, changed = self.book.Transitions(zscores, self.upperStd, self.lowerStd, self.mean, pairs)
+
+        insights = []
+        for k in changed:
+            stock1, stock2 = self.book.keys[k]
+            insight, state = self.TradeLogic(stock1, stock2, zscores[np.searchsorted(pairs, k)], State(self.book.states[k]))
+            insights.extend(insight)
+            self.pairs[(stock1, stock2)].state = state
+
+        self.book.states = states
+        if self.band_margin is not None:
+            low, high = self.QuietZScores(states[pairs])
+            self.book.Thresholds(pairs, ratio, mean, std, low, high)
+        return insights
+
     """
     def Plotting(self, algorithm, spread, upper, lower):
         algorithm.Plot('Spread', 'Spread', spread)
@@ -152,10 +293,6 @@ class PairsTradingAlphaModel(AlphaModel):
             else:
                 return [], State.LongRatio
         
-    def ZScore(self, series):
-        #standardize the dataset
-        return (series - series.mean()) / np.std(series)
-
 
     def OnSecuritiesChanged(self, algorithm, changes):
         
@@ -168,99 +305,182 @@ class PairsTradingAlphaModel(AlphaModel):
             if security in self.Securities:
                 self.Securities.remove(security)
         
-        #Get the symbols of the equities
-        symbols = [x.Symbol for x in self.Securities]
+        #Throw away the cached coint results that are too old
+        self.pair_cache.evict(algorithm.Time)
 
-        #Get the history, only the close, and unstack the frame
-        history = algorithm.History(symbols, self.coint_lookback, self.coint_resolution).close.unstack(level=0)
+        #Get the symbols of the equities, in the same order as the columns of a history frame
+        symbols = sorted([x.Symbol for x in self.Securities], key=str)
 
-        #method to calculate how cointegrated the stocks are
-        n = history.shape[1]
-        keys = history.columns 
+        #Go through every pair. Cached pairs are decided right away, only new or expired pairs are tested
+        untested = []
+        for i in range(len(symbols)):
+            for ii in range(i+1, len(symbols)):
+                asset1 = symbols[i]
+                asset2 = symbols[ii]
 
-        #smart looping technique. Looks at every stocks and tests it cointegration.
-        for i in range(n):
-            for ii in range(i+1, n): 
-                #Get the history of stock1 and 2
-                stock1 = history[keys[i]]
-                stock2 = history[keys[ii]]
-
-                #Get the name of the stock 1 and 2
-                asset1 = keys[i]
-                asset2 = keys[ii]
-
-                #Get the pairs, and the inverse
-                pair_symbol = (asset1, asset2)
-                invert = (asset2, asset1)
-
-                #If we already have the pairs, we dont append
-                if pair_symbol in self.pairs or invert in self.pairs:
-                    continue
-                
-                #If there is nans in the frames, we continue (broken data)
-                if stock1.hasnans or stock2.hasnans:
-                    algorithm.Debug(f'WARNING! {asset1} and {asset2} has Nans. Did not perform coint')
+                #If we already have the pairs (or the inverse), we dont test them again
+                if (asset1, asset2) in self.pairs or (asset2, asset1) in self.pairs:
                     continue
 
-                #The cointegration part, that calculates cointegration between 2 stocks
-                result = sm.tsa.stattools.coint(stock1, stock2) 
-                pvalue = result[1] 
+                pvalue = self.pair_cache.get(asset1, asset2, algorithm.Time)
+                if pvalue is None:
+                    untested.append((asset1, asset2))
+                elif pvalue < self.minimumCointegration:
+                    self.AddPair(algorithm, asset1, asset2)
+
+        if untested:
+            #Get the history, only for the stocks we have to test, only the close, and unstack the frame
+            needed = sorted({symbol for pair in untested for symbol in pair}, key=str)
+            history = HistoryCache.For(algorithm).History(needed, self.coint_lookback, self.coint_resolution).close.unstack(level=0)
+
+            #If there is nans in the frames, we dont test that stock (broken data)
+            broken = history.columns[history.isna().any()]
+            for asset in broken:
+                algorithm.Debug(f'WARNING! {asset} has Nans. Did not perform coint')
+            history = history.drop(columns=broken)
+
+            #Turn the pairs into index arrays into the columns of the history
+            column = {symbol: k for k, symbol in enumerate(history.columns)}
+            untested = [(asset1, asset2) for asset1, asset2 in untested if asset1 in column and asset2 in column]
+            left = np.array([column[asset1] for asset1, asset2 in untested], dtype=int)
+            right = np.array([column[asset2] for asset1, asset2 in untested], dtype=int)
+
+            #The cointegration part, that calculates cointegration between all the pairs in one go
+            pvalues = self.pair_tester.pvalues(history.values, left, right)
+
+            for (asset1, asset2), pvalue in zip(untested, pvalues):
+                self.pair_cache.add(asset1, asset2, algorithm.Time, pvalue)
                 if pvalue < self.minimumCointegration:
-                    #We add the pairs to the symboldata, if coint is low
-                    symbolData = AlphaSymbolData(algorithm, asset1, asset2, self.pairs_lookback)
-                    self.pairs[pair_symbol] = symbolData
-                    symbolData.RegisterIndicator(algorithm, self.pairs_resolution)
+                    self.AddPair(algorithm, asset1, asset2)
 
         for security in changes.RemovedSecurities:
             keys = [k for k in self.pairs.keys() if security.Symbol in k]
 
             #we remove from self.pairs, and from algorithm.SubscriptionsManager
             for key in keys:
-                symbolData = self.pairs.pop(key)
-                if symbolData is not None:
-                    symbolData.RemoveConsolidator(algorithm)
-
+                self.RemovePair(algorithm, key)
 
-class AlphaSymbolData:
-    def __init__(self, algorithm, symbol1, symbol2, lookback):
-
-        self.state = State.FlatRatio
-        self.coint_lookback = lookback
 
-        self.symbol1 = symbol1
-        self.symbol2 = symbol2
+    def AddPair(self, algorithm, asset1, asset2):
+        #We add the pairs to the symboldata, if coint is low
+        symbolData = AlphaSymbolData(algorithm, asset1, asset2, self.pairs_lookback, self.hedge_ratio)
+        self.pairs[(asset1, asset2)] = symbolData
+        for symbol in (asset1, asset2):
+            self.legs.setdefault(symbol, []).append((asset1, asset2))
 
-        self.window1 = RollingWindow[TradeBar](lookback)
-        self.window2 = RollingWindow[TradeBar](lookback)
+        #one consolidator per stock, not per pair. Only the first pair with the stock sets it up
+        for symbol in (asset1, asset2):
+            if self.store.Subscribe(symbol):
+                consolidator = TradeBarConsolidator(timedelta(hours=1))
+                consolidator.DataConsolidated += self.consolidation_handler
+                algorithm.SubscriptionManager.AddConsolidator(symbol, consolidator)
+                self.consolidators[symbol] = consolidator
 
-        self.Consolidator1 = None
-        self.Consolidator2 = None
-        
+        #the pair starts from the closes the store already has of the two stocks
+        if self.book is not None:
+            self.book.AddPair(asset1, asset2)
+        else:
+            symbolData.WarmUp(self.store)
+            symbolData.Seen(self.store)
 
-    def RegisterIndicator(self, algorithm, resolution):
-        self.Consolidator1 = TradeBarConsolidator(timedelta(hours=1))
-        self.Consolidator2 = TradeBarConsolidator(timedelta(hours=1))
 
-        self.Consolidator1.DataConsolidated += self.consolidation_handler1
-        self.Consolidator2.DataConsolidated += self.consolidation_handler2
+    def RemovePair(self, algorithm, key):
+        self.pairs.pop(key)
+        if self.book is not None:
+            self.book.RemovePair(key)
+        for symbol in key:
+            self.legs[symbol].remove(key)
+            if not self.legs[symbol]:
+                del self.legs[symbol]
 
-        algorithm.SubscriptionManager.AddConsolidator(self.symbol1, self.Consolidator1)
-        algorithm.SubscriptionManager.AddConsolidator(self.symbol2, self.Consolidator2)
+        #the last pair with a stock removes its consolidator, and frees its closes
+        for symbol in key:
+            if self.store.Unsubscribe(symbol):
+                consolidator = self.consolidators.pop(symbol)
+                algorithm.SubscriptionManager.RemoveConsolidator(symbol, consolidator)
 
 
-    def RemoveConsolidator(self, algorithm):
-        if self.Consolidator1 is not None and self.Consolidator2 is not None:
-            algorithm.SubscriptionManager.RemoveConsolidator(self.symbol1, self.Consolidator1)
-            algorithm.SubscriptionManager.RemoveConsolidator(self.symbol2, self.Consolidator2)
+    def consolidation_handler(self, sender: object, consolidated_bar: TradeBar) -> None:
+        self.store.Push(consolidated_bar.Symbol, float(consolidated_bar.Close))
 
 
-    def consolidation_handler1(self, sender: object, consolidated_bar: TradeBar) -> None:
-        self.window1.Add(consolidated_bar)
+class AlphaSymbolData:
+    def __init__(self, algorithm, symbol1, symbol2, lookback, hedge_ratio = RollingRegression):
 
+        self.state = State.FlatRatio
+        self.coint_lookback = lookback
 
-    def consolidation_handler2(self, sender: object, consolidated_bar: TradeBar) -> None:
-        self.window2.Add(consolidated_bar)
+        self.symbol1 = symbol1
+        self.symbol2 = symbol2
 
+        #regression of symbol2 on symbol1 over the lookback, fed with one close of each stock per bar
+        self.Regression = hedge_ratio(lookback)
+
+        #for the event driven signals, the bar counts of both stocks at the last evaluation and the spread thresholds, see Thresholds
+        self.seen1 = 0
+        self.seen2 = 0
+        self.ratio = np.nan
+        self.low = np.nan
+        self.high = np.nan
+        self.skipped = 0
+
+
+    def WarmUp(self, store):
+        #feed the regression with the closes the store already has of both stocks
+        closes1, closes2 = store.History(self.symbol1, self.symbol2)
+        for close1, close2 in zip(closes1, closes2):
+            self.Regression.Update(float(close1), float(close2))
+
+
+    def OUZScore(self, store):
+        #zscore of the newest spread against the OU fit of the spread over the window, with the current hedge ratio
+        closes1, closes2 = store.History(self.symbol1, self.symbol2)
+        return float(ou_zscores(closes2 - self.Regression.HedgeRatio * closes1))
+
+
+    def Seen(self, store):
+        #the pair is evaluated on the newest bars of both stocks
+        self.seen1 = int(store.bars[store.rows[self.symbol1]])
+        self.seen2 = int(store.bars[store.rows[self.symbol2]])
+
+
+    def Quiet(self, store, refresh):
+        #True if the newest spread is between the thresholds of the last evaluation, so the zscore is not near a band.
+        #After refresh skips in a row the pair is evaluated anyway, as the fit drifts away from the thresholds
+        spread = store.latest[store.rows[self.symbol2]] - self.ratio * store.latest[store.rows[self.symbol1]]
+        quiet = self.low <= spread <= self.high and self.skipped < refresh
+        self.skipped = self.skipped + 1 if quiet else 0
+        return quiet
+
+
+    def Bands(self, store, ou = False):
+        #the hedge ratio, newest spread, and the mean and std of the spread, so the zscore is (spread - mean) / std.
+        #Gives the same zscore as Regression.ZScore, or OUZScore with ou
+        ratio = self.Regression.HedgeRatio
+        if ou:
+            closes1, closes2 = store.History(self.symbol1, self.symbol2)
+            spreads = closes2 - ratio * closes1
+            theta, mu, sigma = fit_ou(spreads)
+            return ratio, spreads[-1], mu, np.sqrt(ou_variance(sigma, theta))
+        close1 = store.latest[store.rows[self.symbol1]]
+        close2 = store.latest[store.rows[self.symbol2]]
+        return ratio, close2 - ratio * close1, self.Regression.SpreadMean, self.Regression.SpreadStd
+
+
+    def Thresholds(self, ratio, mean, std, low, high):
+        #the zscores low and high as spreads y - ratio * x, with the fit of this evaluation
+        self.ratio = ratio
+        with np.errstate(invalid='ignore'):
+            self.low = mean + low * std
+            self.high = mean + high * std
+
+
+    def Update(self, store):
+        #called once per bar, after the store has stepped
+        close1 = store.latest[store.rows[self.symbol1]]
+        close2 = store.latest[store.rows[self.symbol2]]
+        if not (np.isnan(close1) or np.isnan(close2)):
+            self.Regression.Update(float(close1), float(close2))
 
 
 class State(Enum):
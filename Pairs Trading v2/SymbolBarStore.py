@@ -0,0 +1,118 @@
+import numpy as np
+
+
+class SymbolBarStore:
+    #The closes of every stock we trade in a pair, stored once per stock no matter how many pairs it is in.
+    #Each stock gets one row (a float64 ring buffer of lookback closes) in a shared matrix, and is reference counted
+    #by the pairs that use it, so the row is freed when the last pair goes. The caller keeps one consolidator per stock
+    #and pushes its closes in here.
+    def __init__(self, lookback):
+        self.lookback = lookback
+        self.rows = {}
+        self.free_rows = []
+        self.prices = np.full((0, lookback), np.nan)
+        #how many closes each row has, up to lookback
+        self.counts = np.zeros(0, dtype=int)
+        #how many pairs use each row
+        self.references = np.zeros(0, dtype=int)
+        #how many bars each row has had in total, so a pair can tell if both its stocks have a new bar, and the symbol of each row
+        self.bars = np.zeros(0, dtype=int)
+        self.symbols = []
+
+        #column the next bar is written to
+        self.head = 0
+        #closes that came in since the last step, by row, and the rows that got a close in the last step
+        self.pending = {}
+        self.updated = np.zeros(0, dtype=int)
+
+        #the column written by the last step, and the column it overwrote
+        self.latest = np.zeros(0)
+        self.outgoing = np.zeros(0)
+
+    def __contains__(self, symbol):
+        return symbol in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def Subscribe(self, symbol):
+        #a pair starts using the stock. Returns True if the stock is new, then the caller has to start consolidating it
+        new = symbol not in self.rows
+        if new:
+            self.AddRow(symbol)
+        self.references[self.rows[symbol]] += 1
+        return new
+
+    def Unsubscribe(self, symbol):
+        #a pair stops using the stock. Returns True if no pair uses it anymore, then the caller can drop its consolidator
+        row = self.rows[symbol]
+        self.references[row] -= 1
+        if self.references[row] > 0:
+            return False
+
+        del self.rows[symbol]
+        self.symbols[row] = None
+        self.prices[row] = np.nan
+        self.counts[row] = 0
+        self.pending.pop(row, None)
+        self.free_rows.append(row)
+        return True
+
+    def AddRow(self, symbol):
+        if not self.free_rows:
+            #double the matrix when we run out of rows
+            size = len(self.counts)
+            grow = max(size, 8)
+            self.free_rows.extend(range(size + grow - 1, size - 1, -1))
+            self.prices = np.vstack([self.prices, np.full((grow, self.lookback), np.nan)])
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=int)])
+            self.references = np.concatenate([self.references, np.zeros(grow, dtype=int)])
+            self.bars = np.concatenate([self.bars, np.zeros(grow, dtype=int)])
+            self.symbols.extend([None] * grow)
+            self.latest = np.concatenate([self.latest, np.full(grow, np.nan)])
+            self.outgoing = np.concatenate([self.outgoing, np.full(grow, np.nan)])
+
+        row = self.rows[symbol] = self.free_rows.pop()
+        self.bars[row] = 0
+        self.symbols[row] = symbol
+
+    def Push(self, symbol, close):
+        #called by the consolidators. The close is stored until the next step
+        row = self.rows.get(symbol)
+        if row is not None:
+            self.pending[row] = close
+
+    def Step(self):
+        #moves every ring buffer one bar forward with the closes that came in. Returns False if there was nothing new
+        if not self.pending:
+            return False
+
+        #stocks without a new bar keep their last close, so every row stays on the same clock
+        column = self.prices[:, self.head - 1].copy()
+        rows = np.fromiter(self.pending.keys(), dtype=int, count=len(self.pending))
+        column[rows] = np.fromiter(self.pending.values(), dtype=float, count=len(self.pending))
+        self.pending = {}
+        self.updated = rows
+        self.bars[rows] += 1
+
+        self.outgoing = self.prices[:, self.head].copy()
+        self.latest = column
+        self.prices[:, self.head] = column
+        self.head = (self.head + 1) % self.lookback
+
+        has_price = ~np.isnan(column)
+        self.counts[has_price] = np.minimum(self.counts[has_price] + 1, self.lookback)
+        return True
+
+    def Window(self, rows):
+        #the closes of the given rows, oldest first. Rows with less than lookback closes have nans at the start
+        order = (np.arange(self.lookback) + self.head) % self.lookback
+        return self.prices[rows][..., order]
+
+    def History(self, symbol1, symbol2):
+        #the closes the two stocks have in common, oldest first
+        row1 = self.rows[symbol1]
+        row2 = self.rows[symbol2]
+        n = min(self.counts[row1], self.counts[row2])
+        window = self.Window([row1, row2])
+        return window[0, self.lookback - n:], window[1, self.lookback - n:]
@@ -1,10 +1,12 @@
 from AlgorithmImports import *
 from EqualPCM import EqualWeightedPairsTradingPortfolio
 from PairsTradingAlpha import PairsTradingAlphaModel
-from ExecutionModel import MarketOrderModel
+from ExecutionModel import PairExecutionModel
 from RiskModel import NoRiskManagment
 from datetime import timedelta
 from System.Drawing import Color
+from CoarseSelection import CoarseSelection
+from ModelProfiler import ModelProfiler
 
 ### <summary>
 ### Framework algorithm that uses the PearsonCorrelationPairsTradingAlphaModel.
@@ -27,20 +29,27 @@ class PairsTradingV2(QCAlgorithm):
         self.UniverseSettings.Resolution = Resolution.Hour
 
         self.AddUniverse(self.CoarseUniverse)
-        self.SetAlpha(PairsTradingAlphaModel(coint_lookback = 200,
+        #times the framework models, see ModelProfiler. enabled = True to get the report at the end of the backtest
+        self.profiler = ModelProfiler(self, enabled = False)
+        self.SetAlpha(self.profiler.Wrap(PairsTradingAlphaModel(coint_lookback = 200,
                                             coint_resolution = Resolution.Hour,
                                             prediction = timedelta(days=10),
                                             minimumCointegration = 0.05,
                                             std=2,
                                             stoplossStd=2.5,
                                             pairs_lookback=500,
-                                            pairs_resolution=Resolution.Hour
-                                            ))
-        self.SetPortfolioConstruction(EqualWeightedPairsTradingPortfolio())
-        self.SetExecution(MarketOrderModel())
-        self.SetRiskManagement(NoRiskManagment())
+                                            pairs_resolution=Resolution.Hour,
+                                            coint_ttl=timedelta(days=90),
+                                            batched=True
+                                            )))
+        self.SetPortfolioConstruction(self.profiler.Wrap(EqualWeightedPairsTradingPortfolio(tolerance = 0.0, rebalance = Resolution.Daily)))
+        #sends the two legs of a pair together, and measures the time between their fills
+        self.execution = PairExecutionModel()
+        self.SetExecution(self.profiler.Wrap(self.execution))
+        self.SetRiskManagement(self.profiler.Wrap(NoRiskManagment()))
 
-        self.lastMonth = -1
+        #Exclude stocks like BRKA that cost 500.000 dollars
+        self.coarse_selection = CoarseSelection(min_price = 15, max_price = 4000)
 
         """
         stockPlot = Chart('Spread')
@@ -54,14 +63,8 @@ class PairsTradingV2(QCAlgorithm):
 
     def CoarseUniverse(self, coarse):
 
-        if self.Time.month == self.lastMonth:
-            return Universe.Unchanged
-        self.lastMonth = self.Time.month
-        #Exclude stocks like BRKA that cost 500.000 dollars
-        selected = sorted([x for x in coarse if x.HasFundamentalData and x.Price > 15 and x.Price < 4000], 
-                        key = lambda x: x.DollarVolume, reverse = True)
-
-        return [x.Symbol for x in selected[:self.num_coarse]]
+        symbols = self.coarse_selection.Select(self.Time, coarse, self.num_coarse)
+        return Universe.Unchanged if symbols is None else symbols
 
 
     def OnEndOfDay(self):
@@ -70,3 +73,9 @@ class PairsTradingV2(QCAlgorithm):
         self.Plot(f"Margin", "Remaining", self.Portfolio.MarginRemaining)
         self.Plot(f"Cash", "Remaining", self.Portfolio.Cash)
 
+    def OnOrderEvent(self, orderEvent):
+        self.execution.OnOrderEvent(self, orderEvent)
+
+    def OnEndOfAlgorithm(self):
+        self.profiler.Report()
+        self.execution.Report(self)
@@ -0,0 +1,170 @@
+import numpy as np
+
+
+class VolatilityRanker:
+    #The rolling volatility of many symbols, kept up to date one daily price at a time, so ranking them needs no history.
+    #Every symbol gets a row in a ring buffer of its last window values (prices, or log returns with returns = True),
+    #and the mean and sum of squared deviations of the window are moved with Welford updates as values come and go.
+    #A row is recomputed from its buffer every time the buffer wraps around, so rounding errors do not build up.
+    #The window is a number of values, not of days: a symbol gets one value per Update it is in. A symbol that misses
+    #Updates would have a window that goes further back than the others, so Expire drops the symbols that have not had a
+    #value for a while, and they start over (or are seeded again) when they come back. Removed rows are reused
+    def __init__(self, window=360, returns=False):
+        self.window = window
+        self.returns = returns
+        self.rows = {}
+        self.free_rows = []
+        self.values = np.zeros((0, window))
+        self.counts = np.zeros(0, dtype=int)
+        self.heads = np.zeros(0, dtype=int)
+        self.means = np.zeros(0)
+        self.m2 = np.zeros(0)
+        #the last price of every row, for the returns
+        self.last = np.zeros(0)
+        #the number of Updates so far, and the Update each row had its last value in
+        self.step = 0
+        self.stamps = np.zeros(0, dtype=int)
+        #symbols that got their window from a history call, see Seed
+        self.seeded = set()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, symbol):
+        return symbol in self.rows
+
+    def Rows(self, symbols):
+        #the row of every symbol, symbols we have not seen get a new one, or one that was freed by Remove
+        for symbol in symbols:
+            if symbol not in self.rows:
+                if not self.free_rows:
+                    self.Grow()
+                row = self.rows[symbol] = self.free_rows.pop()
+                self.values[row] = 0
+                self.counts[row] = 0
+                self.heads[row] = 0
+                self.means[row] = 0
+                self.m2[row] = 0
+                self.last[row] = np.nan
+                self.stamps[row] = self.step
+        return np.array([self.rows[symbol] for symbol in symbols], dtype=int)
+
+    def Grow(self):
+        #double the arrays when we run out of rows
+        size = len(self.counts)
+        grow = max(size, 8)
+        self.free_rows.extend(range(size + grow - 1, size - 1, -1))
+        self.values = np.vstack([self.values, np.zeros((grow, self.window))])
+        self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=int)])
+        self.heads = np.concatenate([self.heads, np.zeros(grow, dtype=int)])
+        self.means = np.concatenate([self.means, np.zeros(grow)])
+        self.m2 = np.concatenate([self.m2, np.zeros(grow)])
+        self.last = np.concatenate([self.last, np.full(grow, np.nan)])
+        self.stamps = np.concatenate([self.stamps, np.zeros(grow, dtype=int)])
+
+    def Remove(self, symbols):
+        #frees the rows of the symbols, they start over if they come back
+        for symbol in symbols:
+            row = self.rows.pop(symbol, None)
+            if row is not None:
+                self.free_rows.append(row)
+            self.seeded.discard(symbol)
+
+    def Expire(self, age):
+        #removes the symbols that have not had a value in the last age Updates, and returns them
+        symbols = list(self.rows)
+        rows = np.fromiter(self.rows.values(), dtype=int, count=len(symbols))
+        expired = [symbols[k] for k in np.flatnonzero(self.step - self.stamps[rows] >= age)]
+        self.Remove(expired)
+        return expired
+
+    def Update(self, symbols, prices):
+        #one new price for each of the symbols, like the daily coarse prices. A symbol must not come twice
+        self.step += 1
+        rows = self.Rows(symbols)
+        self.stamps[rows] = self.step
+        prices = np.asarray(prices, dtype=float)
+        if self.returns:
+            #the first price of a symbol only starts its returns
+            values = np.log(prices / self.last[rows])
+            self.last[rows] = prices
+            started = ~np.isnan(values)
+            rows, values = rows[started], values[started]
+        self.Push(rows, values if self.returns else prices)
+
+    def Push(self, rows, values):
+        heads = self.heads[rows]
+        counts = self.counts[rows]
+        full = counts == self.window
+        old = self.values[rows, heads]
+        self.values[rows, heads] = values
+
+        #a full window swaps the oldest value for the new one, the others grow by one
+        growing = ~full
+        counts = np.where(growing, counts + 1, counts)
+        means = self.means[rows]
+        delta = np.where(growing, values - means, values - old)
+        new_means = means + delta / counts
+        self.m2[rows] += np.where(growing, delta * (values - new_means), delta * (values - new_means + old - means))
+        self.means[rows] = new_means
+        self.counts[rows] = counts
+        self.heads[rows] = (heads + 1) % self.window
+
+        wrapped = rows[self.heads[rows] == 0]
+        if len(wrapped):
+            self.Recompute(wrapped)
+
+    def Recompute(self, rows):
+        window = self.values[rows]
+        self.means[rows] = window.mean(axis=1)
+        self.m2[rows] = ((window - self.means[rows][:, None]) ** 2).sum(axis=1)
+
+    def Seed(self, symbol, prices):
+        #replaces the window of a symbol with its last prices from a history call. Used once per symbol,
+        #when it is ranked before we have streamed a full window of it
+        row = self.Rows([symbol])[0]
+        prices = np.asarray(prices, dtype=float)
+        prices = prices[~np.isnan(prices)]
+        values = np.diff(np.log(prices)) if self.returns else prices
+        values = values[-self.window:]
+        self.values[row] = 0
+        self.values[row, :len(values)] = values
+        self.counts[row] = len(values)
+        self.heads[row] = len(values) % self.window
+        self.means[row] = values.mean() if len(values) else 0
+        self.m2[row] = ((values - self.means[row]) ** 2).sum()
+        self.last[row] = prices[-1] if len(prices) else np.nan
+        self.stamps[row] = self.step
+        self.seeded.add(symbol)
+
+    def MarkSeeded(self, symbols):
+        #the symbols the history call had nothing for, so they are not asked for again and stream their window instead
+        self.seeded.update(symbols)
+
+    def Unseeded(self, symbols):
+        #the symbols with less than a full window that have not been seeded yet
+        return [symbol for symbol in symbols if symbol not in self.seeded and (symbol not in self.rows or self.counts[self.rows[symbol]] < self.window)]
+
+    def Volatility(self, symbols):
+        #the population standard deviation of the window of every symbol, nan with less than 2 values
+        rows = np.array([self.rows.get(symbol, -1) for symbol in symbols], dtype=int)
+        if len(self.counts) == 0:
+            return np.full(len(rows), np.nan)
+        known = rows >= 0
+        counts = np.where(known, self.counts[rows], 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.where(counts > 1, self.m2[rows] / counts, np.nan)
+        return np.sqrt(np.maximum(variance, 0))
+
+    def Top(self, symbols, k):
+        #the k most volatile of the symbols, in the order they came in. Symbols without a volatility are never picked
+        symbols = list(symbols)
+        volatility = self.Volatility(symbols)
+        candidates = np.flatnonzero(~np.isnan(volatility))
+        if k <= 0:
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-volatility[candidates], k - 1)[:k]]
+        picked = np.zeros(len(symbols), dtype=bool)
+        picked[candidates] = True
+        return [symbol for symbol, keep in zip(symbols, picked) if keep]
@@ -0,0 +1,44 @@
+#Times a history request the way the algorithms make them, a long History frame unstacked to (time x symbol),
+#against BarStore.history_panel on a memory mapped store, and checks that they agree.
+#Run from the repo root: python benchmarks/bar_store_benchmark.py
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from BarStore import BarStore
+from Feeds import BarFeed
+from QuantConnect import Resolution
+
+
+def main(symbol_counts=(10, 100, 1000), days=360, repeats=20):
+    #360 days is SortVolatility of the bollinger bands algorithm
+    print(f"{'symbols':>8} {'unstack ms':>11} {'panel ms':>9} {'speedup':>8} {'max diff':>9}")
+    for count in symbol_counts:
+        feed = BarFeed.Synthetic(symbols = count, bars = 2 * days, benchmark = None)
+        with tempfile.TemporaryDirectory() as path:
+            store = feed.ToStore(path)
+            symbols = feed.symbols
+            now = feed.end_times[-1]
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                expected = feed.History(symbols, days, Resolution.Daily, now).close.unstack(level = 0)
+            unstack_time = (time.perf_counter() - start) / repeats
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                panel = store.history_panel(symbols, now - (feed.end_times[-1] - feed.end_times[-days]), now)
+            panel_time = (time.perf_counter() - start) / repeats
+
+            diff = np.abs(panel - expected[[str(symbol) for symbol in symbols]].to_numpy()).max()
+            del panel, store
+        print(f'{count:>8} {1000 * unstack_time:>11.3f} {1000 * panel_time:>9.3f} {unstack_time / panel_time:>8.0f} {diff:>9.1e}')
+
+
+if __name__ == '__main__':
+    main()
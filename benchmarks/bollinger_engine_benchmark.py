@@ -0,0 +1,82 @@
+#Times a slice of the bollinger alpha, a new close for every symbol and a signal pass: a BollingerBands indicator per
+#symbol updated by its consolidator, read three times and the branches of the old Update, against the closes pushed into
+#the BollingerEngine, one Flush and the vectorized Signals. Checks they give the same directions on every slice.
+#Run from the repo root: python benchmarks/bollinger_engine_benchmark.py
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from BollingerEngine import BollingerEngine
+from QuantConnect.Indicators import BollingerBands, MovingAverageType
+
+
+def indicator_signals(indicators, prices, positions):
+    #the loop of the old Update, one symbol at a time
+    directions = {}
+    for symbol, bollinger in indicators.items():
+        price = prices[symbol]
+        lower = bollinger.LowerBand.Current.Value
+        upper = bollinger.UpperBand.Current.Value
+        middle = bollinger.MiddleBand.Current.Value
+        if positions[symbol] > 0:
+            direction = 0 if price >= middle else 1
+        elif positions[symbol] < 0:
+            direction = 0 if price <= middle else -1
+        else:
+            direction = 1 if price <= lower else -1 if price >= upper else 0
+        directions[symbol] = direction
+    return directions
+
+
+def main(symbol_counts=(100, 1000, 5000), period=10, deviation=2, bars=30, slices=20):
+    print(f"{'symbols':>8} {'indicators ms':>14} {'engine ms':>10} {'speedup':>8} {'same':>5}")
+    rng = np.random.default_rng(0)
+    for n in symbol_counts:
+        symbols = [f'SYM{k:05d}' for k in range(n)]
+        closes = 100 * np.exp(np.cumsum(rng.normal(scale=0.02, size=(bars + slices, n)), axis=0))
+        positions = rng.choice([-10, 0, 0, 10], size=n)
+
+        engine = BollingerEngine(period, deviation)
+        indicators = {}
+        for k, symbol in enumerate(symbols):
+            engine.Add(symbol, positions[k])
+            indicators[symbol] = BollingerBands(period, deviation, MovingAverageType.Exponential)
+            for i in range(bars):
+                indicators[symbol].Update(i, closes[i, k])
+        engine.WarmUp(symbols, closes[:bars])
+        held = dict(zip(symbols, positions))
+        #the engine only returns the symbols whose direction changed
+        engine_directions = {}
+
+        indicator_time = engine_time = 0.0
+        same = True
+        for i in range(bars, bars + slices):
+            slice_closes = closes[i].tolist()
+
+            start = time.perf_counter()
+            for symbol, close in zip(symbols, slice_closes):
+                indicators[symbol].Update(i, close)
+            expected = indicator_signals(indicators, dict(zip(symbols, slice_closes)), held)
+            indicator_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for symbol, close in zip(symbols, slice_closes):
+                engine.Push(symbol, close)
+            engine.Flush()
+            changed, directions = engine.Signals()
+            engine_time += time.perf_counter() - start
+
+            engine_directions.update(zip(changed, directions.tolist()))
+            same = same and engine_directions == expected
+
+        indicator_time /= slices
+        engine_time /= slices
+        print(f'{n:>8} {1000 * indicator_time:>14.3f} {1000 * engine_time:>10.3f} {indicator_time / engine_time:>7.1f}x {str(same):>5}')
+
+
+if __name__ == '__main__':
+    main()
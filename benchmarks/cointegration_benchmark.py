@@ -0,0 +1,62 @@
+#Times the batched Engle-Granger screener in Cointegration.py against the coint loop the frameworks used before.
+#Run from the repo root: python benchmarks/cointegration_benchmark.py
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from Cointegration import find_cointegrated_pairs
+
+
+def synthetic_prices(n, length=200, factors=5, seed=0):
+    #random walks driven by a few common factors, so some of the pairs are actually cointegrated
+    rng = np.random.default_rng(seed)
+    common = np.cumsum(rng.normal(size=(length, factors)), axis=0)
+    loadings = rng.uniform(0.5, 2.0, n)
+    noise = rng.normal(scale=rng.uniform(0.2, 3.0, n), size=(length, n))
+    prices = 100 + common[:, rng.integers(0, factors, n)] * loadings + noise
+    return pd.DataFrame(prices, columns=[f'S{i}' for i in range(n)])
+
+
+def looping_cointegrated_pairs(dataframe, critical_level=0.02):
+    #the old version from Kalman_filter_framework.py, kept here as the reference
+    n = dataframe.shape[1]
+    pvalue_matrix = np.ones((n, n))
+    keys = dataframe.columns
+    pairs = []
+    for i in range(n):
+        for ii in range(i+1, n):
+            pvalue = sm.tsa.stattools.coint(dataframe[keys[i]], dataframe[keys[ii]])[1]
+            pvalue_matrix[i, ii] = pvalue
+            if pvalue < critical_level:
+                pairs.append((keys[i], keys[ii], pvalue))
+    return pvalue_matrix, pairs
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes=(30, 100, 200)):
+    warnings.simplefilter('ignore')
+    print(f"{'symbols':>8} {'pairs':>8} {'loop (s)':>10} {'batched (s)':>12} {'speedup':>8} {'max diff':>10}")
+    for n in sizes:
+        prices = synthetic_prices(n)
+        (loop_matrix, loop_pairs), loop_time = timed(looping_cointegrated_pairs, prices)
+        (batch_matrix, batch_pairs), batch_time = timed(find_cointegrated_pairs, prices)
+
+        #the pair lists have to be the same, the pvalues equal up to float noise
+        assert [p[:2] for p in loop_pairs] == [p[:2] for p in batch_pairs]
+        diff = np.abs(loop_matrix - batch_matrix).max()
+        print(f"{n:>8} {n * (n - 1) // 2:>8} {loop_time:>10.2f} {batch_time:>12.3f} {loop_time / batch_time:>7.0f}x {diff:>10.1e}")
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or (30, 100, 200))
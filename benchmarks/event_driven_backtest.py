@@ -0,0 +1,70 @@
+#Runs the Pairs Trading v2 strategy on the harness with its alpha polling every pair on every bar, and event driven (the dirty
+#queue, without a band_margin), in the loop and in the PairBook, and checks they send the same insights and orders.
+#Every stock of the synthetic feed has a bar every hour, so a pair with a new bar on one stock always has one on the other,
+#and the event driven alpha has to evaluate the same pairs at the same bars as polling does. With missing bars they differ,
+#see PairsTradingAlphaModel. Exits with 1 when they are not the same.
+#Run from the repo root: python benchmarks/event_driven_backtest.py [--symbols 10 30]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from Feeds import BarFeed
+from Runner import load_algorithm, run
+from framework_benchmark import FRAMEWORKS
+
+MODES = {'polling': dict(event_driven = False), 'event': dict(event_driven = True, band_margin = None)}
+
+
+def alpha_with(alpha_class, **settings):
+    #the alpha of main.py with some of its settings replaced
+    class Alpha(alpha_class):
+        def __init__(self, *args, **kwargs):
+            kwargs.update(settings)
+            super().__init__(*args, **kwargs)
+    return Alpha
+
+
+def backtest(algorithm_class, feed, bars, size, **settings):
+    module = sys.modules[algorithm_class.__module__]
+    alpha_class = module.PairsTradingAlphaModel
+    module.PairsTradingAlphaModel = alpha_with(alpha_class, **settings)
+    try:
+        start = time.perf_counter()
+        algorithm = run(algorithm_class, feed, start = feed.times[-bars].to_pydatetime(), end = feed.end_times[-1].to_pydatetime(),
+                        **FRAMEWORKS['v2'][5](size))
+        seconds = time.perf_counter() - start
+    finally:
+        module.PairsTradingAlphaModel = alpha_class
+    insights = sorted((insight.GeneratedTimeUtc, str(insight.Symbol), int(insight.Direction)) for insight in algorithm.Insights)
+    orders = sorted((order.Time, str(order.Symbol), order.Quantity) for order in algorithm.Transactions.GetOrders())
+    return seconds, insights, orders
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', nargs = '+', type = int, default = [10, 30])
+    args = parser.parse_args()
+
+    path, name, resolution, warmup, bars, settings = FRAMEWORKS['v2']
+    algorithm_class = load_algorithm(path, name)
+    print(f"{'symbols':>8} {'batched':>8} {'mode':>8} {'seconds':>8} {'insights':>9} {'orders':>7} {'same':>5}")
+    failed = False
+    for size in args.symbols:
+        feed = BarFeed.Synthetic(symbols = size, bars = warmup + bars, resolution = resolution)
+        for batched in (True, False):
+            polling = None
+            for mode, mode_settings in MODES.items():
+                seconds, insights, orders = backtest(algorithm_class, feed, bars, size, batched = batched, **mode_settings)
+                if polling is None:
+                    polling = insights, orders
+                same = (insights, orders) == polling
+                failed = failed or not same
+                print(f'{size:>8} {str(batched):>8} {mode:>8} {seconds:>8.2f} {len(insights):>9} {len(orders):>7} {str(same):>5}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
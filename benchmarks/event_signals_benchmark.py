@@ -0,0 +1,72 @@
+#Times the pair signals of the PairsTradingAlphaModel polling every pair on every bar, against the event driven mode
+#(the dirty queue, and the spread thresholds with a band_margin), in the loop and in the PairBook, with and without OU bands.
+#Some bars are dropped at random, so not every stock has a bar every step. Also counts how many insights each one sends.
+#Run from the repo root: python benchmarks/event_signals_benchmark.py
+import os
+import sys
+import time as clock
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Pairs Trading v2'))
+from AlgorithmImports import *
+from PairsTradingAlpha import PairsTradingAlphaModel
+
+
+class Subscriptions:
+    def AddConsolidator(self, symbol, consolidator):
+        pass
+
+
+class Algorithm:
+    #just what AddPair and Update use
+    SubscriptionManager = Subscriptions()
+
+    def IsMarketOpen(self, symbol):
+        return True
+
+
+def prices(symbols, bars, missing, seed=1):
+    #two random walk factors and a stationary part per stock, so every pair is more or less cointegrated
+    rng = np.random.default_rng(seed)
+    trends = np.cumsum(rng.normal(scale=0.01, size=(bars, 2)), axis=0)
+    loadings = rng.uniform(0.5, 1.5, size=(2, symbols))
+    noise = np.zeros((bars, symbols))
+    for t in range(1, bars):
+        noise[t] = 0.95 * noise[t - 1] + rng.normal(scale=0.01, size=symbols)
+    return 50 * np.exp(trends @ loadings + noise), rng.random((bars, symbols)) < missing
+
+
+def run(closes, missing, lookback, **settings):
+    symbols = [f'SYM{k:03d}' for k in range(closes.shape[1])]
+    alpha = PairsTradingAlphaModel(200, None, timedelta(days=1), 0.05, 1.5, 2.5, lookback, None, **settings)
+    algorithm = Algorithm()
+    for i in range(len(symbols)):
+        for ii in range(i + 1, len(symbols)):
+            alpha.AddPair(algorithm, symbols[i], symbols[ii])
+
+    insights = 0
+    start = clock.perf_counter()
+    for t in range(len(closes)):
+        for k, symbol in enumerate(symbols):
+            if not missing[t, k]:
+                alpha.store.Push(symbol, closes[t, k])
+        insights += len(alpha.Update(algorithm, None))
+    return clock.perf_counter() - start, insights
+
+
+def main(symbols=12, bars=1500, lookback=200, missing=0.1):
+    closes, missing = prices(symbols, bars, missing)
+    modes = {'polling': {}, 'event': {'event_driven': True}, 'event + margin': {'event_driven': True, 'band_margin': 0.5}}
+    print(f"{'mode':>15} {'batched':>8} {'ou':>6} {'seconds':>8} {'insights':>9}")
+    for ou in (False, True):
+        for batched in (False, True):
+            for name, settings in modes.items():
+                seconds, insights = run(closes, missing, lookback, batched=batched, ou_bands=ou, **settings)
+                print(f'{name:>15} {str(batched):>8} {str(ou):>6} {seconds:>8.2f} {insights:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#Runs the four strategies offline on the harness, on a synthetic feed, and times their framework calls
+#(Update, OnSecuritiesChanged, CreateTargets, ...) at 10, 100 and 1000 symbols in the universe.
+#The results on the synthetic feed are compared with the ones checked in to framework_baseline.json: a different number
+#of insights or orders, or a total or call time more than --tolerance times the baseline (plus SLACK), is a regression and the script
+#exits with 1. --save-baseline writes the results to the baseline instead, after a change that is meant to change them.
+#Run from the repo root: python benchmarks/framework_benchmark.py [framework ...] [--sizes 10 100] [--csv folder | --store folder]
+#                        [--tolerance 1.5] [--save-baseline]
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from Feeds import BarFeed
+from QuantConnect import Resolution
+from Runner import load_algorithm, run
+
+#file, algorithm class, resolution, bars of warm up and bars of backtest, and how to set the universe size. The backtests
+#are long enough for every strategy to trade on the synthetic feed: v2 needs 500 hourly bars of a pair before it trades it
+FRAMEWORKS = {
+    'bollinger': ('Bollingerbands_framework.py', 'BollBands', Resolution.Daily, 400, 120,
+                  lambda size: dict(coarse_filter = size, fine_filter = max(size // 10, 1))),
+    'kalman': ('Kalman_filter_framework.py', 'CointegrationAndKalmanFilter', Resolution.Daily, 800, 60,
+               lambda size: dict(num_coarse = size)),
+    'momentum': ('Momentum_framework/main.py', 'MomentumFrameworkAlgo', Resolution.Hour, 7 * 600, 7 * 40,
+                 lambda size: dict(num_coarse = size)),
+    'v2': ('Pairs Trading v2/main.py', 'PairsTradingV2', Resolution.Hour, 7 * 120, 7 * 100,
+           lambda size: dict(num_coarse = size)),
+}
+
+CALLS = ('Update', 'OnSecuritiesChanged', 'CreateTargets')
+
+#how much slower than tolerance times the baseline a total (s) or a call (ms) can be before it is a regression
+SLACK = {'s': 0.5, 'ms': 2.0}
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'framework_baseline.json')
+
+
+class Timer:
+    #the engine calls it around every framework call. Keeps the number of calls and the total time per call name
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.totals = defaultdict(float)
+
+    def __call__(self, name, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.totals[name] += time.perf_counter() - start
+        self.counts[name] += 1
+        return result
+
+    def Mean(self, call):
+        #the mean time of a call over all the models that have it, in ms
+        names = [name for name in self.counts if name.endswith('.' + call)]
+        count = sum(self.counts[name] for name in names)
+        return 1000 * sum(self.totals[name] for name in names) / count if count else float('nan')
+
+
+def benchmark(framework, size, feed=None):
+    path, name, resolution, warmup, bars, settings = FRAMEWORKS[framework]
+    if feed is None:
+        feed = BarFeed.Synthetic(symbols = size, bars = warmup + bars, resolution = resolution)
+    algorithm_class = load_algorithm(path, name)
+    timer = Timer()
+    start = time.perf_counter()
+    algorithm = run(algorithm_class, feed, start = feed.times[-bars].to_pydatetime(), end = feed.end_times[-1].to_pydatetime(),
+                    timer = timer, **settings(size))
+    return timer, time.perf_counter() - start, algorithm
+
+
+def regressions(result, baseline, tolerance):
+    #what got worse than the baseline of the same framework and size
+    found = []
+    for key in ('insights', 'orders'):
+        if result[key] != baseline[key]:
+            found.append(f'{key} {result[key]} != {baseline[key]}')
+    for key in ('total s',) + tuple(call + ' ms' for call in CALLS):
+        #a call the framework does not make is nan. Short runs and calls are mostly noise, so the time has to be more than
+        #SLACK over tolerance times the baseline
+        slack = SLACK['s' if key.endswith(' s') else 'ms']
+        if baseline[key] == baseline[key] and result[key] > tolerance * baseline[key] + slack:
+            found.append(f'{key} {result[key]:.3f} > {tolerance} x {baseline[key]:.3f} + {slack}')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('frameworks', nargs = '*', help = ', '.join(FRAMEWORKS))
+    parser.add_argument('--sizes', nargs = '+', type = int, default = [10, 100, 1000])
+    parser.add_argument('--csv', help = 'a folder of daily <ticker>.csv files to use instead of synthetic data')
+    parser.add_argument('--store', help = 'a BarStore folder of daily bars to use instead of synthetic data')
+    parser.add_argument('--tolerance', type = float, default = 1.5, help = 'how many times the baseline time is a regression')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'write the results to ' + os.path.basename(BASELINE))
+    args = parser.parse_args()
+
+    for framework in args.frameworks:
+        if framework not in FRAMEWORKS:
+            parser.error(f'unknown framework {framework}')
+    feed = BarFeed.FromCsv(args.csv) if args.csv else BarFeed.FromStore(args.store) if args.store else None
+    #the baseline is for the synthetic feed only
+    compare = feed is None and not args.save_baseline
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            baseline = json.load(file)
+
+    print(f"{'framework':>10} {'symbols':>8} {'total s':>8} " + ' '.join(f'{call + " ms":>22}' for call in CALLS) + f" {'insights':>9} {'orders':>7}")
+    failed = []
+    for framework in args.frameworks or list(FRAMEWORKS):
+        for size in args.sizes:
+            timer, total, algorithm = benchmark(framework, size, feed)
+            print(f'{framework:>10} {size:>8} {total:>8.2f} ' + ' '.join(f'{timer.Mean(call):>22.3f}' for call in CALLS)
+                  + f' {len(algorithm.Insights):>9} {algorithm.Transactions.OrdersCount:>7}')
+            result = {'total s': total, 'insights': len(algorithm.Insights), 'orders': algorithm.Transactions.OrdersCount}
+            result.update({call + ' ms': timer.Mean(call) for call in CALLS})
+            key = f'{framework} {size}'
+            if args.save_baseline and feed is None:
+                baseline[key] = result
+            elif compare and key in baseline:
+                failed.extend(f'{key}: {problem}' for problem in regressions(result, baseline[key], args.tolerance))
+            elif compare:
+                print(f'{key}: no baseline')
+
+    if args.save_baseline and feed is None:
+        with open(BASELINE, 'w') as file:
+            json.dump(baseline, file, indent = 2, sort_keys = True)
+    for problem in failed:
+        print('regression', problem)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
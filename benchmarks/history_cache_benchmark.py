@@ -0,0 +1,77 @@
+#Replays the history requests of the bollinger bands algorithm, 360 days of the universe every month and 10 days of every
+#new symbol, with and without the HistoryCache, and counts the bars that had to be fetched. On QuantConnect the bars fetched are
+#the cost of a History call. The frames of the cache have to be the same as the direct ones, request by request.
+#Run from the repo root: python benchmarks/history_cache_benchmark.py
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from Feeds import BarFeed
+from HistoryCache import HistoryCache
+from QuantConnect import Resolution
+from QuantConnect.Algorithm import QCAlgorithm
+
+
+class CountingAlgorithm(QCAlgorithm):
+    def __init__(self, feed):
+        super().__init__()
+        self.feed = feed
+        self.bars = 0
+
+    def History(self, *args, **kwargs):
+        history = super().History(*args, **kwargs)
+        self.bars += len(history)
+        return history
+
+
+def replay(algorithm, history, months, universe):
+    #the same universe drifts a little every month, like a dollar volume ranking does. Returns the frame of every request
+    feed = algorithm.feed
+    frames = []
+    rng = np.random.default_rng(0)
+    symbols, new = [], list(rng.choice(feed.symbols, size=universe, replace=False))
+    for month in range(months):
+        algorithm.Time = feed.end_times[400 + 21 * month].to_pydatetime()
+        symbols = symbols[len(new):] + new
+        frames.append(history(symbols, 360, Resolution.Daily))
+        for symbol in new:
+            frames.append(history([symbol], 10, Resolution.Daily))
+        new = list(rng.choice([symbol for symbol in feed.symbols if symbol not in symbols], size=universe // 10, replace=False))
+    return frames
+
+
+def main(months=12, universe=100):
+    feed = BarFeed.Synthetic(symbols = 3 * universe, bars = 400 + 21 * months)
+    print(f"{'':>10} {'bars fetched':>13} {'History calls':>14} {'s':>6}")
+
+    algorithm = CountingAlgorithm(feed)
+    calls = [0]
+    def direct(*args):
+        calls[0] += 1
+        return algorithm.History(*args)
+    start = time.perf_counter()
+    expected = replay(algorithm, direct, months, universe)
+    print(f"{'direct':>10} {algorithm.bars:>13} {calls[0]:>14} {time.perf_counter() - start:>6.2f}")
+
+    algorithm = CountingAlgorithm(feed)
+    cache = HistoryCache(algorithm)
+    start = time.perf_counter()
+    cached = replay(algorithm, cache.History, months, universe)
+    print(f"{'cached':>10} {algorithm.bars:>13} {cache.requests:>14} {time.perf_counter() - start:>6.2f}")
+    print(cache.Stats())
+
+    assert len(cached) == len(expected)
+    for frame, direct_frame in zip(cached, expected):
+        #the harness builds its time level from datetimes, in us, the cache keeps ns like LEAN. Same times otherwise
+        direct_frame.index = direct_frame.index.set_levels(direct_frame.index.levels[-1].as_unit('ns'), level=-1)
+        pd.testing.assert_frame_equal(frame, direct_frame)
+    print(f'{len(cached)} cached frames equal to the direct ones')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#Times the warm-up of the bollinger bands of a universe change, one history call per added security and the bars pushed
+#into a BollingerBands indicator one row at a time with iterrows like the alpha used to do, against one history frame for
+#all of them and the BollingerEngine warmed up in one go. Also checks the bands come out the same.
+#Run from the repo root: python benchmarks/indicator_warmup_benchmark.py
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from BollingerEngine import BollingerEngine
+from QuantConnect.Indicators import BollingerBands, MovingAverageType
+
+
+def history(symbols, closes, times):
+    #a history frame like QCAlgorithm.History returns, (symbol, time) index
+    index = pd.MultiIndex.from_product([symbols, times], names=['symbol', 'time'])
+    return pd.DataFrame({'close': closes.T.ravel()}, index=index)
+
+
+def main(symbol_counts=(10, 100, 1000), period=10, deviation=2, bars=10):
+    print(f"{'symbols':>8} {'iterrows ms':>12} {'bulk ms':>8} {'max diff':>9}")
+    rng = np.random.default_rng(0)
+    times = pd.date_range('2020-01-01', periods=bars, freq='D')
+    for n in symbol_counts:
+        symbols = [f'SYM{k:05d}' for k in range(n)]
+        closes = 100 * np.exp(np.cumsum(rng.normal(scale=0.02, size=(bars, n)), axis=0))
+        frame = history(symbols, closes, times)
+
+        start = time.perf_counter()
+        indicators = {}
+        for symbol in symbols:
+            #one history call per symbol
+            single = frame.loc[[symbol]]
+            indicator = indicators[symbol] = BollingerBands(period, deviation, MovingAverageType.Exponential)
+            for t, row in single.loc[symbol].iterrows():
+                indicator.Update(t, row['close'])
+        iterrows_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine = BollingerEngine(period, deviation)
+        unstacked = frame.close.unstack(level=0)
+        engine.WarmUp(symbols, unstacked[symbols].values)
+        bulk_time = time.perf_counter() - start
+
+        lower, middle, upper = engine.Bands(np.array([engine.rows[symbol] for symbol in symbols]))
+        expected = np.array([[indicators[symbol].LowerBand.Current.Value, indicators[symbol].MiddleBand.Current.Value,
+                              indicators[symbol].UpperBand.Current.Value] for symbol in symbols])
+        diff = np.abs(np.column_stack([lower, middle, upper]) - expected).max()
+        print(f'{n:>8} {1000 * iterrows_time:>12.3f} {1000 * bulk_time:>8.3f} {diff:>9.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#Times finding the pairs of the active insights in EqualWeightedPairsTradingPortfolio, the InsightBook lookup by GroupId
+#against comparing every insight with every other insight, as the number of active pairs grows.
+#Run from the repo root: python benchmarks/insight_book_benchmark.py
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Pairs Trading v2'))
+from InsightBook import InsightBook
+
+
+class PairInsight:
+    #just what the portfolio model looks at
+    def __init__(self, symbol, direction, groupId, generated, period):
+        self.Symbol = symbol
+        self.Direction = direction
+        self.GroupId = groupId
+        self.GeneratedTimeUtc = generated
+        self.CloseTimeUtc = generated + period
+
+    def IsActive(self, utcTime):
+        return self.CloseTimeUtc > utcTime
+
+    def IsExpired(self, utcTime):
+        return self.CloseTimeUtc <= utcTime
+
+
+def pairs_by_comparing(insights):
+    #the pairing of the portfolio model before the InsightBook
+    last = sorted(insights, key = lambda x: x.GeneratedTimeUtc, reverse = True)
+    pairs = {}
+    for i in range(len(last)):
+        for ii in range(i + 1, len(last)):
+            key = (last[i].Symbol, last[ii].Symbol)
+            if key in pairs or (last[ii].Symbol, last[i].Symbol) in pairs:
+                continue
+            if last[i].GroupId == last[ii].GroupId:
+                pairs[key] = [last[i].Direction, last[ii].Direction]
+    return pairs
+
+
+def main(pair_counts=(10, 50, 200, 1000), repeats=5):
+    start_time = datetime(2020, 1, 1)
+    now = start_time + timedelta(hours=1)
+    print(f"{'pairs':>6} {'compare ms':>11} {'book ms':>8}")
+    for count in pair_counts:
+        book = InsightBook()
+        insights = []
+        for k in range(count):
+            groupId = uuid.uuid4()
+            generated = start_time + timedelta(minutes=k % 60)
+            for symbol, direction in ((f'A{k}', 1), (f'B{k}', -1)):
+                insight = PairInsight(symbol, direction, groupId, generated, timedelta(days=10))
+                insights.append(insight)
+                book.Add(insight)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            compared = pairs_by_comparing(insights)
+        compare = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            looked_up = book.Pairs(now)
+        lookup = (time.perf_counter() - start) / repeats
+
+        assert compared == looked_up
+        print(f'{count:>6} {1000 * compare:>11.2f} {1000 * lookup:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
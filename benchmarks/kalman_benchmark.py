@@ -0,0 +1,74 @@
+#Times the Kalman filters of the Kalman pairs alpha, one pykalman filter per series against one batched numpy filter
+#for all the pairs, and checks that they agree. Run from the repo root: python benchmarks/kalman_benchmark.py
+import os
+import sys
+import time
+
+import numpy as np
+from pykalman import KalmanFilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from KalmanFilters import mean_filter, regression_filter
+
+
+def pykalman_avg(x):
+    #the filters exactly like PairsTradingAlpha used to build them
+    filter = KalmanFilter(transition_matrices = [1],
+    observation_matrices = [1],
+    initial_state_mean = 0,
+    initial_state_covariance = 1,
+    observation_covariance = 1,
+    transition_covariance = .01)
+    state_means, _ = filter.filter(x)
+    return state_means.flatten()
+
+
+def pykalman_regression(x, y):
+    x = pykalman_avg(x)
+    y = pykalman_avg(y)
+    filter = KalmanFilter(n_dim_obs = 1,
+    n_dim_state = 2,
+    initial_state_mean = [0,0],
+    initial_state_covariance = np.ones((2, 2)),
+    transition_matrices = np.eye(2),
+    observation_matrices = np.expand_dims(np.vstack([[x], [np.ones(len(x))]]).T, axis=1),
+    observation_covariance = 2,
+    transition_covariance = 1e-3 / (1 - 1e-3) * np.eye(2))
+    state_means, _ = filter.filter(y)
+    return state_means
+
+
+def pykalman_path(x, y):
+    #setKalman smooths the prices, and regression smooths them again
+    return np.array([pykalman_regression(pykalman_avg(x[k]), pykalman_avg(y[k])) for k in range(len(x))])
+
+
+def numpy_path(x, y):
+    smooth_x, _ = mean_filter(mean_filter(x)[0])
+    smooth_y, _ = mean_filter(mean_filter(y)[0])
+    state_means, _ = regression_filter(smooth_x, smooth_y)
+    return state_means
+
+
+def main(pair_counts=(1, 10, 100), length=25):
+    #25 daily bars is the 5 week lookback of the alpha
+    rng = np.random.default_rng(0)
+    print(f"{'pairs':>6} {'pykalman s':>11} {'numpy s':>9} {'speedup':>8} {'max diff':>9}")
+    for count in pair_counts:
+        prices = 100 + np.cumsum(rng.normal(size=(2, count, length)), axis=2)
+        x, y = prices
+
+        start = time.perf_counter()
+        expected = pykalman_path(x, y)
+        pykalman_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        state_means = numpy_path(x, y)
+        numpy_time = time.perf_counter() - start
+
+        diff = np.abs(state_means - expected).max()
+        print(f'{count:>6} {pykalman_time:>11.4f} {numpy_time:>9.4f} {pykalman_time / numpy_time:>8.0f} {diff:>9.1e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#The time between the fills of the two legs of a pair, with MarketOrderModel and with PairExecutionModel, on the harness
+#with a simulated broker: every order fills after a random latency, and like LEAN a synchronous order waits for the fill
+#of the synchronous orders before it. Random pairs go through EqualWeightedPairsTradingPortfolio to the execution model.
+#Run from the repo root: python benchmarks/leg_latency_benchmark.py [mean latency in seconds]
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Pairs Trading v2'))
+from AlgorithmImports import Insight, InsightDirection, QCAlgorithm, Resolution
+from EqualPCM import EqualWeightedPairsTradingPortfolio
+from ExecutionModel import MarketOrderModel, PairExecutionModel
+
+
+def backtest(model, latency, symbols=50, steps=2000, seed=0):
+    rng = random.Random(seed)
+    broker = random.Random(seed + 1)
+    algorithm = QCAlgorithm()
+    algorithm.Time = datetime(2020, 1, 1)
+    algorithm.Transactions.fill_latency = lambda order: timedelta(seconds=broker.expovariate(1 / latency))
+    universe = [algorithm.AddEquity(f'S{k}').Symbol for k in range(symbols)]
+    for k, symbol in enumerate(universe):
+        algorithm.Securities[symbol].Price = 10.0 + k
+        algorithm.Securities[symbol].HasData = True
+
+    portfolio = EqualWeightedPairsTradingPortfolio(rebalance = Resolution.Daily)
+    execution = model()
+    algorithm.OnOrderEvent = lambda orderEvent: execution.OnOrderEvent(algorithm, orderEvent) if hasattr(execution, 'OnOrderEvent') else None
+
+    #the pair of every order, from the tag of its target, and the Execute call it was sent in
+    sent = {}
+    market_order = algorithm.MarketOrder
+
+    def tagged(symbol, quantity, asynchronous=False, tag=''):
+        ticket = market_order(symbol, quantity, asynchronous, tag)
+        target = execution.targetsCollection[symbol.Symbol]
+        sent[ticket.OrderId] = (step, target.Tag)
+        return ticket
+
+    algorithm.MarketOrder = tagged
+    for step in range(steps):
+        algorithm.Time += timedelta(minutes=1)
+        algorithm.Transactions.ProcessFills(algorithm.Time)
+        insights = []
+        if rng.random() < 0.2:
+            symbol1, symbol2 = rng.sample(universe, 2)
+            direction = rng.choice([1, -1])
+            period = timedelta(minutes=rng.randint(5, 120))
+            insights = [Insight.Price(symbol1, period, InsightDirection(direction)), Insight.Price(symbol2, period, InsightDirection(-direction))]
+            for insight in insights:
+                insight.SetGenerated(algorithm.Time)
+            Insight.Group(insights)
+        execution.Execute(algorithm, portfolio.CreateTargets(algorithm, insights))
+    algorithm.Transactions.ProcessFills(algorithm.Time + timedelta(days=1))
+
+    fills = {}
+    for order in algorithm.Transactions.GetOrders():
+        step, tag = sent[order.Id]
+        if tag and order.FillTime is not None:
+            fills.setdefault((step, tag), []).append(order.FillTime)
+    return sorted((max(times) - min(times)).total_seconds() for times in fills.values() if len(times) > 1)
+
+
+def main(latency=0.5):
+    print(f'mean fill latency {latency} s')
+    print(f"{'model':<20} {'batches':>8} {'mean gap s':>11} {'median s':>9} {'max s':>8}")
+    for model in (MarketOrderModel, PairExecutionModel):
+        gaps = backtest(model, latency)
+        print(f'{model.__name__:<20} {len(gaps):>8} {sum(gaps) / len(gaps):>11.3f} {gaps[len(gaps) // 2]:>9.3f} {gaps[-1]:>8.3f}')
+
+
+if __name__ == '__main__':
+    main(*[float(x) for x in sys.argv[1:]])
@@ -0,0 +1,59 @@
+#Runs a strategy on the harness with the ModelProfiler switched off, switched on, and on with cProfile of the 3 slowest calls,
+#prints the time each run took, and the report of the last one. The report is also saved as json to the object store
+#of the harness, the storage folder.
+#Run from the repo root: python benchmarks/model_profiler_benchmark.py [bollinger | kalman | momentum | v2] [--symbols 100]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from Feeds import BarFeed
+from Runner import load_algorithm, run
+from framework_benchmark import FRAMEWORKS
+
+
+def profiled(profiler, enabled, profile_slowest, key):
+    #the strategies make their profiler switched off, this switches it on from the outside for one run
+    init = profiler.__init__
+
+    def forced(self, algorithm, *args, **kwargs):
+        init(self, algorithm, enabled = enabled, profile_slowest = profile_slowest, key = key)
+    return init, forced
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('framework', nargs = '?', default = 'bollinger')
+    parser.add_argument('--symbols', type = int, default = 100)
+    parser.add_argument('--key', default = 'model_profile.json', help = 'the object store key of the report')
+    args = parser.parse_args()
+    if args.framework not in FRAMEWORKS:
+        parser.error(f'unknown framework {args.framework}')
+
+    path, name, resolution, warmup, bars, settings = FRAMEWORKS[args.framework]
+    feed = BarFeed.Synthetic(symbols = args.symbols, bars = warmup + bars, resolution = resolution)
+    algorithm_class = load_algorithm(path, name)
+    #the ModelProfiler of the project of the strategy, each project has its own copy
+    profiler = sys.modules[algorithm_class.__module__].ModelProfiler
+    for label, enabled, slowest in (('off', False, 0), ('on', True, 0), ('on + cProfile', True, 3)):
+        init, forced = profiled(profiler, enabled, slowest, args.key)
+        profiler.__init__ = forced
+        try:
+            start = time.perf_counter()
+            algorithm = run(algorithm_class, feed, start = feed.times[-bars].to_pydatetime(), end = feed.end_times[-1].to_pydatetime(),
+                            **settings(args.symbols))
+            print(f'{label:>14}: {time.perf_counter() - start:.2f} s')
+        finally:
+            profiler.__init__ = init
+
+    #the report is the last thing the algorithm logs, from its header on
+    messages = [message for when, message in algorithm.logs]
+    header = max(k for k, message in enumerate(messages) if message.startswith('call '))
+    print('\n'.join(messages[header:]))
+    print(f'saved to {algorithm.ObjectStore.GetFilePath(args.key)}')
+
+
+if __name__ == '__main__':
+    main()
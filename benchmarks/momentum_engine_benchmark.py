@@ -0,0 +1,65 @@
+#Times the monthly momentum ranking, one RateOfChange indicator per symbol and a sort of all the insights like the
+#MomentumAlphaModel used to do, against the MomentumEngine, and checks they pick the same symbols.
+#Run from the repo root: python benchmarks/momentum_engine_benchmark.py
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Momentum_framework'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from MomentumEngine import MomentumEngine
+from QuantConnect.Indicators import RateOfChange
+
+
+def indicator_top(indicators, previous, count):
+    #CanEmit, Return and the sort of the old alpha, without the insights
+    ranked = []
+    for symbol, roc in indicators.items():
+        if previous[symbol] != roc.Samples:
+            previous[symbol] = roc.Samples
+            if roc.IsReady:
+                ranked.append((symbol, float(roc.Current.Value)))
+    return sorted(ranked, key = lambda x: x[1], reverse = True)[:count]
+
+
+def main(symbol_counts=(100, 1000, 5000), lookback=203, days=21, count=10):
+    print(f"{'symbols':>8} {'indicators ms':>14} {'engine ms':>10} {'push us/bar':>12} {'same':>5}")
+    rng = np.random.default_rng(0)
+    for n in symbol_counts:
+        symbols = [f'SYM{k:05d}' for k in range(n)]
+        closes = 100 * np.exp(np.cumsum(rng.normal(scale=0.02, size=(lookback + days, n)), axis=0))
+
+        indicators = {symbol: RateOfChange(symbol, lookback) for symbol in symbols}
+        previous = {symbol: 0 for symbol in symbols}
+        engine = MomentumEngine(lookback)
+        engine.WarmUp(symbols, closes[:lookback])
+        for k, symbol in enumerate(symbols):
+            for i in range(lookback):
+                indicators[symbol].Update(i, closes[i, k])
+
+        #a month of daily bars, then the ranking
+        start = time.perf_counter()
+        for i in range(lookback, lookback + days):
+            for k, symbol in enumerate(symbols):
+                engine.Push(symbol, closes[i, k])
+        push_time = (time.perf_counter() - start) / (days * n)
+        for i in range(lookback, lookback + days):
+            for k, symbol in enumerate(symbols):
+                indicators[symbol].Update(i, closes[i, k])
+
+        start = time.perf_counter()
+        expected = indicator_top(indicators, previous, count)
+        indicator_time = time.perf_counter() - start
+        start = time.perf_counter()
+        picked = engine.Top(count)
+        engine_time = time.perf_counter() - start
+
+        same = [s for s, r in picked] == [s for s, r in expected] and np.allclose([r for s, r in picked], [r for s, r in expected])
+        print(f'{n:>8} {1000 * indicator_time:>14.3f} {1000 * engine_time:>10.3f} {1e6 * push_time:>12.2f} {str(same):>5}')
+
+
+if __name__ == '__main__':
+    main()
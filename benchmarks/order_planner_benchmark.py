@@ -0,0 +1,120 @@
+#Times the order sizing of MarketOrderModel on the harness, OrderByMarginImpact, GetUnorderedQuantity for every order and
+#ClearFulfilled against one OrderPlanner snapshot, as the number of targets grows. Half the symbols have an open order.
+#Before timing it checks both against a fixture whose order was worked out by hand from LEAN's
+#PortfolioTargetExtensions.OrderTargetsByMarginImpact, which PortfolioTargetCollection.OrderByMarginImpact calls:
+#  Where(HasData && IsTradable && |AdjustByLotSize(target) - existing| >= LotSize), existing = holdings + open orders
+#  OrderByDescending(IsReducingPosition = existing != 0 && |target| < |existing|)
+#  ThenByDescending(|(target - existing) * Price|)
+#LINQ's OrderBy is stable, so orders of the same value keep the order of the targets.
+#Run from the repo root: python benchmarks/order_planner_benchmark.py
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Pairs Trading v2'))
+from AlgorithmImports import OrderSizing, PortfolioTarget, PortfolioTargetCollection, QCAlgorithm
+from OrderPlanner import OrderPlanner
+
+
+def sized_one_by_one(algorithm, collection):
+    #the sizing MarketOrderModel did before the planner, without sending the orders
+    orders = []
+    for target in collection.OrderByMarginImpact(algorithm):
+        security = algorithm.Securities[target.Symbol]
+        quantity = OrderSizing.GetUnorderedQuantity(algorithm, target, security)
+        if quantity != 0:
+            orders.append((target, security, quantity))
+    fulfilled = [target.Symbol for target in collection if OrderSizing.GetUnorderedQuantity(algorithm, target) == 0]
+    return orders, fulfilled
+
+
+#symbol: price, lot size, holdings, open order quantity, target, has data, is tradable
+FIXTURE = {
+    'FLIPUP': (10, 1, 100, 0, -200, True, True),      #flips to a bigger short: |-200| < 100 is false, so not reducing
+    'FLIPDOWN': (10, 1, 100, 0, -50, True, True),     #flips to a smaller short: reducing, value 150 * 10
+    'SMALLER': (10, 1, 100, 0, 40, True, True),       #reducing, value 60 * 10
+    'NEW': (20, 1, 0, 0, 100, True, True),            #value 2000
+    'TIE': (20, 1, 0, 0, 150, True, True),            #value 3000 like FLIPUP, after it because it was added later
+    'ORDERED': (5, 1, 0, 50, 50, True, True),         #the open order already gets it there
+    'PARTLY': (5, 1, 0, 30, 100, True, True),         #70 left, value 350
+    'LOTS': (50, 100, 0, 0, 150, True, True),         #rounded to 100, value 5000
+    'UNDERLOT': (50, 100, 0, 0, 99, True, True),      #rounded to 0
+    'NODATA': (10, 1, 0, 0, 500, False, True),
+    'HALTED': (10, 1, 0, 0, 500, True, False),
+    'CLOSE': (10, 1, -100, 0, 0, True, True),         #reducing, value 1000
+    'CLOSING': (10, 1, 100, -100, 50, True, True),    #the open order takes it flat, existing 0 is never reducing, value 500
+}
+#the reducing orders by value, then the others by value, with the quantity left to order
+LEAN_ORDER = [('FLIPDOWN', -150), ('CLOSE', 100), ('SMALLER', -60),
+              ('LOTS', 100), ('FLIPUP', -300), ('TIE', 150), ('NEW', 100), ('CLOSING', 50), ('PARTLY', 70)]
+LEAN_FULFILLED = ['ORDERED', 'UNDERLOT']
+
+
+def check_lean_order():
+    algorithm = QCAlgorithm()
+    algorithm.Time = datetime(2020, 1, 1)
+    algorithm.Transactions.fill_latency = timedelta(days=1)
+    collection = PortfolioTargetCollection()
+    for symbol, (price, lot, holdings, opened, target, has_data, tradable) in FIXTURE.items():
+        security = algorithm.AddEquity(symbol)
+        security.Price = float(price)
+        security.LotSize = lot
+        security.Holdings.Quantity = float(holdings)
+        security.HasData = True
+        if opened:
+            algorithm.MarketOrder(symbol, opened)
+        security.HasData = has_data
+        security.IsTradable = tradable
+        collection.Add(PortfolioTarget(symbol, float(target)))
+
+    orders, fulfilled = OrderPlanner().Plan(algorithm, collection)
+    assert [(str(target.Symbol), quantity) for target, security, quantity in orders] == LEAN_ORDER
+    assert [str(symbol) for symbol in fulfilled] == LEAN_FULFILLED
+    orders, fulfilled = sized_one_by_one(algorithm, collection)
+    assert [(str(target.Symbol), quantity) for target, security, quantity in orders] == LEAN_ORDER
+    assert [str(symbol) for symbol in fulfilled] == LEAN_FULFILLED
+    print('planner and harness give the LEAN order on the fixture')
+
+
+def main(target_counts=(10, 100, 1000), repeats=5):
+    check_lean_order()
+    rng = np.random.default_rng(0)
+    print(f"{'targets':>8} {'one by one ms':>14} {'planner ms':>11}")
+    for count in target_counts:
+        algorithm = QCAlgorithm()
+        algorithm.Time = datetime(2020, 1, 1)
+        #the orders stay open, so every sizing has to look at them
+        algorithm.Transactions.fill_latency = timedelta(days=1)
+        collection = PortfolioTargetCollection()
+        for k in range(count):
+            security = algorithm.AddEquity(f'S{k}')
+            security.Price = float(rng.uniform(10, 300))
+            security.HasData = True
+            security.Holdings.Quantity = float(rng.integers(-100, 100))
+            if k % 2:
+                algorithm.MarketOrder(security.Symbol, int(rng.integers(-50, 50)))
+            collection.Add(PortfolioTarget(security.Symbol, float(rng.integers(-200, 200))))
+
+        planner = OrderPlanner()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            expected = sized_one_by_one(algorithm, collection)
+        one_by_one = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            planned = planner.Plan(algorithm, collection)
+        plan = (time.perf_counter() - start) / repeats
+
+        assert [(target.Symbol, quantity) for target, security, quantity in expected[0]] == [(target.Symbol, quantity) for target, security, quantity in planned[0]]
+        assert expected[1] == planned[1]
+        print(f'{count:>8} {1000 * one_by_one:>14.2f} {1000 * plan:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#Times one bar of the PairBook (step, zscores and state changes) as the number of pairs grows.
+#Run from the repo root: python benchmarks/pair_book_benchmark.py
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Pairs Trading v2'))
+from PairBook import PairBook
+from SymbolBarStore import SymbolBarStore
+
+
+def main(pair_counts=(10, 100, 1000), lookback=500, bars=500):
+    rng = np.random.default_rng(0)
+    print(f"{'pairs':>6} {'symbols':>8} {'us/bar':>8}")
+    for count in pair_counts:
+        #the smallest universe that has this many pairs
+        symbols = int(np.ceil((1 + np.sqrt(1 + 8 * count)) / 2))
+        store = SymbolBarStore(lookback)
+        book = PairBook(store)
+        for symbol1, symbol2 in itertools.islice(itertools.combinations(range(symbols), 2), count):
+            store.Subscribe(symbol1)
+            store.Subscribe(symbol2)
+            book.AddPair(symbol1, symbol2)
+
+        closes = 100 + np.cumsum(rng.normal(size=(lookback + bars, symbols)), axis=0)
+
+        #warm the book up, then time the bars after that
+        for bar in closes[:lookback]:
+            for symbol, close in enumerate(bar):
+                store.Push(symbol, close)
+            store.Step()
+            book.Step()
+
+        start = time.perf_counter()
+        for bar in closes[lookback:]:
+            for symbol, close in enumerate(bar):
+                store.Push(symbol, close)
+            store.Step()
+            book.Step()
+            zscores = book.ZScores()
+            book.states, changed = book.Transitions(zscores, 2, -2, 0)
+        elapsed = time.perf_counter() - start
+        print(f'{count:>6} {symbols:>8} {elapsed / bars * 1e6:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
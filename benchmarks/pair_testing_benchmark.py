@@ -0,0 +1,48 @@
+#Times the PairTestExecutor on a full universe re-screen with a growing number of worker processes.
+#Run from the repo root: python benchmarks/pair_testing_benchmark.py [symbols] [workers ...]
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from Cointegration import pair_indices
+from PairTestExecutor import PairTestExecutor
+from cointegration_benchmark import synthetic_prices
+
+
+def main(symbols=500, worker_counts=(1, 2, 4, 8, 16, 32)):
+    prices = synthetic_prices(symbols).values
+    left, right = pair_indices(symbols)
+    print(f'{symbols} symbols, {len(left)} pairs, {os.cpu_count()} cpus')
+
+    reference = None
+    for workers in worker_counts:
+        executor = PairTestExecutor(workers=workers)
+        #a screen of fewer than task_size pairs runs in this process and would not start the pool, so we start it and
+        #all its workers before the timed screen, and show what that costs on its own
+        start = time.perf_counter()
+        executor.start()
+        started = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pvalues = executor.pvalues(prices, left, right)
+        elapsed = time.perf_counter() - start
+        executor.close()
+
+        #every worker count has to give the exact same answer as the serial run
+        if reference is None:
+            reference = pvalues
+        assert np.array_equal(reference, pvalues)
+        print(f'{workers:>4} workers {elapsed:>8.2f} s   pool start {started:>5.2f} s')
+
+
+if __name__ == '__main__':
+    args = [int(x) for x in sys.argv[1:]]
+    if len(args) > 1:
+        main(args[0], args[1:])
+    elif args:
+        main(args[0])
+    else:
+        main()
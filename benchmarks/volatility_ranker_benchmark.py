@@ -0,0 +1,55 @@
+#Times the monthly fine selection of the bollinger bands algorithm, the 360 day history, std and sorts it used to do,
+#against VolatilityRanker.Top on windows kept up to date with the daily prices, and checks they pick the same stocks.
+#Run from the repo root: python benchmarks/volatility_ranker_benchmark.py
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'harness'))
+from Feeds import BarFeed
+from QuantConnect import Resolution
+from VolatilityRanker import VolatilityRanker
+
+
+def sort_volatility(feed, symbols, length, k, now):
+    #SortVolatility, get_keys and the filter of FineUniverse like they were
+    history = feed.History(symbols, length, Resolution.Daily, now)
+    prices = history.drop_duplicates().close.unstack(level =0)
+    vol = prices.std(ddof=0)
+    vol_to_dict = vol.to_dict()
+    rangeret = sorted(vol_to_dict, key = vol_to_dict.get, reverse = True)
+    stocks_by_vol = {symbol: rank for rank, symbol in enumerate(rangeret, 1)}
+    historie = sorted({key: stocks_by_vol.get(key, 0) for key in set(stocks_by_vol)}.items(), key = lambda x: x[1])
+    keys = [key for key, rank in historie]
+    return [x for x in symbols if str(x) in keys[:k]]
+
+
+def main(symbol_counts=(100, 1000), window=360, k=10, repeats=5):
+    print(f"{'symbols':>8} {'history ms':>11} {'ranker ms':>10} {'update us/day':>14} {'same':>5}")
+    for count in symbol_counts:
+        feed = BarFeed.Synthetic(symbols = count, bars = window + 1, benchmark = None)
+        ranker = VolatilityRanker(window)
+        closes = feed.values['close']
+        start = time.perf_counter()
+        for i in range(len(feed)):
+            ranker.Update(feed.symbols, closes[i])
+        update_time = (time.perf_counter() - start) / len(feed)
+
+        now = feed.end_times[-1]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            expected = sort_volatility(feed, feed.symbols, window, k, now)
+        history_time = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            picked = ranker.Top(feed.symbols, k)
+        ranker_time = (time.perf_counter() - start) / repeats
+        print(f'{count:>8} {1000 * history_time:>11.2f} {1000 * ranker_time:>10.3f} {1e6 * update_time:>14.1f} {str(picked == expected):>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+#What "from AlgorithmImports import *" gives the strategies, when they run on the local harness instead of on QuantConnect
+from datetime import date, datetime, time, timedelta
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+
+from QuantConnect import *
+from QuantConnect.Algorithm import QCAlgorithm
+from QuantConnect.Algorithm.Framework import *
+from QuantConnect.Data import *
+from QuantConnect.Indicators import *
+from QuantConnect.Orders import *
+from QuantConnect.Securities import *
+from System.Drawing import Color
+
+
+class SeriesType(Enum):
+    Line = 0
+    Scatter = 1
+    Bar = 2
+
+
+class Series:
+    def __init__(self, name, type=SeriesType.Line, unit='$', color=None):
+        self.Name = name
+
+
+class Chart:
+    def __init__(self, name):
+        self.Name = name
+
+    def AddSeries(self, series):
+        pass
@@ -0,0 +1,32 @@
+#Every QuantConnect project here is a folder that can only import its own files, so the shared modules of the repo root
+#(HistoryCache.py, CoarseSelection.py, ...) are copied into the projects that use them. This checks that every copy in a
+#project folder is the same as the root module, line endings aside, and exits with 1 if one is not.
+#Run from the repo root: python harness/CheckCopies.py
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECTS = ('Momentum_framework', 'Pairs Trading v2')
+
+
+def read(path):
+    with open(path, newline='') as file:
+        return file.read().replace('\r\n', '\n')
+
+
+def main():
+    different = []
+    for project in PROJECTS:
+        for name in sorted(os.listdir(os.path.join(ROOT, project))):
+            shared = os.path.join(ROOT, name)
+            if name.endswith('.py') and os.path.exists(shared):
+                copy = os.path.join(ROOT, project, name)
+                same = read(copy) == read(shared)
+                print(f"{'same' if same else 'DIFFERENT':>9} {project}/{name}")
+                if not same:
+                    different.append(copy)
+    return 1 if different else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+from QuantConnect import Universe
+from QuantConnect.Data import CoarseFundamental, FineFundamental, Slice
+from QuantConnect.Securities import SecurityChanges
+
+
+class Backtest:
+    #Steps a QCAlgorithm through the bars of a BarFeed. Every time step:
+    #universe selection on the first bar of a day, scheduled events, prices, fills and consolidators,
+    #then (after the warm up) OnData and the framework: alphas -> portfolio construction -> risk management -> execution.
+    #timer is called as timer(name, function, *args) around every framework call, so a benchmark can time them
+    def __init__(self, algorithm, feed, start=None, end=None, timer=None):
+        self.algorithm = algorithm
+        self.feed = feed
+        self.timer = timer if timer is not None else lambda name, function, *args: function(*args)
+        algorithm.feed = feed
+        #the dates the strategy sets can be overridden, so it runs on whatever the feed has
+        algorithm.start_override = start
+        algorithm.end_override = end
+        algorithm.Time = start or feed.times[0].to_pydatetime()
+        algorithm.Initialize()
+
+        self.start = algorithm.StartDate or start or feed.times[0]
+        self.end = algorithm.EndDate or end or feed.end_times[-1]
+        warmup = algorithm.WarmUpPeriod
+        if isinstance(warmup, timedelta):
+            self.first = feed.times.searchsorted(self.start - warmup)
+        else:
+            self.first = max(feed.times.searchsorted(self.start) - (warmup or 0), 0)
+        self.last = feed.end_times.searchsorted(self.end, side='right')
+
+        self.universe = []
+        self.subscribed = []
+
+    def Run(self):
+        algorithm = self.algorithm
+        previous_day = None
+        for i in range(self.first, self.last):
+            time = self.feed.end_times[i].to_pydatetime()
+            algorithm.Time = time
+            algorithm.IsWarmingUp = self.feed.times[i] < self.start
+
+            day = self.feed.times[i].date()
+            if day != previous_day:
+                if previous_day is not None:
+                    algorithm.OnEndOfDay()
+                previous_day = day
+                self.SelectUniverse()
+            algorithm.Schedule.Fire(time)
+
+            bars = self.feed.Bars(i, self.subscribed)
+            for symbol, bar in bars.items():
+                algorithm.Securities[symbol].SetMarketPrice(bar)
+            algorithm.Transactions.ProcessFills(time)
+            self.Consolidate(bars, time)
+
+            if algorithm.IsWarmingUp:
+                continue
+            data = Slice(time, bars)
+            algorithm.OnData(data)
+            self.Framework(data)
+
+        if previous_day is not None:
+            algorithm.OnEndOfDay()
+        algorithm.OnEndOfAlgorithm()
+        return algorithm
+
+    def SelectUniverse(self):
+        algorithm = self.algorithm
+        selected = list(self.universe)
+        #coarse data is the last close and volume of every symbol. The benchmark has no fundamental data, like an ETF
+        closes, volumes = self.feed.LastValues(algorithm.Time - timedelta(microseconds=1))
+        coarse = []
+        for symbol, close, volume in zip(self.feed.symbols, closes, volumes):
+            if close == close:
+                data = CoarseFundamental(symbol, float(close), float(volume))
+                data.HasFundamentalData = symbol != algorithm.Benchmark
+                coarse.append(data)
+
+        for coarse_selection, fine_selection in algorithm.universes:
+            symbols = self.timer('CoarseSelection', coarse_selection, coarse)
+            if symbols is Universe.Unchanged:
+                continue
+            if fine_selection is not None:
+                symbols = self.timer('FineSelection', fine_selection, [FineFundamental(symbol) for symbol in symbols])
+                if symbols is Universe.Unchanged:
+                    continue
+            selected = list(dict.fromkeys(symbols))
+
+        #the manual symbols are reported as added the first time
+        wanted = list(dict.fromkeys(algorithm.manual_symbols + selected))
+        added = [algorithm.AddSecurity(symbol) for symbol in wanted if symbol not in self.subscribed]
+        removed = [algorithm.Securities[symbol] for symbol in self.subscribed if symbol not in wanted]
+        self.universe = selected
+        self.subscribed = wanted
+        if added or removed:
+            self.SecuritiesChanged(SecurityChanges(added, removed))
+
+    def SecuritiesChanged(self, changes):
+        algorithm = self.algorithm
+        for alpha in algorithm.Alphas:
+            self.timer(f'{alpha.Name}.OnSecuritiesChanged', alpha.OnSecuritiesChanged, algorithm, changes)
+        for model in [algorithm.PortfolioConstruction, algorithm.Execution] + algorithm.RiskManagement:
+            if model is not None:
+                self.timer(f'{type(model).__name__}.OnSecuritiesChanged', model.OnSecuritiesChanged, algorithm, changes)
+        algorithm.OnSecuritiesChanged(changes)
+
+    def Consolidate(self, bars, time):
+        consolidators = self.algorithm.SubscriptionManager.consolidators
+        for symbol, bar in bars.items():
+            for consolidator in list(consolidators.get(symbol, [])):
+                consolidator.Update(bar)
+        #periods that ended without a new bar, like a daily bar from hour bars at the end of the day
+        for symbol in list(consolidators):
+            if symbol not in bars:
+                for consolidator in list(consolidators.get(symbol, [])):
+                    consolidator.Scan(time)
+
+    def Framework(self, data):
+        algorithm = self.algorithm
+        insights = []
+        for alpha in algorithm.Alphas:
+            new = self.timer(f'{alpha.Name}.Update', alpha.Update, algorithm, data) or []
+            for insight in new:
+                insight.SetGenerated(algorithm.UtcTime, alpha.Name)
+            insights.extend(new)
+        algorithm.Insights.extend(insights)
+
+        model = algorithm.PortfolioConstruction
+        targets = []
+        if model is not None:
+            targets = [target for target in self.timer(f'{type(model).__name__}.CreateTargets', model.CreateTargets, algorithm, insights) or [] if target is not None]
+
+        #risk targets replace the portfolio targets of the same symbol
+        for risk in algorithm.RiskManagement:
+            risk_targets = self.timer(f'{type(risk).__name__}.ManageRisk', risk.ManageRisk, algorithm, targets) or []
+            if risk_targets:
+                replaced = {target.Symbol for target in risk_targets}
+                targets = [target for target in targets if target.Symbol not in replaced] + list(risk_targets)
+
+        if algorithm.Execution is not None:
+            self.timer(f'{type(algorithm.Execution).__name__}.Execute', algorithm.Execution.Execute, algorithm, targets)
@@ -0,0 +1,197 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from BarStore import FIELDS, BarStore
+from QuantConnect import Extensions, Resolution, SymbolCache
+from QuantConnect.Data import TradeBar
+
+
+class BarFeed:
+    #OHLCV bars of many symbols on one shared time index, one wide (time x symbol) frame per field.
+    #The index is the start time of the bars, a missing bar is a nan. This is what the engine steps through,
+    #and what History is served from
+    def __init__(self, frames, resolution=Resolution.Daily):
+        self.frames = {field: frames[field] for field in FIELDS}
+        self.resolution = Resolution(resolution)
+        self.period = Extensions.ToTimeSpan(resolution)
+        self.times = self.frames['close'].index
+        self.end_times = self.times + self.period
+        self.symbols = [SymbolCache.GetSymbol(str(ticker)) for ticker in self.frames['close'].columns]
+        self.columns = {symbol: k for k, symbol in enumerate(self.symbols)}
+        self.values = {field: frame.to_numpy(dtype=float) for field, frame in self.frames.items()}
+        #the last close and volume of every symbol at every step, for the coarse universe data
+        self.filled = {field: self.frames[field].ffill().to_numpy(dtype=float) for field in ('close', 'volume')}
+        #the feed resampled to coarser resolutions, made when History first asks for one
+        self.resampled = {self.resolution: self}
+
+    def __len__(self):
+        return len(self.times)
+
+    @staticmethod
+    def Synthetic(symbols=100, bars=500, start=datetime(2015, 1, 2), resolution=Resolution.Daily, factors=5, seed=0, benchmark='SPY',
+                  pairs=None, drift=0.001):
+        #Random prices with some structure: a few common random walk factors, and on top of that every symbol has a
+        #stationary AR(1) part, so symbols with similar factor loadings are cointegrated. Hourly feeds have 7 bars a day.
+        #The first 2 * pairs symbols (a quarter of them by default) are made in pairs: the second one of a pair is the
+        #first one times a ratio, with a stationary spread that reverts in a few bars, so the pair is cointegrated and its
+        #spread crosses the bands of the pairs strategies. The benchmark rises by drift a bar on top of a small random walk,
+        #so the strategies that only trade in a rising market trade
+        rng = np.random.default_rng(seed)
+        times = BarFeed.TradingTimes(start, bars, resolution)
+        tickers = ([benchmark] if benchmark else []) + [f'SYM{k:04d}' for k in range(symbols)]
+        n = len(tickers)
+
+        trends = np.cumsum(rng.normal(scale=0.01, size=(bars, factors)), axis=0)
+        loadings = rng.normal(scale=0.5, size=(factors, n)) + 1 / np.sqrt(factors)
+        noise = np.empty((bars, n))
+        noise[0] = rng.normal(scale=0.02, size=n)
+        for t in range(1, bars):
+            noise[t] = 0.9 * noise[t - 1] + rng.normal(scale=0.01, size=n)
+        log_close = np.log(rng.uniform(20, 300, size=n)) + trends @ loadings + noise
+
+        first = 1 if benchmark else 0
+        pairs = symbols // 4 if pairs is None else min(pairs, symbols // 2)
+        if pairs:
+            legs = first + 2 * np.arange(pairs)
+            spreads = np.empty((bars, pairs))
+            spreads[0] = rng.normal(scale=0.02, size=pairs)
+            for t in range(1, bars):
+                spreads[t] = 0.7 * spreads[t - 1] + rng.normal(scale=0.01, size=pairs)
+            log_close[:, legs + 1] = log_close[:, legs] + rng.uniform(-0.5, 0.5, size=pairs) + spreads
+        if benchmark:
+            log_close[:, 0] = np.log(200) + drift * np.arange(bars) + np.cumsum(rng.normal(scale=0.003, size=bars))
+        close = np.exp(log_close)
+
+        spread = np.abs(rng.normal(scale=0.005, size=(bars, n)))
+        open = close * np.exp(rng.normal(scale=0.003, size=(bars, n)))
+        frames = {'open': open, 'close': close,
+                  'high': np.maximum(open, close) * (1 + spread),
+                  'low': np.minimum(open, close) * (1 - spread),
+                  'volume': np.round(rng.lognormal(13, 1, size=(bars, n)))}
+        return BarFeed({field: pd.DataFrame(values, index=times, columns=tickers) for field, values in frames.items()}, resolution)
+
+    @staticmethod
+    def TradingTimes(start, bars, resolution=Resolution.Daily):
+        #the start times of the bars on weekdays. Hour bars cover 9:00 to 16:00
+        days = pd.bdate_range(start, periods=bars if resolution == Resolution.Daily else -(-bars // 7))
+        if resolution == Resolution.Daily:
+            return days
+        if resolution != Resolution.Hour:
+            raise ValueError('synthetic feeds are daily or hourly')
+        hours = [timedelta(hours=h) for h in range(9, 16)]
+        return pd.DatetimeIndex([day + hour for day in days for hour in hours][:bars])
+
+    @staticmethod
+    def FromCsv(path, resolution=Resolution.Daily):
+        #one file per symbol, <ticker>.csv, with the columns time, open, high, low, close and volume. time is the start of the bar
+        frames = {field: {} for field in FIELDS}
+        for name in sorted(os.listdir(path)):
+            ticker, extension = os.path.splitext(name)
+            if extension.lower() != '.csv':
+                continue
+            data = pd.read_csv(os.path.join(path, name), parse_dates=['time'], index_col='time')
+            data.columns = [column.lower() for column in data.columns]
+            for field in FIELDS:
+                frames[field][ticker.upper()] = data[field]
+        return BarFeed({field: pd.DataFrame(columns).sort_index() for field, columns in frames.items()}, resolution)
+
+    def ToCsv(self, path):
+        os.makedirs(path, exist_ok=True)
+        for symbol in self.symbols:
+            data = pd.DataFrame({field: self.frames[field][symbol] for field in FIELDS}).dropna()
+            data.to_csv(os.path.join(path, f'{symbol}.csv'), index_label='time')
+
+    @staticmethod
+    def FromStore(store, resolution=Resolution.Daily):
+        #a BarStore, or the folder of one. The frames wrap its memory maps, so nothing is read before it is used
+        if not isinstance(store, BarStore):
+            store = BarStore(store)
+        times = store.times - Extensions.ToTimeSpan(resolution)
+        return BarFeed({field: pd.DataFrame(store.field(field).T, index=times, columns=store.symbols, copy=False) for field in FIELDS}, resolution)
+
+    def ToStore(self, path):
+        return BarStore.write(path, self.end_times, self.symbols, {field: self.values[field].T for field in FIELDS})
+
+    def Bars(self, i, symbols):
+        #the bars of the i'th time step, for the symbols that have one
+        time = self.times[i]
+        bars = {}
+        for symbol in symbols:
+            k = self.columns.get(symbol)
+            if k is None:
+                continue
+            close = self.values['close'][i, k]
+            if close != close:
+                continue
+            bars[symbol] = TradeBar(time, symbol, self.values['open'][i, k], self.values['high'][i, k], self.values['low'][i, k],
+                                    close, self.values['volume'][i, k], self.period)
+        return bars
+
+    def LastBar(self, symbol, time):
+        #the newest bar of the symbol that ended at or before time
+        k = self.columns.get(symbol)
+        if k is None:
+            return None
+        end = self.end_times.searchsorted(time, side='right')
+        closes = self.values['close'][:end, k]
+        valid = np.flatnonzero(~np.isnan(closes))
+        if len(valid) == 0:
+            return None
+        i = valid[-1]
+        return TradeBar(self.times[i], symbol, *(self.values[field][i, k] for field in FIELDS), self.period)
+
+    def LastValues(self, time):
+        #the newest close and volume of every symbol from a bar that ended at or before time, nan if there is none
+        end = self.end_times.searchsorted(time, side='right')
+        if end == 0:
+            return np.full(len(self.symbols), np.nan), np.full(len(self.symbols), np.nan)
+        return self.filled['close'][end - 1], self.filled['volume'][end - 1]
+
+    def Resample(self, resolution):
+        #the feed at a coarser resolution. Only days from hours (or anything finer) are supported
+        resolution = Resolution(resolution)
+        if resolution in self.resampled:
+            return self.resampled[resolution]
+        if resolution != Resolution.Daily or resolution < self.resolution:
+            raise ValueError(f'cannot resample {self.resolution.name} bars to {resolution.name}')
+        days = self.times.normalize()
+        how = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+        frames = {field: self.frames[field].groupby(days).agg(how[field]) for field in FIELDS}
+        feed = self.resampled[resolution] = BarFeed(frames, resolution)
+        return feed
+
+    def Window(self, symbols, periods, time):
+        #the rows of the bars that ended at or before time. periods is a number of bars, a timedelta, or the time the bars ended after
+        end = self.end_times.searchsorted(time, side='right')
+        if isinstance(periods, datetime):
+            start = self.end_times.searchsorted(periods, side='right')
+        elif isinstance(periods, timedelta):
+            start = self.end_times.searchsorted(time - periods, side='right')
+        else:
+            start = max(end - int(periods), 0)
+        columns = [self.columns[symbol] for symbol in symbols if symbol in self.columns]
+        return start, end, columns
+
+    def History(self, symbols, periods, resolution, time):
+        if isinstance(symbols, str) or not hasattr(symbols, '__iter__'):
+            symbols = [symbols]
+        symbols = [SymbolCache.GetSymbol(str(getattr(symbol, 'Symbol', symbol))) for symbol in symbols]
+
+        feed = self.Resample(resolution) if resolution != self.resolution else self
+        start, end, columns = feed.Window(symbols, periods, time)
+        if not columns or start >= end:
+            return pd.DataFrame()
+
+        #long format like LEAN, one row per (symbol, time) that has a bar
+        index = feed.end_times[start:end]
+        wide = {field: feed.values[field][start:end, columns] for field in FIELDS}
+        tickers = [feed.symbols[k] for k in columns]
+        has_bar = ~np.isnan(wide['close'])
+        symbol_index = np.repeat(np.arange(len(columns))[None, :], end - start, axis=0).T[has_bar.T]
+        time_index = np.repeat(np.arange(end - start)[None, :], len(columns), axis=0)[has_bar.T]
+        frame = pd.DataFrame({field: values.T[has_bar.T] for field, values in wide.items()},
+                             index=pd.MultiIndex.from_arrays([pd.Index(tickers, dtype=object)[symbol_index], index[time_index]], names=['symbol', 'time']))
+        return frame
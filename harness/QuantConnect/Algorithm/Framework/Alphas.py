@@ -0,0 +1,155 @@
+import itertools
+import uuid
+from datetime import timedelta
+from enum import Enum, IntEnum
+
+from QuantConnect import Extensions, Resolution
+
+
+class InsightDirection(IntEnum):
+    Down = -1
+    Flat = 0
+    Up = 1
+
+
+class InsightType(Enum):
+    Price = 0
+    Volatility = 1
+
+
+class Insight:
+    ids = itertools.count()
+
+    def __init__(self, symbol, period, type=InsightType.Price, direction=InsightDirection.Flat, magnitude=None, confidence=None, sourceModel=None, weight=None):
+        self.Symbol = symbol
+        #a timedelta, a Resolution (one bar), or an expiry function of the generated time
+        self.period = Extensions.ToTimeSpan(period) if isinstance(period, Resolution) else period
+        self.Type = type
+        self.Direction = InsightDirection(direction)
+        self.Magnitude = magnitude
+        self.Confidence = confidence
+        self.SourceModel = sourceModel
+        self.Weight = weight
+        self.Id = next(Insight.ids)
+        self.GroupId = None
+        self.GeneratedTimeUtc = None
+        self.CloseTimeUtc = None
+
+    @staticmethod
+    def Price(symbol, period, direction, magnitude=None, confidence=None, sourceModel=None, weight=None):
+        return Insight(symbol, period, InsightType.Price, direction, magnitude, confidence, sourceModel, weight)
+
+    @staticmethod
+    def Group(*insights):
+        #Insight.Group(a, b) or Insight.Group([a, b]). Gives the insights one GroupId, and returns them as a list
+        if len(insights) == 1 and not isinstance(insights[0], Insight):
+            insights = insights[0]
+        group_id = uuid.uuid4()
+        for insight in insights:
+            insight.GroupId = group_id
+        return list(insights)
+
+    @property
+    def Period(self):
+        if self.GeneratedTimeUtc is not None and self.CloseTimeUtc is not None:
+            return self.CloseTimeUtc - self.GeneratedTimeUtc
+        return self.period if isinstance(self.period, timedelta) else None
+
+    def SetGenerated(self, time, sourceModel=None):
+        #called by the engine when the alpha returns the insight
+        self.GeneratedTimeUtc = time
+        self.CloseTimeUtc = time + self.period if isinstance(self.period, timedelta) else self.period(time)
+        if self.SourceModel is None:
+            self.SourceModel = sourceModel
+
+    def IsActive(self, utcTime):
+        return not self.IsExpired(utcTime)
+
+    def IsExpired(self, utcTime):
+        return self.CloseTimeUtc is not None and self.CloseTimeUtc <= utcTime
+
+    def Expire(self, utcTime):
+        self.CloseTimeUtc = utcTime
+
+    def __repr__(self):
+        return f'Insight({self.Symbol}, {self.Direction.name}, {self.GeneratedTimeUtc} -> {self.CloseTimeUtc})'
+
+
+class InsightCollection:
+    #the insights by symbol
+    def __init__(self):
+        self.insights = {}
+
+    def Add(self, insight):
+        self.insights.setdefault(insight.Symbol, []).append(insight)
+
+    def AddRange(self, insights):
+        for insight in insights:
+            self.Add(insight)
+
+    def Remove(self, insight):
+        insights = self.insights.get(insight.Symbol)
+        if insights is None or insight not in insights:
+            return False
+        insights.remove(insight)
+        if not insights:
+            del self.insights[insight.Symbol]
+        return True
+
+    def Clear(self, symbols=None):
+        if symbols is None:
+            self.insights = {}
+            return
+        for symbol in symbols:
+            self.insights.pop(symbol, None)
+
+    def ContainsKey(self, symbol):
+        return symbol in self.insights
+
+    def __contains__(self, insight):
+        return insight in self.insights.get(insight.Symbol, [])
+
+    def __getitem__(self, symbol):
+        return list(self.insights[symbol])
+
+    def __iter__(self):
+        return iter([insight for insights in self.insights.values() for insight in insights])
+
+    def __len__(self):
+        return sum(len(insights) for insights in self.insights.values())
+
+    @property
+    def Count(self):
+        return len(self)
+
+    @property
+    def Keys(self):
+        return list(self.insights.keys())
+
+    def HasActiveInsights(self, symbol, utcTime):
+        return any(insight.IsActive(utcTime) for insight in self.insights.get(symbol, []))
+
+    def GetActiveInsights(self, utcTime):
+        return [insight for insight in self if insight.IsActive(utcTime)]
+
+    def RemoveExpiredInsights(self, utcTime):
+        expired = [insight for insight in self if insight.IsExpired(utcTime)]
+        for insight in expired:
+            self.Remove(insight)
+        return expired
+
+    def GetNextExpiryTime(self):
+        times = [insight.CloseTimeUtc for insight in self if insight.CloseTimeUtc is not None]
+        return min(times) if times else None
+
+
+class AlphaModel:
+    @property
+    def Name(self):
+        return type(self).__name__
+
+    def Update(self, algorithm, data):
+        return []
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        pass
@@ -0,0 +1,29 @@
+from QuantConnect.Algorithm.Framework.Portfolio import PortfolioTargetCollection
+from QuantConnect.Orders import BuyingPowerModelExtensions, OrderSizing
+
+
+class ExecutionModel:
+    def Execute(self, algorithm, targets):
+        pass
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        pass
+
+
+class ImmediateExecutionModel(ExecutionModel):
+    #market orders for whatever the targets still need, like LEAN's
+    def __init__(self):
+        self.targetsCollection = PortfolioTargetCollection()
+
+    def Execute(self, algorithm, targets):
+        self.targetsCollection.AddRange(targets)
+        if self.targetsCollection.Count > 0:
+            for target in self.targetsCollection.OrderByMarginImpact(algorithm):
+                security = algorithm.Securities[target.Symbol]
+                quantity = OrderSizing.GetUnorderedQuantity(algorithm, target, security)
+                if quantity != 0:
+                    aboveMinimumPortfolio = BuyingPowerModelExtensions.AboveMinimumOrderMarginPortfolioPercentage(security.BuyingPowerModel, security, quantity, algorithm.Portfolio, algorithm.Settings.MinimumOrderMarginPortfolioPercentage)
+                    if aboveMinimumPortfolio:
+                        algorithm.MarketOrder(security, quantity)
+
+            self.targetsCollection.ClearFulfilled(algorithm)
@@ -0,0 +1,174 @@
+import math
+from datetime import timedelta
+
+from QuantConnect import Extensions, PortfolioBias, Resolution
+from QuantConnect.Algorithm.Framework.Alphas import InsightCollection, InsightDirection
+from QuantConnect.Orders import OrderSizing
+
+
+class PortfolioTarget:
+    def __init__(self, symbol, quantity, tag=''):
+        self.Symbol = symbol
+        self.Quantity = quantity
+        self.Tag = tag
+
+    @staticmethod
+    def Percent(algorithm, symbol, percent, tag=''):
+        #the whole number of lots that is percent of the portfolio value. None if the security has no price yet
+        security = algorithm.Securities[symbol]
+        if security.Price == 0:
+            return None
+        quantity = percent * algorithm.Portfolio.TotalPortfolioValue / security.Price
+        lots = math.floor(abs(quantity) / security.LotSize)
+        return PortfolioTarget(symbol, math.copysign(lots * security.LotSize, quantity) if lots else 0, tag)
+
+    def __repr__(self):
+        return f'PortfolioTarget({self.Symbol}, {self.Quantity})'
+
+
+class PortfolioTargetCollection:
+    #the newest target of each symbol
+    def __init__(self):
+        self.targets = {}
+
+    def Add(self, target):
+        if target is not None:
+            self.targets[target.Symbol] = target
+
+    def AddRange(self, targets):
+        for target in targets:
+            self.Add(target)
+
+    def Remove(self, symbol):
+        return self.targets.pop(symbol, None) is not None
+
+    def Clear(self):
+        self.targets = {}
+
+    def ContainsKey(self, symbol):
+        return symbol in self.targets
+
+    def __getitem__(self, symbol):
+        return self.targets[symbol]
+
+    def __iter__(self):
+        return iter(list(self.targets.values()))
+
+    def __len__(self):
+        return len(self.targets)
+
+    @property
+    def Count(self):
+        return len(self.targets)
+
+    @property
+    def IsEmpty(self):
+        return not self.targets
+
+    @property
+    def Values(self):
+        return list(self.targets.values())
+
+    def OrderByMarginImpact(self, algorithm):
+        #like LEAN: the targets of tradable securities with data that are at least a lot away from what we hold and have
+        #ordered, the ones that make a position smaller first, so they free margin, then the biggest orders
+        pending = []
+        for target in self.targets.values():
+            security = algorithm.Securities[target.Symbol]
+            quantity = OrderSizing.AdjustByLotSize(security, target.Quantity)
+            existing = security.Holdings.Quantity + sum(ticket.Quantity - ticket.QuantityFilled for ticket in algorithm.Transactions.GetOpenOrderTickets(target.Symbol))
+            if not (security.HasData and security.IsTradable and abs(quantity - existing) >= security.SymbolProperties.LotSize):
+                continue
+            reduces = existing != 0 and abs(quantity) < abs(existing)
+            pending.append((not reduces, -abs((quantity - existing) * security.Price), target))
+        pending.sort(key=lambda entry: entry[:2])
+        return [target for reduces, impact, target in pending]
+
+    def ClearFulfilled(self, algorithm):
+        for target in list(self.targets.values()):
+            if OrderSizing.GetUnorderedQuantity(algorithm, target) == 0:
+                del self.targets[target.Symbol]
+
+
+class PortfolioConstructionModel:
+    #The base of the portfolio construction models. Like LEAN it keeps the insights, rebalances when there are new or
+    #expired insights or the rebalancing function says so, and leaves the weights to DetermineTargetPercent.
+    #The subclasses in this repo dont call __init__, so everything here has a class level default
+    Algorithm = None
+    rebalancingFunc = None
+    nextRebalance = None
+    insightCollection = None
+    removedSymbols = None
+
+    def __init__(self, rebalance=None):
+        self.SetRebalancingFunc(rebalance)
+
+    def SetRebalancingFunc(self, rebalance):
+        #a timedelta, a Resolution, or a function of the time that gives the next rebalance time
+        if isinstance(rebalance, Resolution):
+            rebalance = Extensions.ToTimeSpan(rebalance)
+        if isinstance(rebalance, timedelta):
+            interval = rebalance
+            rebalance = lambda time: time + interval
+        self.rebalancingFunc = rebalance
+
+    def IsRebalanceDue(self, insights, utcTime):
+        if self.rebalancingFunc is None:
+            return True
+        if self.nextRebalance is None or utcTime >= self.nextRebalance:
+            self.nextRebalance = self.rebalancingFunc(utcTime)
+            return True
+        expiry = self.insightCollection.GetNextExpiryTime()
+        return bool(insights) or (expiry is not None and expiry <= utcTime)
+
+    def CreateTargets(self, algorithm, insights):
+        self.Algorithm = algorithm
+        if self.insightCollection is None:
+            self.insightCollection = InsightCollection()
+        self.insightCollection.AddRange(insights)
+
+        if not self.IsRebalanceDue(insights, algorithm.UtcTime):
+            return []
+
+        targets = [PortfolioTarget(symbol, 0) for symbol in self.removedSymbols or []]
+        self.removedSymbols = []
+
+        #symbols whose insights all expired are flattened
+        expired = self.insightCollection.RemoveExpiredInsights(algorithm.UtcTime)
+        for symbol in dict.fromkeys(insight.Symbol for insight in expired):
+            if not self.insightCollection.HasActiveInsights(symbol, algorithm.UtcTime):
+                targets.append(PortfolioTarget(symbol, 0))
+
+        #the newest active insight of each symbol
+        last = {}
+        for insight in sorted(self.insightCollection.GetActiveInsights(algorithm.UtcTime), key=lambda x: x.GeneratedTimeUtc):
+            last[insight.Symbol] = insight
+
+        for insight, percent in self.DetermineTargetPercent(list(last.values())).items():
+            target = PortfolioTarget.Percent(algorithm, insight.Symbol, percent)
+            if target is not None:
+                targets.append(target)
+        return targets
+
+    def DetermineTargetPercent(self, activeInsights):
+        raise NotImplementedError
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        removed = [security.Symbol for security in changes.RemovedSecurities]
+        self.removedSymbols = (self.removedSymbols or []) + removed
+        if self.insightCollection is not None:
+            self.insightCollection.Clear(removed)
+
+
+class EqualWeightingPortfolioConstructionModel(PortfolioConstructionModel):
+    def __init__(self, rebalance=Resolution.Daily, portfolioBias=PortfolioBias.LongShort):
+        super().__init__(rebalance)
+        self.portfolioBias = portfolioBias
+
+    def DetermineTargetPercent(self, activeInsights):
+        count = sum(insight.Direction != InsightDirection.Flat and self.RespectPortfolioBias(insight) for insight in activeInsights)
+        percent = 0 if count == 0 else 1.0 / count
+        return {insight: (insight.Direction if self.RespectPortfolioBias(insight) else InsightDirection.Flat) * percent for insight in activeInsights}
+
+    def RespectPortfolioBias(self, insight):
+        return self.portfolioBias == PortfolioBias.LongShort or insight.Direction == self.portfolioBias
@@ -0,0 +1,6 @@
+class RiskManagementModel:
+    def ManageRisk(self, algorithm, targets):
+        return []
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        pass
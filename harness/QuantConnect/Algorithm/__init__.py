@@ -0,0 +1,379 @@
+import os
+from datetime import datetime, timedelta
+
+from QuantConnect import Extensions, Resolution, SymbolCache
+from QuantConnect.Data import TradeBarConsolidator
+from QuantConnect.Orders import Order, OrderStatus, OrderTicket
+from QuantConnect.Securities import Security, SecurityManager, SecurityPortfolioManager
+
+
+class UniverseSettings:
+    def __init__(self):
+        self.Resolution = Resolution.Minute
+        self.Leverage = 1
+
+
+class AlgorithmSettings:
+    def __init__(self):
+        self.MinimumOrderMarginPortfolioPercentage = 0.001
+        self.FreePortfolioValuePercentage = 0.0025
+
+
+class ObjectStore:
+    #the object store of the project, a folder of files like the local storage folder of LEAN
+    def __init__(self, root='storage'):
+        self.root = root
+
+    def GetFilePath(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def ContainsKey(self, key):
+        return os.path.exists(os.path.join(self.root, key))
+
+    def Save(self, key, text):
+        with open(self.GetFilePath(key), 'w') as file:
+            file.write(text)
+        return True
+
+    def Read(self, key):
+        with open(os.path.join(self.root, key)) as file:
+            return file.read()
+
+
+class SubscriptionManager:
+    #the consolidators of every symbol. The engine feeds them the bars
+    def __init__(self):
+        self.consolidators = {}
+
+    def AddConsolidator(self, symbol, consolidator):
+        self.consolidators.setdefault(symbol, []).append(consolidator)
+
+    def RemoveConsolidator(self, symbol, consolidator):
+        consolidators = self.consolidators.get(symbol, [])
+        if consolidator in consolidators:
+            consolidators.remove(consolidator)
+        if not consolidators:
+            self.consolidators.pop(symbol, None)
+
+    def Count(self):
+        return sum(len(consolidators) for consolidators in self.consolidators.values())
+
+
+class SecurityTransactionManager:
+    #Every order. Orders fill at the security price when they are placed, or after fill_latency if it is set,
+    #then the engine fills them at the first price at or after that time.
+    #fill_latency is a timedelta, or a function of the order that gives its latency, to simulate a broker.
+    #Like LEAN a synchronous order waits for its fill, so with a latency it is only sent when the synchronous orders
+    #before it have filled, an asynchronous one is sent right away
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.orders = {}
+        self.open_orders = {}
+        self.fill_latency = None
+        #when the last synchronous order fills
+        self.blocked_until = None
+
+    def AddOrder(self, symbol, quantity, tag='', asynchronous=False):
+        order = Order(len(self.orders) + 1, symbol, quantity, self.algorithm.Time, tag)
+        order.Latency = self.fill_latency(order) if callable(self.fill_latency) else self.fill_latency
+        if order.Latency and not asynchronous:
+            if self.blocked_until is not None and self.blocked_until > order.Time:
+                order.Time = self.blocked_until
+            self.blocked_until = order.Time + order.Latency
+        self.orders[order.Id] = order
+        self.open_orders[order.Id] = order
+        if not self.fill_latency:
+            self.ProcessFills(self.algorithm.Time)
+        return OrderTicket(order)
+
+    def ProcessFills(self, time):
+        for order in list(self.open_orders.values()):
+            if order.Latency and time < order.Time + order.Latency:
+                continue
+            security = self.algorithm.Securities[order.Symbol]
+            if security.Price == 0:
+                continue
+            self.algorithm.Portfolio.Fill(order.Symbol, order.Quantity, security.Price)
+            order.FillQuantity = order.Quantity
+            order.FillPrice = security.Price
+            order.FillTime = order.Time + order.Latency if order.Latency else time
+            order.Status = OrderStatus.Filled
+            del self.open_orders[order.Id]
+            self.algorithm.OnOrderEvent(order)
+
+    def GetOpenOrders(self, symbol=None):
+        return [order for order in self.open_orders.values() if symbol is None or order.Symbol == symbol]
+
+    def GetOpenOrderTickets(self, symbol=None):
+        return [OrderTicket(order) for order in self.GetOpenOrders(symbol)]
+
+    def GetOrderById(self, id):
+        return self.orders.get(id)
+
+    def GetOrders(self):
+        return list(self.orders.values())
+
+    def CancelOpenOrders(self, symbol=None):
+        for order in self.GetOpenOrders(symbol):
+            order.Status = OrderStatus.Canceled
+            del self.open_orders[order.Id]
+            self.algorithm.OnOrderEvent(order)
+
+    @property
+    def OrdersCount(self):
+        return len(self.orders)
+
+
+class DateRules:
+    #the date rules are functions of a date
+    def EveryDay(self, symbol=None):
+        return lambda date: True
+
+    def MonthStart(self, symbol=None):
+        return lambda date, last=[None]: DateRules.First(last, (date.year, date.month))
+
+    def WeekStart(self, symbol=None):
+        return lambda date, last=[None]: DateRules.First(last, date.isocalendar()[:2])
+
+    @staticmethod
+    def First(last, period):
+        #True on the first trading day of a period
+        if last[0] == period:
+            return False
+        last[0] = period
+        return True
+
+
+class TimeRules:
+    #the time rules are the time of day an event fires, as a timedelta from midnight
+    def At(self, hour, minute=0, second=0):
+        return timedelta(hours=hour, minutes=minute, seconds=second)
+
+    def AfterMarketOpen(self, symbol=None, minutesAfterOpen=0):
+        return timedelta(hours=9, minutes=30 + minutesAfterOpen)
+
+    def BeforeMarketClose(self, symbol=None, minutesBeforeClose=0):
+        return timedelta(hours=16, minutes=-minutesBeforeClose)
+
+    @property
+    def Midnight(self):
+        return timedelta(0)
+
+
+class ScheduleManager:
+    #Schedule.On(DateRules, TimeRules, action). An event fires at the first time step at or after its time on a day its date rule accepts
+    def __init__(self):
+        self.events = []
+
+    def On(self, dateRule, timeRule, action):
+        self.events.append([dateRule, timeRule, action, None])
+
+    def Fire(self, time):
+        midnight = datetime(time.year, time.month, time.day)
+        for event in self.events:
+            dateRule, timeRule, action, fired = event
+            if fired == midnight.date() or time < midnight + timeRule:
+                continue
+            event[3] = midnight.date()
+            if dateRule(midnight.date()):
+                action()
+
+
+class QCAlgorithm:
+    #The algorithm API the strategies use. Initialize sets it up, then harness.Engine.Backtest runs it over a BarFeed
+    def __init__(self):
+        self.Time = datetime(1998, 1, 2)
+        self.StartDate = None
+        self.EndDate = None
+        self.WarmUpPeriod = None
+        self.IsWarmingUp = False
+        self.Benchmark = None
+
+        self.Securities = SecurityManager()
+        self.Portfolio = SecurityPortfolioManager(self.Securities)
+        self.Transactions = SecurityTransactionManager(self)
+        self.SubscriptionManager = SubscriptionManager()
+        self.UniverseSettings = UniverseSettings()
+        self.Settings = AlgorithmSettings()
+        self.Schedule = ScheduleManager()
+        self.ObjectStore = ObjectStore()
+        self.DateRules = DateRules()
+        self.TimeRules = TimeRules()
+
+        self.universes = []
+        #symbols added with AddEquity, they stay subscribed whatever the universe does
+        self.manual_symbols = []
+        self.securityInitializer = None
+
+        self.Alphas = []
+        self.PortfolioConstruction = None
+        self.Execution = None
+        self.RiskManagement = []
+        self.Insights = []
+
+        self.feed = None
+        self.start_override = None
+        self.end_override = None
+        self.logs = []
+        self.charts = {}
+        self.runtime_statistics = {}
+        self.verbose = False
+
+    @property
+    def UtcTime(self):
+        return self.Time
+
+    #setting up. The harness can override the dates of the strategy, so it runs on whatever data it has
+    def SetStartDate(self, year, month=None, day=None):
+        self.StartDate = self.start_override or (year if month is None else datetime(year, month, day))
+        self.Time = self.StartDate
+
+    def SetEndDate(self, year, month=None, day=None):
+        self.EndDate = self.end_override or (year if month is None else datetime(year, month, day))
+
+    def SetCash(self, cash):
+        self.Portfolio.Cash = float(cash)
+
+    def SetBenchmark(self, benchmark):
+        self.Benchmark = benchmark
+
+    def SetBrokerageModel(self, brokerage, accountType=None):
+        pass
+
+    def SetWarmup(self, period, resolution=None):
+        #a timedelta, or a number of bars at the feed resolution
+        self.WarmUpPeriod = period
+
+    SetWarmUp = SetWarmup
+
+    def SetSecurityInitializer(self, initializer):
+        self.securityInitializer = initializer
+
+    def AddUniverse(self, coarse, fine=None):
+        self.universes.append((coarse, fine))
+
+    def AddEquity(self, ticker, resolution=None, market=None, fillForward=True, leverage=1):
+        symbol = SymbolCache.GetSymbol(ticker)
+        if symbol not in self.manual_symbols:
+            self.manual_symbols.append(symbol)
+        return self.AddSecurity(symbol, resolution)
+
+    def AddSecurity(self, symbol, resolution=None):
+        security = self.Securities.get(symbol)
+        if security is None:
+            security = self.Securities[symbol] = Security(symbol, resolution or self.UniverseSettings.Resolution)
+            if self.securityInitializer is not None:
+                self.securityInitializer(security)
+        return security
+
+    def SetAlpha(self, alpha):
+        self.Alphas = [alpha]
+
+    def AddAlpha(self, alpha):
+        self.Alphas.append(alpha)
+
+    def SetPortfolioConstruction(self, portfolioConstruction):
+        self.PortfolioConstruction = portfolioConstruction
+
+    def SetExecution(self, execution):
+        self.Execution = execution
+
+    def SetRiskManagement(self, riskManagement):
+        self.RiskManagement = [riskManagement]
+
+    def AddRiskManagement(self, riskManagement):
+        self.RiskManagement.append(riskManagement)
+
+    #data
+    def History(self, symbols, periods, end=None, resolution=None):
+        #a (symbol, time) indexed frame with open, high, low, close and volume, of the bars that ended at or before now.
+        #periods is a number of bars or a timedelta back from now, or the start of a (start, end] range
+        if isinstance(periods, datetime):
+            return self.feed.History(symbols, periods, resolution or self.feed.resolution, min(end, self.Time))
+        return self.feed.History(symbols, periods, end or resolution or self.feed.resolution, self.Time)
+
+    def GetLastKnownPrices(self, security):
+        bar = self.feed.LastBar(security.Symbol, self.Time)
+        return [] if bar is None else [bar]
+
+    def ResolveConsolidator(self, symbol, resolution):
+        return TradeBarConsolidator(Extensions.ToTimeSpan(resolution or self.feed.resolution))
+
+    def RegisterIndicator(self, symbol, indicator, resolution=None, selector=None):
+        #resolution can be a consolidator
+        consolidator = resolution if isinstance(resolution, TradeBarConsolidator) else self.ResolveConsolidator(symbol, resolution)
+        if selector is None:
+            consolidator.DataConsolidated += lambda sender, bar: indicator.Update(bar.EndTime, bar.Close)
+        else:
+            consolidator.DataConsolidated += lambda sender, bar: indicator.Update(bar.EndTime, selector(bar))
+        self.SubscriptionManager.AddConsolidator(symbol, consolidator)
+        return consolidator
+
+    def CreateIndicatorName(self, symbol, type, resolution):
+        return f'{type}({symbol}_{Resolution(resolution).name})'
+
+    def IsMarketOpen(self, symbol):
+        #the engine only steps on bars, so the market is open whenever the algorithm runs
+        return True
+
+    #orders
+    def MarketOrder(self, symbol, quantity, asynchronous=False, tag=''):
+        symbol = getattr(symbol, 'Symbol', symbol)
+        return self.Transactions.AddOrder(symbol, quantity, tag, asynchronous)
+
+    def Liquidate(self, symbol=None, tag='Liquidated'):
+        tickets = []
+        for holding in self.Portfolio.Values:
+            if holding.Invested and (symbol is None or holding.Symbol == symbol):
+                tickets.append(self.MarketOrder(holding.Symbol, -holding.Quantity, tag=tag))
+        return tickets
+
+    def SetHoldings(self, symbol, percent):
+        security = self.Securities[symbol]
+        if security.Price == 0:
+            return
+        quantity = int(percent * self.Portfolio.TotalPortfolioValue / security.Price) - security.Holdings.Quantity
+        if quantity != 0:
+            self.MarketOrder(symbol, quantity)
+
+    #output
+    def Debug(self, message):
+        self.Log(message)
+
+    def Log(self, message):
+        self.logs.append((self.Time, str(message)))
+        if self.verbose:
+            print(self.Time, message)
+
+    def Error(self, message):
+        self.Log(message)
+
+    def SetRuntimeStatistic(self, name, value):
+        self.runtime_statistics[name] = str(value)
+
+    def Plot(self, chart, series, value):
+        self.charts.setdefault(chart, {}).setdefault(series, []).append((self.Time, value))
+
+    def AddChart(self, chart):
+        pass
+
+    #the event handlers the strategies can override
+    def Initialize(self):
+        pass
+
+    def OnData(self, data):
+        pass
+
+    def OnSecuritiesChanged(self, changes):
+        pass
+
+    def OnOrderEvent(self, orderEvent):
+        pass
+
+    def OnEndOfDay(self, symbol=None):
+        pass
+
+    def OnEndOfAlgorithm(self):
+        pass
@@ -0,0 +1,166 @@
+from collections import deque
+from datetime import datetime, timedelta
+
+from QuantConnect import Extensions, Resolution
+
+
+class TradeBar:
+    def __init__(self, time, symbol, open, high, low, close, volume, period=timedelta(days=1)):
+        self.Time = time
+        self.Symbol = symbol
+        self.Open = open
+        self.High = high
+        self.Low = low
+        self.Close = close
+        self.Volume = volume
+        self.Period = period
+
+    @property
+    def EndTime(self):
+        return self.Time + self.Period
+
+    @property
+    def Value(self):
+        return self.Close
+
+    @property
+    def Price(self):
+        return self.Close
+
+
+class Slice:
+    #the bars of one time step, by symbol
+    def __init__(self, time, bars):
+        self.Time = time
+        self.Bars = bars
+
+    def ContainsKey(self, symbol):
+        return symbol in self.Bars
+
+    def __contains__(self, symbol):
+        return symbol in self.Bars
+
+    def __getitem__(self, symbol):
+        return self.Bars[symbol]
+
+    def get(self, symbol, default=None):
+        return self.Bars.get(symbol, default)
+
+    def Keys(self):
+        return list(self.Bars.keys())
+
+
+class RollingWindow:
+    #newest first, like LEAN. RollingWindow[TradeBar](size) works too, the type is ignored
+    def __class_getitem__(cls, item):
+        return cls
+
+    def __init__(self, size):
+        self.Size = size
+        self.window = deque(maxlen=size)
+        self.Samples = 0
+
+    def Add(self, item):
+        self.window.appendleft(item)
+        self.Samples += 1
+
+    def __getitem__(self, i):
+        return self.window[i]
+
+    def __iter__(self):
+        return iter(self.window)
+
+    def __len__(self):
+        return len(self.window)
+
+    @property
+    def Count(self):
+        return len(self.window)
+
+    @property
+    def IsReady(self):
+        return len(self.window) == self.Size
+
+    def Reset(self):
+        self.window.clear()
+        self.Samples = 0
+
+
+class TradeBarConsolidator:
+    #adds bars up into bars of a fixed period, aligned to midnight. Fires DataConsolidated when a period is done
+    def __init__(self, period):
+        if isinstance(period, Resolution):
+            period = Extensions.ToTimeSpan(period)
+        self.period = period
+        self.handlers = []
+        self.working = None
+        self.Consolidated = None
+
+    @property
+    def DataConsolidated(self):
+        return ConsolidatorEvent(self)
+
+    @DataConsolidated.setter
+    def DataConsolidated(self, event):
+        #the result of += and -= on the event
+        pass
+
+    def Start(self, time):
+        midnight = datetime(time.year, time.month, time.day)
+        return midnight + (time - midnight) // self.period * self.period
+
+    def Update(self, bar):
+        start = self.Start(bar.Time)
+        if self.working is not None and start != self.working.Time:
+            self.Emit()
+        if self.working is None:
+            self.working = TradeBar(start, bar.Symbol, bar.Open, bar.High, bar.Low, bar.Close, bar.Volume, self.period)
+        else:
+            self.working.High = max(self.working.High, bar.High)
+            self.working.Low = min(self.working.Low, bar.Low)
+            self.working.Close = bar.Close
+            self.working.Volume += bar.Volume
+        #a bar that reaches the end of the period finishes it
+        if bar.EndTime >= self.working.EndTime:
+            self.Emit()
+
+    def Scan(self, time):
+        #called with the clock, finishes a period that is over even if no bar came in after it
+        if self.working is not None and time >= self.working.EndTime:
+            self.Emit()
+
+    def Emit(self):
+        bar = self.working
+        self.working = None
+        self.Consolidated = bar
+        for handler in list(self.handlers):
+            handler(self, bar)
+
+
+class ConsolidatorEvent:
+    #so consolidator.DataConsolidated += handler works like the C# event
+    def __init__(self, consolidator):
+        self.consolidator = consolidator
+
+    def __iadd__(self, handler):
+        self.consolidator.handlers.append(handler)
+        return self
+
+    def __isub__(self, handler):
+        self.consolidator.handlers.remove(handler)
+        return self
+
+
+class CoarseFundamental:
+    def __init__(self, symbol, price, volume):
+        self.Symbol = symbol
+        self.Price = price
+        self.AdjustedPrice = price
+        self.Volume = volume
+        self.DollarVolume = price * volume
+        self.HasFundamentalData = True
+
+
+class FineFundamental:
+    def __init__(self, symbol):
+        self.Symbol = symbol
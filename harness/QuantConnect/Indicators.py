@@ -0,0 +1,149 @@
+import math
+from collections import deque
+from enum import Enum
+
+
+class MovingAverageType(Enum):
+    Simple = 0
+    Exponential = 1
+
+
+class IndicatorDataPoint:
+    def __init__(self, time=None, value=0.0):
+        self.Time = time
+        self.EndTime = time
+        self.Value = value
+
+    def __float__(self):
+        return float(self.Value)
+
+
+class Indicator:
+    #the base of the indicators. Subclasses compute the next value in ComputeNextValue
+    def __init__(self, name, period):
+        self.Name = name
+        self.period = period
+        self.Reset()
+
+    def Reset(self):
+        self.Samples = 0
+        self.Current = IndicatorDataPoint()
+
+    @property
+    def WarmUpPeriod(self):
+        return self.period
+
+    @property
+    def IsReady(self):
+        return self.Samples >= self.period
+
+    def Update(self, time, value=None):
+        #Update(time, value), or Update(bar) with anything that has EndTime and Close
+        if value is None:
+            time, value = time.EndTime, time.Close
+        self.Samples += 1
+        self.Current = IndicatorDataPoint(time, self.ComputeNextValue(float(value)))
+        return self.IsReady
+
+    def ComputeNextValue(self, value):
+        raise NotImplementedError
+
+
+class SimpleMovingAverage(Indicator):
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'SMA({name})', name
+        super().__init__(name, period)
+
+    def Reset(self):
+        super().Reset()
+        self.window = deque(maxlen=self.period)
+
+    def ComputeNextValue(self, value):
+        self.window.append(value)
+        return sum(self.window) / len(self.window)
+
+
+class ExponentialMovingAverage(Indicator):
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'EMA({name})', name
+        self.k = 2.0 / (period + 1)
+        super().__init__(name, period)
+
+    def ComputeNextValue(self, value):
+        #the first value is taken as it is
+        if self.Samples == 1:
+            return value
+        return value * self.k + self.Current.Value * (1 - self.k)
+
+
+class StandardDeviation(Indicator):
+    #population standard deviation over the period, like LEAN
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'STD({name})', name
+        super().__init__(name, period)
+
+    def Reset(self):
+        super().Reset()
+        self.window = deque(maxlen=self.period)
+
+    def ComputeNextValue(self, value):
+        self.window.append(value)
+        mean = sum(self.window) / len(self.window)
+        return math.sqrt(sum((x - mean) ** 2 for x in self.window) / len(self.window))
+
+
+class RateOfChange(Indicator):
+    #(value - value period bars ago) / value period bars ago
+    def __init__(self, name, period=None):
+        if period is None:
+            name, period = f'ROC({name})', name
+        super().__init__(name, period)
+
+    def Reset(self):
+        super().Reset()
+        self.window = deque(maxlen=self.period + 1)
+
+    @property
+    def IsReady(self):
+        return self.Samples > self.period
+
+    def ComputeNextValue(self, value):
+        self.window.append(value)
+        if len(self.window) <= self.period or self.window[0] == 0:
+            return 0.0
+        return (value - self.window[0]) / self.window[0]
+
+
+class BollingerBands(Indicator):
+    def __init__(self, name, period, k=None, movingAverageType=MovingAverageType.Simple):
+        if not isinstance(name, str):
+            name, period, k, movingAverageType = f'BB({name},{period})', name, period, (k if k is not None else movingAverageType)
+        self.k = k
+        self.movingAverageType = movingAverageType
+        super().__init__(name, period)
+
+    def Reset(self):
+        super().Reset()
+        average = ExponentialMovingAverage if self.movingAverageType == MovingAverageType.Exponential else SimpleMovingAverage
+        self.MiddleBand = average(self.period)
+        self.StandardDeviation = StandardDeviation(self.period)
+        self.UpperBand = Band()
+        self.LowerBand = Band()
+
+    def ComputeNextValue(self, value):
+        time = None
+        self.MiddleBand.Update(time, value)
+        self.StandardDeviation.Update(time, value)
+        middle = self.MiddleBand.Current.Value
+        width = self.k * self.StandardDeviation.Current.Value
+        self.UpperBand.Current = IndicatorDataPoint(time, middle + width)
+        self.LowerBand.Current = IndicatorDataPoint(time, middle - width)
+        return middle
+
+
+class Band:
+    def __init__(self):
+        self.Current = IndicatorDataPoint()
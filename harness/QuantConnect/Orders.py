@@ -0,0 +1,88 @@
+from enum import Enum
+
+
+class OrderStatus(Enum):
+    Submitted = 0
+    PartiallyFilled = 1
+    Filled = 2
+    Canceled = 3
+    Invalid = 4
+
+
+class Order:
+    def __init__(self, id, symbol, quantity, time, tag=''):
+        self.Id = id
+        self.Symbol = symbol
+        self.Quantity = quantity
+        self.Time = time
+        self.Tag = tag
+        self.Status = OrderStatus.Submitted
+        self.FillQuantity = 0.0
+        self.FillPrice = 0.0
+        self.FillTime = None
+        self.Latency = None
+
+    #the order is its own order event
+    @property
+    def OrderId(self):
+        return self.Id
+
+    @property
+    def UtcTime(self):
+        return self.FillTime if self.FillTime is not None else self.Time
+
+
+class OrderTicket:
+    def __init__(self, order):
+        self.order = order
+
+    @property
+    def OrderId(self):
+        return self.order.Id
+
+    @property
+    def Symbol(self):
+        return self.order.Symbol
+
+    @property
+    def Quantity(self):
+        return self.order.Quantity
+
+    @property
+    def QuantityFilled(self):
+        return self.order.FillQuantity
+
+    @property
+    def AverageFillPrice(self):
+        return self.order.FillPrice
+
+    @property
+    def Status(self):
+        return self.order.Status
+
+
+class OrderSizing:
+    @staticmethod
+    def GetUnorderedQuantity(algorithm, target, security=None):
+        #what is left to order to reach the target, after the holdings and the open orders, rounded down to whole lots
+        if security is None:
+            security = algorithm.Securities[target.Symbol]
+        holdings = security.Holdings.Quantity
+        open_quantity = sum(order.Quantity - order.FillQuantity for order in algorithm.Transactions.GetOpenOrders(target.Symbol))
+        quantity = target.Quantity - holdings - open_quantity
+        return OrderSizing.AdjustByLotSize(security, quantity)
+
+    @staticmethod
+    def AdjustByLotSize(security, quantity):
+        #rounded towards zero to whole lots
+        lots = int(abs(quantity) // security.LotSize)
+        return (lots if quantity > 0 else -lots) * security.LotSize
+
+
+class BuyingPowerModelExtensions:
+    @staticmethod
+    def AboveMinimumOrderMarginPortfolioPercentage(buyingPowerModel, security, quantity, portfolio, minimumOrderMarginPortfolioPercentage):
+        if minimumOrderMarginPortfolioPercentage == 0:
+            return True
+        value = portfolio.TotalPortfolioValue
+        return value > 0 and abs(quantity * security.Price) / value >= minimumOrderMarginPortfolioPercentage
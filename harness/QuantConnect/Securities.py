@@ -0,0 +1,166 @@
+class Security:
+    def __init__(self, symbol, resolution):
+        self.Symbol = symbol
+        self.Resolution = resolution
+        self.Price = 0.0
+        self.Close = 0.0
+        self.Volume = 0.0
+        self.HasData = False
+        self.IsTradable = True
+        self.LotSize = 1
+        self.BuyingPowerModel = None
+        self.Holdings = SecurityHolding(symbol)
+
+    def SetMarketPrice(self, bar):
+        self.Price = self.Close = float(bar.Close)
+        self.Volume = float(bar.Volume)
+        self.HasData = True
+        self.Holdings.Price = self.Price
+
+    @property
+    def Invested(self):
+        return self.Holdings.Invested
+
+    @property
+    def SymbolProperties(self):
+        return SymbolProperties(self.LotSize)
+
+    def __repr__(self):
+        return f'Security({self.Symbol})'
+
+
+class SymbolProperties:
+    def __init__(self, lotSize):
+        self.LotSize = lotSize
+
+
+class SecurityHolding:
+    def __init__(self, symbol):
+        self.Symbol = symbol
+        self.Quantity = 0.0
+        self.AveragePrice = 0.0
+        self.Price = 0.0
+
+    @property
+    def Invested(self):
+        return self.Quantity != 0
+
+    @property
+    def IsLong(self):
+        return self.Quantity > 0
+
+    @property
+    def IsShort(self):
+        return self.Quantity < 0
+
+    @property
+    def HoldingsValue(self):
+        return self.Quantity * self.Price
+
+    @property
+    def AbsoluteHoldingsValue(self):
+        return abs(self.HoldingsValue)
+
+    @property
+    def UnrealizedProfit(self):
+        return self.Quantity * (self.Price - self.AveragePrice)
+
+
+class KeyValuePair:
+    def __init__(self, key, value):
+        self.Key = key
+        self.Value = value
+
+
+class SecurityManager(dict):
+    #Symbol -> Security. Iterating gives KeyValuePairs, like the C# dictionary
+    def __iter__(self):
+        return iter([KeyValuePair(symbol, security) for symbol, security in self.items()])
+
+    @property
+    def Keys(self):
+        return list(self.keys())
+
+    @property
+    def Values(self):
+        return list(self.values())
+
+    def ContainsKey(self, symbol):
+        return symbol in self
+
+
+class SecurityPortfolioManager:
+    #the cash and the holdings of every security. Margin is simply the gross holdings value
+    def __init__(self, securities, cash=100000):
+        self.Securities = securities
+        self.Cash = float(cash)
+
+    def __getitem__(self, symbol):
+        return self.Securities[symbol].Holdings
+
+    def __contains__(self, symbol):
+        return symbol in self.Securities
+
+    @property
+    def Values(self):
+        return [security.Holdings for security in self.Securities.values()]
+
+    @property
+    def Keys(self):
+        return list(self.Securities.keys())
+
+    @property
+    def Invested(self):
+        return any(holding.Invested for holding in self.Values)
+
+    @property
+    def TotalHoldingsValue(self):
+        return sum(holding.HoldingsValue for holding in self.Values)
+
+    @property
+    def TotalAbsoluteHoldingsCost(self):
+        return sum(abs(holding.Quantity * holding.AveragePrice) for holding in self.Values)
+
+    @property
+    def TotalPortfolioValue(self):
+        return self.Cash + self.TotalHoldingsValue
+
+    @property
+    def TotalMarginUsed(self):
+        return sum(holding.AbsoluteHoldingsValue for holding in self.Values)
+
+    @property
+    def MarginRemaining(self):
+        return self.TotalPortfolioValue - self.TotalMarginUsed
+
+    def Fill(self, symbol, quantity, price):
+        holding = self[symbol]
+        new_quantity = holding.Quantity + quantity
+        if new_quantity == 0:
+            holding.AveragePrice = 0.0
+        elif holding.Quantity == 0 or (holding.Quantity > 0) != (new_quantity > 0):
+            #a new position, or one that flipped sides, starts at the fill price
+            holding.AveragePrice = price
+        elif abs(new_quantity) > abs(holding.Quantity):
+            holding.AveragePrice = (holding.AveragePrice * holding.Quantity + price * quantity) / new_quantity
+        holding.Quantity = new_quantity
+        self.Cash -= quantity * price
+
+
+class SecurityChanges:
+    def __init__(self, added, removed):
+        self.AddedSecurities = added
+        self.RemovedSecurities = removed
+
+    def __repr__(self):
+        return f'SecurityChanges(added={len(self.AddedSecurities)}, removed={len(self.RemovedSecurities)})'
+
+
+class FuncSecuritySeeder:
+    def __init__(self, func):
+        self.func = func
+
+    def SeedSecurity(self, security):
+        for bar in self.func(security):
+            security.SetMarketPrice(bar)
+        return True
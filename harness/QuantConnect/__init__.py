@@ -0,0 +1,100 @@
+#A stand-in for the part of the QuantConnect API the strategies in this repo use, so they can run and be profiled
+#on a local machine. It is not the LEAN engine: fills are immediate at the bar close, there are no fees or margin calls,
+#and time is naive local exchange time (UtcTime is the same as Time).
+import calendar
+from datetime import datetime, timedelta
+from enum import Enum, IntEnum
+
+
+class Resolution(IntEnum):
+    Tick = 0
+    Second = 1
+    Minute = 2
+    Hour = 3
+    Daily = 4
+
+
+class Extensions:
+    @staticmethod
+    def ToTimeSpan(resolution):
+        return {Resolution.Tick: timedelta(0),
+                Resolution.Second: timedelta(seconds=1),
+                Resolution.Minute: timedelta(minutes=1),
+                Resolution.Hour: timedelta(hours=1),
+                Resolution.Daily: timedelta(days=1)}[Resolution(resolution)]
+
+
+class Time:
+    @staticmethod
+    def Multiply(interval, times):
+        return interval * times
+
+
+class Expiry:
+    #the expiry functions take the time an insight is generated and give the time it expires
+    @staticmethod
+    def EndOfDay(time):
+        return datetime(time.year, time.month, time.day) + timedelta(days=1)
+
+    @staticmethod
+    def EndOfWeek(time):
+        start = datetime(time.year, time.month, time.day)
+        return start + timedelta(days=7 - start.weekday())
+
+    @staticmethod
+    def EndOfMonth(time):
+        return datetime(time.year, time.month, calendar.monthrange(time.year, time.month)[1]) + timedelta(days=1)
+
+    @staticmethod
+    def OneMonth(time):
+        return time + timedelta(days=30)
+
+
+class Symbol(str):
+    #a ticker. It is a str, so it is equal to, and hashes like, its ticker. That is how LEAN lets a Symbol index
+    #the columns of a history frame
+    @property
+    def Value(self):
+        return str(self)
+
+    @property
+    def ID(self):
+        return str(self)
+
+    def __repr__(self):
+        return str(self)
+
+
+class SymbolCache:
+    symbols = {}
+
+    @staticmethod
+    def GetSymbol(ticker):
+        symbol = SymbolCache.symbols.get(ticker)
+        if symbol is None:
+            symbol = SymbolCache.symbols[ticker] = Symbol(ticker)
+        return symbol
+
+
+class Universe:
+    #returned by a selection function to keep the current universe
+    Unchanged = object()
+
+
+class PortfolioBias(IntEnum):
+    Short = -1
+    LongShort = 0
+    Long = 1
+
+
+class BrokerageName(Enum):
+    Default = 0
+    InteractiveBrokersBrokerage = 1
+
+
+class AccountType(Enum):
+    Margin = 0
+    Cash = 1
+
+
+from QuantConnect import Algorithm
@@ -0,0 +1,80 @@
+import importlib.util
+import os
+import sys
+
+HARNESS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HARNESS)
+#the harness reads bar stores with BarStore.py of the repo root. The strategies do not get the root, see load_algorithm
+for folder in (ROOT, HARNESS):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+
+from Engine import Backtest
+from Feeds import BarFeed
+from QuantConnect import Resolution
+
+
+def in_repo(folder):
+    #a folder of the strategies, the repo root or a project folder, not the harness or the benchmarks
+    folder = os.path.abspath(folder)
+    return (folder == ROOT or os.path.dirname(folder) == ROOT) and os.path.basename(folder) not in ('harness', 'benchmarks')
+
+
+def load_algorithm(path, name):
+    #imports a strategy file and returns its algorithm class. On QuantConnect every folder is its own project and a strategy
+    #can only import the files of its project, so while it loads only its own folder (and the harness) is on the path of the
+    #repo, and the modules of the other projects and of the repo root are dropped from sys.modules, so a file the project is
+    #missing fails here like it would there. Every file is loaded under its own module name, since several are called main.py
+    path = os.path.abspath(path)
+    project = os.path.dirname(path)
+    module_name = os.path.relpath(path, ROOT).replace(os.sep, '.').replace(' ', '_')[:-len('.py')]
+    module = sys.modules.get(module_name)
+    if module is None:
+        for loaded_name, loaded in list(sys.modules.items()):
+            file = getattr(loaded, '__file__', None)
+            if file and in_repo(os.path.dirname(file)) and os.path.dirname(os.path.abspath(file)) != project:
+                del sys.modules[loaded_name]
+        path_before = list(sys.path)
+        sys.path[:] = [project] + [folder for folder in sys.path if not in_repo(folder or os.curdir)]
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+        finally:
+            sys.path[:] = path_before
+    return getattr(module, name)
+
+
+def resolution_of(algorithm_class):
+    #the resolution of the universe of a strategy, from an Initialize of a throwaway instance on a small hourly feed, which
+    #answers any request Initialize makes. The feed of the backtest has to be at least as fine
+    algorithm = algorithm_class()
+    algorithm.feed = BarFeed.Synthetic(symbols = 1, bars = 7 * 10, resolution = Resolution.Hour)
+    algorithm.Initialize()
+    return algorithm.UniverseSettings.Resolution
+
+
+def run(algorithm_class, feed, start=None, end=None, timer=None, **settings):
+    #runs a backtest of the algorithm on the feed. settings are set on the algorithm after Initialize, like num_coarse = 100
+    backtest = Backtest(algorithm_class(), feed, start, end, timer)
+    for name, value in settings.items():
+        setattr(backtest.algorithm, name, value)
+    return backtest.Run()
+
+
+if __name__ == '__main__':
+    #python harness/Runner.py <strategy file> <algorithm class> [csv or BarStore folder, daily bars]
+    algorithm_class = load_algorithm(sys.argv[1], sys.argv[2])
+    if len(sys.argv) > 3:
+        feed = BarFeed.FromStore(sys.argv[3]) if os.path.exists(os.path.join(sys.argv[3], 'times.npy')) else BarFeed.FromCsv(sys.argv[3])
+    else:
+        #a synthetic feed in the resolution of the strategy, hourly feeds get 300 days of 7 bars
+        resolution = resolution_of(algorithm_class)
+        feed = BarFeed.Synthetic(bars = 500 if resolution == Resolution.Daily else 7 * 300, resolution = resolution)
+    algorithm = run(algorithm_class, feed, start=feed.times[len(feed) // 2].to_pydatetime(), end=feed.end_times[-1].to_pydatetime())
+    print(f'{len(algorithm.Insights)} insights, {algorithm.Transactions.OrdersCount} orders, '
+          f'portfolio value {algorithm.Portfolio.TotalPortfolioValue:,.0f}')
@@ -0,0 +1,8 @@
+class Color:
+    Red = 'red'
+    Blue = 'blue'
+    White = 'white'
+    Yellow = 'yellow'
+    Green = 'green'
+    Black = 'black'
+    Orange = 'orange'
@@ -0,0 +1 @@
+from System import Drawing